@@ -4,57 +4,74 @@
 # Get the directory where this script is located
 AGENT_SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
+# Python of the project's virtualenv (created by `uv sync`). Calling it directly skips
+# the environment check that `uv run` does on every call; falls back to `uv run python`.
+if [ -x "$AGENT_SCRIPT_DIR/.venv/bin/python" ]; then
+    AGENT_PYTHON="$AGENT_SCRIPT_DIR/.venv/bin/python"
+else
+    AGENT_PYTHON="uv run python"
+fi
+
+# Resident daemon: keeps pydantic and the Ollama client loaded between calls, and Kokoro
+# loaded in a separate TTS worker process (torch is not loaded before the daemon forks).
+# The aliases below talk to it through agent_client.py (stdlib only, hence -S) and run
+# the script directly when the daemon is not running.
+alias agent-daemon-start='$AGENT_PYTHON "$AGENT_SCRIPT_DIR/agent_daemon.py" start'
+alias agent-daemon-stop='$AGENT_PYTHON "$AGENT_SCRIPT_DIR/agent_daemon.py" stop'
+alias agent-daemon-status='$AGENT_PYTHON "$AGENT_SCRIPT_DIR/agent_daemon.py" status'
+
 # Terminal agent with structured outputs (using uv for proper dependencies)
-alias agent='uv run python "$AGENT_SCRIPT_DIR/main.py"'
-alias agent-explain='uv run python "$AGENT_SCRIPT_DIR/main.py" --explain'
-alias agent-execute='uv run python "$AGENT_SCRIPT_DIR/main.py" --execute'
-alias agent-shell='uv run python "$AGENT_SCRIPT_DIR/main.py" --shell'
-alias agent-interact='uv run python "$AGENT_SCRIPT_DIR/main.py" --interaction'
+alias agent='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent'
+alias agent-explain='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent --explain'
+alias agent-execute='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent --execute'
+alias agent-shell='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent --shell'
+alias agent-interact='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent --interaction'
 
 # TTS (Text-to-Speech) responses
-alias tts='uv run python "$AGENT_SCRIPT_DIR/tts_response.py"'
-alias tts-text='uv run python "$AGENT_SCRIPT_DIR/tts_response.py" --text-only'
+alias tts='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" tts'
+alias tts-text='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" tts --text-only'
 
 # Study Partner - Learning assistant
-alias study='uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py"'
-alias study-text='uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --text-only'
-alias study-sample='uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"'
-alias study-history='uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --question-file "$AGENT_SCRIPT_DIR/questionnaires.json" --model gemma3:latest'
-alias study-science='uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --question-file "$AGENT_SCRIPT_DIR/questionnaires.json" --model gemma3:latest'
+alias study='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study'
+alias study-text='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --text-only'
+alias study-sample='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"'
+alias study-history='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --question-file "$AGENT_SCRIPT_DIR/questionnaires.json" --model gemma3:latest'
+alias study-science='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --question-file "$AGENT_SCRIPT_DIR/questionnaires.json" --model gemma3:latest'
 
 # Demo scripts
-alias demo-tts='uv run python "$AGENT_SCRIPT_DIR/demo_tts.py"'
-alias demo-agent='uv run python "$AGENT_SCRIPT_DIR/demo_ia_agent.py"'
-alias demo-study='uv run python "$AGENT_SCRIPT_DIR/demo_study_partner.py"'
-alias demo-study-text='uv run python "$AGENT_SCRIPT_DIR/demo_study_partner.py" <<< "1"'
+alias demo-tts='$AGENT_PYTHON "$AGENT_SCRIPT_DIR/demo_tts.py"'
+alias demo-agent='$AGENT_PYTHON "$AGENT_SCRIPT_DIR/demo_ia_agent.py"'
+alias demo-study='$AGENT_PYTHON "$AGENT_SCRIPT_DIR/demo_study_partner.py"'
+alias demo-study-text='$AGENT_PYTHON "$AGENT_SCRIPT_DIR/demo_study_partner.py" <<< "1"'
 
 # Interactive agent with memory
-alias agent-mem='uv run python "$AGENT_SCRIPT_DIR/ia_agent.py"'
-alias agent-mem-text='uv run python "$AGENT_SCRIPT_DIR/ia_agent.py" --text-only'
-alias agent-mem-interact='uv run python "$AGENT_SCRIPT_DIR/ia_agent.py" --interactive'
+alias agent-mem='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent-mem'
+alias agent-mem-text='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent-mem --text-only'
+alias agent-mem-interact='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent-mem --interactive'
+alias agent-mem-sessions='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent-mem --list-sessions'
 
 # Quick access with different models and voices
-alias agent-gemma='uv run python "$AGENT_SCRIPT_DIR/main.py" --model gemma3:latest'
-alias study-pf_dora='uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --voice pf_dora'
-alias study-fernando='uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --voice fernando'
+alias agent-gemma='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent --model gemma3:latest'
+alias study-pf_dora='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --voice pf_dora'
+alias study-fernando='$AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --voice fernando'
 
 # Common study topics shortcuts
 function study-topic() {
     case $1 in
         "general")
-            uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"
+            $AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"
             ;;
         "science")
             echo "Using science questions from questionnaires.json with specific filters would require custom handling"
-            uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"
+            $AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"
             ;;
         "history")
-            uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"
+            $AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --question-file "$AGENT_SCRIPT_DIR/sample_questions.json"
             ;;
         *)
             echo "Usage: study-topic [general|science|history]"
             echo "Defaulting to general study..."
-            uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py"
+            $AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study
             ;;
     esac
 }
@@ -65,7 +82,7 @@ function study-custom() {
         echo "Usage: study-custom <question_file.json>"
         echo "Example: study-custom my_questions.json"
     else
-        uv run python "$AGENT_SCRIPT_DIR/run_study_partner.py" --question-file "$1"
+        $AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" study --question-file "$1"
     fi
 }
 
@@ -73,10 +90,10 @@ function study-custom() {
 function agent-clipboard() {
     if command -v xclip &> /dev/null; then
         input=$(xclip -selection clipboard -o)
-        uv run python "$AGENT_SCRIPT_DIR/main.py" "$input"
+        $AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent "$input"
     elif command -v pbpaste &> /dev/null; then
         input=$(pbpaste)
-        uv run python "$AGENT_SCRIPT_DIR/main.py" "$input"
+        $AGENT_PYTHON -S "$AGENT_SCRIPT_DIR/agent_client.py" agent "$input"
     else
         echo "Clipboard utility not found. Please install xclip (Linux) or use pbpaste (macOS)"
     fi
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Cliente mínimo do daemon do agente (agent_daemon.py)
+
+Envia o programa, os argumentos, o diretório atual, o ambiente e a entrada padrão ao
+daemon por um socket Unix e escreve a saída à medida que ela chega. Usa só a biblioteca
+padrão, então pode rodar com `python -S`. Se o daemon não estiver rodando, executa o
+script diretamente, como antes.
+
+Uso:
+    python -S agent_client.py agent "listar arquivos no diretório atual"
+    echo "texto" | python -S agent_client.py tts --text-only
+
+Protocolo (os dois lados):
+    cliente -> daemon: 4 bytes (tamanho, big-endian) + cabeçalho JSON; depois, a entrada
+                       padrão em bytes, até o fim (shutdown de escrita)
+    daemon -> cliente: quadros de 1 byte de canal + 4 bytes de tamanho + dados:
+                       'p' pid do processo, 'o' stdout, 'e' stderr, 'x' código de saída
+"""
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import threading
+
+
+# Programas servidos pelo daemon: nome -> (módulo, script)
+PROGRAMS = {
+    "agent": ("main", "main.py"),
+    "agent-mem": ("ia_agent", "ia_agent.py"),
+    "tts": ("tts_response", "tts_response.py"),
+    "study": ("run_study_partner", "run_study_partner.py"),
+}
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_socket_path() -> str:
+    """Socket do daemon (AGENT_DAEMON_SOCKET, ou em XDG_RUNTIME_DIR, ou em /tmp/agent-<uid>)"""
+    if os.environ.get('AGENT_DAEMON_SOCKET'):
+        return os.environ['AGENT_DAEMON_SOCKET']
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    base = os.path.join(runtime, 'agent') if runtime else f"/tmp/agent-{os.getuid()}"
+    return os.path.join(base, 'daemon.sock')
+
+
+def send_frame(sock: socket.socket, channel: bytes, data: bytes) -> None:
+    sock.sendall(struct.pack('>cI', channel, len(data)) + data)
+
+
+def send_header(sock: socket.socket, header: dict) -> None:
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("conexão fechada pelo daemon")
+        data += chunk
+    return data
+
+
+def recv_frame(sock: socket.socket):
+    """Próximo quadro do daemon: (canal, dados)"""
+    channel, size = struct.unpack('>cI', recv_exact(sock, 5))
+    return channel, recv_exact(sock, size)
+
+
+def connect(path: str = None) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path or default_socket_path())
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def control(command: str, path: str = None, **fields) -> dict:
+    """Envia um comando de controle (status, stop, signal) e retorna a resposta do daemon"""
+    with connect(path) as sock:
+        send_header(sock, {"command": command, **fields})
+        _, data = recv_frame(sock)
+        return json.loads(data)
+
+
+def _forward_stdin(sock: socket.socket) -> None:
+    try:
+        while True:
+            data = os.read(0, 65536)
+            if not data:
+                break
+            sock.sendall(data)
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def run(program: str, argv: list, path: str = None) -> int:
+    """
+    Executa o programa no daemon, repassando a saída
+
+    Returns:
+        int: Código de saída do programa
+
+    Raises:
+        OSError: se o daemon não estiver rodando
+    """
+    return session(connect(path), program, argv, path)
+
+
+def session(sock: socket.socket, program: str, argv: list, path: str = None) -> int:
+    """Conduz uma execução em uma conexão já aberta com o daemon"""
+    send_header(sock, {
+        "program": program,
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+        "tty": sys.stdin.isatty(),
+    })
+    threading.Thread(target=_forward_stdin, args=(sock,), daemon=True).start()
+
+    pid = None
+
+    def on_interrupt(signum, frame):
+        # Ctrl+C vai para o processo no daemon, que decide como tratá-lo
+        if pid is None:
+            raise KeyboardInterrupt
+        threading.Thread(target=control, args=("signal", path), kwargs={"pid": pid, "signal": signum}, daemon=True).start()
+
+    previous = signal.signal(signal.SIGINT, on_interrupt)
+    outputs = {b'o': sys.stdout.buffer, b'e': sys.stderr.buffer}
+    try:
+        while True:
+            channel, data = recv_frame(sock)
+            if channel == b'x':
+                return struct.unpack('>i', data)[0]
+            if channel == b'p':
+                pid = int(data)
+            elif channel in outputs:
+                outputs[channel].write(data)
+                outputs[channel].flush()
+    except KeyboardInterrupt:
+        return 130
+    except OSError:
+        return 1
+    finally:
+        signal.signal(signal.SIGINT, previous)
+        sock.close()
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in PROGRAMS:
+        print(f"Uso: agent_client.py {{{','.join(PROGRAMS)}}} [argumentos...]", file=sys.stderr)
+        sys.exit(2)
+    program, argv = sys.argv[1], sys.argv[2:]
+
+    try:
+        sock = connect()
+    except OSError:
+        # Daemon não está rodando: executa o script neste processo (com o site completo)
+        script = os.path.join(ROOT, PROGRAMS[program][1])
+        os.execv(sys.executable, [sys.executable, script] + argv)
+    sys.exit(session(sock, program, argv))
+
+
+if __name__ == "__main__":
+    main()
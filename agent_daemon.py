@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Daemon residente do agente, atendendo os aliases por um socket Unix
+
+O daemon importa uma única vez tudo o que os programas usam (pydantic, cliente do
+Ollama, NumPy...). Cada pedido do cliente (agent_client.py) roda em um processo filho
+criado com fork: o filho já nasce com tudo carregado, recebe o diretório, o ambiente,
+os argumentos e a entrada padrão do cliente e devolve a saída em quadros pelo socket.
+Assim cada execução fica isolada (diretório, variáveis globais, sys.exit) e só paga o
+tempo do modelo.
+
+O Kokoro (torch) não é carregado no daemon: os pools de threads do OpenMP criados no
+pai não existem no filho depois do fork, e a síntese no filho pode travar. Ele fica
+carregado em um processo separado, o worker de TTS (tts_worker.py), que o daemon inicia
+com um interpretador novo; os filhos recebem o socket do worker em AGENT_TTS_SOCKET e
+sintetizam por ele.
+
+O processo principal tem uma thread só (o fork continua seguro) e lê o cabeçalho de
+cada conexão aos poucos, com um selector: um cliente que conecta e não envia nada não
+atrasa os outros e é descartado depois de HEADER_TIMEOUT segundos.
+
+Uso:
+    python agent_daemon.py start            # em segundo plano
+    python agent_daemon.py status
+    python agent_daemon.py stop
+    python agent_daemon.py serve --no-tts   # em primeiro plano, sem o worker de TTS
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from agent_client import PROGRAMS, ROOT, control, default_socket_path, send_frame
+from tts_worker import TTS_SOCKET_ENV
+
+
+# Segundos que uma conexão tem para enviar o cabeçalho do pedido
+HEADER_TIMEOUT = 5.0
+
+
+class _FrameWriter(io.RawIOBase):
+    """Escrita que vira quadros de um canal ('o' ou 'e') no socket do cliente"""
+
+    def __init__(self, sock: socket.socket, channel: bytes, lock: threading.Lock):
+        self.sock = sock
+        self.channel = channel
+        self.lock = lock
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        with self.lock:
+            send_frame(self.sock, self.channel, bytes(data))
+        return len(data)
+
+
+class _ClientStdin(io.TextIOWrapper):
+    """Entrada padrão do cliente; isatty() responde pelo terminal do cliente"""
+
+    def __init__(self, buffer, tty: bool):
+        super().__init__(buffer, encoding='utf-8', errors='replace')
+        self._tty = tty
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+class AgentDaemon:
+    """Servidor do socket Unix que pré-carrega os programas e atende cada pedido em um fork"""
+
+    def __init__(self, socket_path: Optional[str] = None, preload_tts: bool = True, idle_timeout: float = 0):
+        """
+        Args:
+            socket_path: Caminho do socket (padrão: agent_client.default_socket_path())
+            preload_tts: Manter o Kokoro carregado no worker de TTS
+            idle_timeout: Encerrar depois de tantos segundos sem pedidos (0: nunca)
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.tts_socket_path = f"{self.socket_path}.tts"
+        self.preload_tts = preload_tts
+        self.idle_timeout = idle_timeout
+        self.children: Dict[int, float] = {}
+        self.served = 0
+        self.started = time.time()
+        self.last_request = self.started
+        self.preload_time = 0.0
+        self.running = False
+        self._tts_worker: Optional[subprocess.Popen] = None
+        self._listener: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+        # Conexões esperando o cabeçalho: bytes já recebidos e prazo
+        self._pending: Dict[socket.socket, List[Any]] = {}
+
+    def preload(self) -> None:
+        """Importa os programas e o que eles usam sob demanda; o Kokoro vai para o worker de TTS"""
+        started = time.perf_counter()
+        for module, _ in PROGRAMS.values():
+            importlib.import_module(module)
+        import agent_functions
+        import ollama  # noqa: F401 (cliente HTTP já importado nos filhos)
+        agent_functions.FunctionCall  # Cria os modelos pydantic
+        self.preload_time = time.perf_counter() - started
+
+    def _start_tts_worker(self) -> None:
+        """Inicia o worker de TTS com um interpretador novo (não é um fork do daemon)"""
+        command = [
+            sys.executable, os.path.join(ROOT, 'tts_worker.py'),
+            '--socket', self.tts_socket_path, '--parent', str(os.getpid())
+        ]
+        self._tts_worker = subprocess.Popen(command, stdin=subprocess.DEVNULL)
+
+    def _stop_tts_worker(self) -> None:
+        if self._tts_worker is None:
+            return
+        self._tts_worker.terminate()
+        try:
+            self._tts_worker.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._tts_worker.kill()
+        self._tts_worker = None
+
+    def _bind(self) -> socket.socket:
+        directory = os.path.dirname(self.socket_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            try:
+                control("status", self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)  # Socket de um daemon que não está mais rodando
+            else:
+                raise RuntimeError(f"já existe um daemon em {self.socket_path}")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(64)
+        listener.setblocking(False)
+        return listener
+
+    def serve_forever(self) -> None:
+        self.preload()
+        self._listener = self._bind()
+        if self.preload_tts:
+            self._start_tts_worker()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self.running = True
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, 'running', False))
+        print(
+            f"Daemon do agente em {self.socket_path} (pid {os.getpid()}, "
+            f"pré-carga em {self.preload_time:.2f} s, "
+            f"TTS {'no worker (pid %d)' % self._tts_worker.pid if self._tts_worker else 'não carregado'})",
+            flush=True
+        )
+        try:
+            while self.running:
+                self._reap()
+                self._expire_pending()
+                events = self._selector.select(timeout=1.0)
+                if not events:
+                    idle = time.time() - self.last_request
+                    if self.idle_timeout and not self.children and not self._pending and idle > self.idle_timeout:
+                        break
+                    continue
+                for key, _ in events:
+                    if key.fileobj is self._listener:
+                        self._accept()
+                    else:
+                        self._read_header(key.fileobj)
+        finally:
+            for conn in list(self._pending):
+                self._drop(conn)
+            self._selector.close()
+            self._listener.close()
+            self._stop_tts_worker()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _accept(self) -> None:
+        try:
+            conn, _ = self._listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setblocking(False)
+        self._pending[conn] = [bytearray(), time.time() + HEADER_TIMEOUT]
+        self._selector.register(conn, selectors.EVENT_READ)
+
+    def _read_header(self, conn: socket.socket) -> None:
+        """Lê o que chegou do cabeçalho, sem passar dele (o que vem depois é a entrada do programa)"""
+        received = self._pending[conn][0]
+        if len(received) < 4:
+            missing = 4 - len(received)
+        else:
+            missing = 4 + struct.unpack('>I', received[:4])[0] - len(received)
+        try:
+            chunk = conn.recv(missing)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            chunk = b''
+        if not chunk:
+            self._drop(conn)  # O cliente desistiu antes de mandar o pedido
+            return
+        received += chunk
+        if len(received) < 4 or len(received) < 4 + struct.unpack('>I', received[:4])[0]:
+            return
+
+        self._selector.unregister(conn)
+        del self._pending[conn]
+        conn.setblocking(True)
+        try:
+            self._handle(conn, json.loads(received[4:]))
+        except Exception as e:
+            print(f"Erro ao atender um pedido: {e}", file=sys.stderr, flush=True)
+            conn.close()
+
+    def _drop(self, conn: socket.socket) -> None:
+        self._selector.unregister(conn)
+        del self._pending[conn]
+        conn.close()
+
+    def _expire_pending(self) -> None:
+        now = time.time()
+        for conn, (_, deadline) in list(self._pending.items()):
+            if now > deadline:
+                self._drop(conn)
+
+    def _reap(self) -> None:
+        # Só os filhos dos pedidos: o worker de TTS é esperado pelo seu Popen
+        for pid in list(self.children):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self.children.pop(pid, None)
+
+    def _handle(self, conn: socket.socket, header: Dict[str, Any]) -> None:
+        self.last_request = time.time()
+
+        command = header.get("command")
+        if command is not None:
+            send_frame(conn, b'o', json.dumps(self._control(command, header)).encode('utf-8'))
+            conn.close()
+            return
+
+        if header.get("program") not in PROGRAMS:
+            send_frame(conn, b'e', f"Programa desconhecido: {header.get('program')}\n".encode('utf-8'))
+            send_frame(conn, b'x', struct.pack('>i', 2))
+            conn.close()
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._run_child(conn, header)
+            finally:
+                os._exit(code)
+        self.children[pid] = time.time()
+        self.served += 1
+        conn.close()
+
+    def _control(self, command: str, header: Dict[str, Any]) -> Dict[str, Any]:
+        if command == "status":
+            return {
+                "pid": os.getpid(),
+                "uptime": time.time() - self.started,
+                "served": self.served,
+                "active": len(self.children),
+                "preload_time": self.preload_time,
+                "waiting": len(self._pending),
+                "tts": self._tts_worker.pid if self._tts_worker is not None else None,
+                "programs": sorted(PROGRAMS)
+            }
+        if command == "stop":
+            self.running = False
+            return {"stopping": True}
+        if command == "signal":
+            pid = header.get("pid")
+            if pid not in self.children:
+                return {"error": f"processo {pid} não pertence ao daemon"}
+            os.kill(pid, int(header.get("signal", signal.SIGINT)))
+            return {"signaled": pid}
+        return {"error": f"comando desconhecido: {command}"}
+
+    @staticmethod
+    def _reset_environment_objects() -> None:
+        """Refaz o que foi criado na importação com o ambiente do daemon (OLLAMA_HOST...)"""
+        import ollama
+        import ollama_gateway
+
+        # ollama.chat e as outras funções do módulo usam um Client criado na importação
+        importlib.reload(ollama)
+        ollama_gateway._gateway = None
+
+    def _run_child(self, conn: socket.socket, header: Dict[str, Any]) -> int:
+        """Executa um programa no processo filho, com o contexto do cliente"""
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        self._selector.close()
+        self._listener.close()
+        for other in self._pending:
+            other.close()
+
+        lock = threading.Lock()
+        send_frame(conn, b'p', str(os.getpid()).encode())
+        os.chdir(header.get("cwd") or ROOT)
+        os.environ.clear()
+        os.environ.update(header.get("env") or {})
+        if self._tts_worker is not None:
+            os.environ[TTS_SOCKET_ENV] = self.tts_socket_path
+        self._reset_environment_objects()
+        module_name, script = PROGRAMS[header["program"]]
+        sys.argv = [script] + list(header.get("argv") or [])
+        sys.stdin = _ClientStdin(conn.makefile('rb'), bool(header.get("tty")))
+        sys.stdout = io.TextIOWrapper(io.BufferedWriter(_FrameWriter(conn, b'o', lock)), encoding='utf-8', line_buffering=True)
+        sys.stderr = io.TextIOWrapper(io.BufferedWriter(_FrameWriter(conn, b'e', lock)), encoding='utf-8', line_buffering=True)
+
+        code = 0
+        try:
+            importlib.import_module(module_name).main()
+        except SystemExit as e:
+            if isinstance(e.code, int) or e.code is None:
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except KeyboardInterrupt:
+            code = 130
+        except Exception:
+            traceback.print_exc()
+            code = 1
+
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            send_frame(conn, b'x', struct.pack('>i', code))
+        except OSError:
+            pass  # O cliente já foi embora
+        return code
+
+
+def start_in_background(socket_path: str, preload_tts: bool, idle_timeout: float, timeout: float = 120.0) -> Dict[str, Any]:
+    """Inicia `serve` em um processo separado e espera o socket responder"""
+    from question_cache import default_cache_dir
+
+    default_cache_dir().mkdir(parents=True, exist_ok=True)
+    log = open(default_cache_dir() / 'daemon.log', 'ab')
+    command = [sys.executable, os.path.abspath(__file__), 'serve', '--socket', socket_path, '--idle-timeout', str(idle_timeout)]
+    if not preload_tts:
+        command.append('--no-tts')
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"o daemon terminou na partida (veja {log.name})")
+        try:
+            return control("status", socket_path)
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"o daemon não respondeu em {timeout:.0f} s (veja {log.name})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon residente do agente (socket Unix)")
+    parser.add_argument('action', choices=['serve', 'start', 'stop', 'status'], help='O que fazer')
+    parser.add_argument('--socket', default=None, help='Caminho do socket (padrão: $XDG_RUNTIME_DIR/agent/daemon.sock)')
+    parser.add_argument('--no-tts', action='store_true', help='Não iniciar o worker de TTS com o Kokoro carregado')
+    parser.add_argument('--idle-timeout', type=float, default=0, help='Encerrar após N segundos sem pedidos (0: nunca)')
+    args = parser.parse_args()
+    socket_path = args.socket or default_socket_path()
+
+    if args.action == 'serve':
+        AgentDaemon(socket_path, preload_tts=not args.no_tts, idle_timeout=args.idle_timeout).serve_forever()
+        return
+
+    try:
+        if args.action == 'start':
+            status = start_in_background(socket_path, not args.no_tts, args.idle_timeout)
+        else:
+            status = control(args.action, socket_path)
+    except OSError:
+        print(f"Nenhum daemon rodando em {socket_path}")
+        sys.exit(1)
+    except RuntimeError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+    if args.action == 'stop':
+        print("Daemon encerrado")
+    else:
+        print(
+            f"Daemon rodando (pid {status['pid']}) há {status['uptime']:.0f} s: "
+            f"{status['served']} execuções, {status['active']} em andamento, "
+            f"pré-carga em {status['preload_time']:.2f} s, "
+            f"TTS {'no worker (pid %d)' % status['tts'] if status['tts'] else 'não carregado'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
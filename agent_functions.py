@@ -0,0 +1,205 @@
+"""
+Funções que o agente pode chamar: modelos, schema e representação como comando
+
+Módulo leve, que só importa a biblioteca padrão. Os modelos pydantic (OpenProgram,
+ExecuteCommand, ListDirectory, ReadFile, FunctionCall e FunctionAdapter) são criados no
+primeiro acesso, então `main.py --help` e as respostas vindas do cache não pagam a
+importação do pydantic.
+
+Exemplo:
+    from agent_functions import FunctionCall, get_command_string
+
+    function_call = FunctionCall.model_validate(parsed_response)
+    print(get_command_string(function_call))
+"""
+from types import SimpleNamespace
+from typing import Any, Dict
+
+
+# Schema for structured output with multiple possible functions
+FUNCTION_CALL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "thought": {
+            "type": "string",
+            "description": "The reasoning behind the function call"
+        },
+        "function": {
+            "type": "object",
+            "oneOf": [
+                {
+                    "type": "object",
+                    "properties": {
+                        "function_name": {"const": "open_program"},
+                        "program_name": {"type": "string", "description": "Name of the program to open"},
+                        "arguments": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "default": []
+                        }
+                    },
+                    "required": ["function_name", "program_name"]
+                },
+                {
+                    "type": "object",
+                    "properties": {
+                        "function_name": {"const": "execute_command"},
+                        "command": {"type": "string", "description": "The shell command to execute"},
+                        "arguments": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "default": []
+                        }
+                    },
+                    "required": ["function_name", "command"]
+                },
+                {
+                    "type": "object",
+                    "properties": {
+                        "function_name": {"const": "list_directory"},
+                        "path": {"type": "string", "description": "Path to the directory to list"}
+                    },
+                    "required": ["function_name"]
+                },
+                {
+                    "type": "object",
+                    "properties": {
+                        "function_name": {"const": "read_file"},
+                        "path": {"type": "string", "description": "Path to the file to read"}
+                    },
+                    "required": ["function_name", "path"]
+                }
+            ],
+            "discriminator": {
+                "propertyName": "function_name"
+            }
+        }
+    },
+    "required": ["thought", "function"]
+}
+
+# Schema de cada passo do loop de várias etapas (main.run_agent_loop): uma lista de chamadas,
+# vazia quando o modelo já pode responder
+AGENT_LOOP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "thought": {
+            "type": "string",
+            "description": "The reasoning behind this step"
+        },
+        "calls": {
+            "type": "array",
+            "items": FUNCTION_CALL_SCHEMA["properties"]["function"],
+            "description": "Functions to call now (they run together and cannot see each other's results); empty when done"
+        },
+        "answer": {
+            "type": "string",
+            "description": "Final answer to the user, when no more calls are needed"
+        }
+    },
+    "required": ["thought", "calls"]
+}
+
+# Schema do último passo permitido: só a resposta, sem novas chamadas
+AGENT_ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "thought": AGENT_LOOP_SCHEMA["properties"]["thought"],
+        "answer": AGENT_LOOP_SCHEMA["properties"]["answer"]
+    },
+    "required": ["thought", "answer"]
+}
+
+# Funções sem efeitos colaterais: rodam em paralelo entre si (e com --allow-read, sem --execute)
+READ_ONLY_FUNCTIONS = frozenset({"list_directory", "read_file"})
+
+# Valores padrão dos parâmetros opcionais de cada função
+FUNCTION_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "open_program": {"arguments": []},
+    "execute_command": {"arguments": []},
+    "list_directory": {"path": "."},
+    "read_file": {}
+}
+
+MODELS = ("OpenProgram", "ExecuteCommand", "ListDirectory", "ReadFile", "FunctionCall", "FunctionAdapter")
+
+
+def _define_models() -> None:
+    """Cria os modelos pydantic (uma única vez)"""
+    global OpenProgram, ExecuteCommand, ListDirectory, ReadFile, FunctionCall, FunctionAdapter
+    from typing import Literal, Union
+    from pydantic import BaseModel, Field, TypeAdapter
+
+    class OpenProgram(BaseModel):
+        """Function to open a program on the system"""
+        function_name: Literal["open_program"] = Field(description="The name of the function to call")
+        program_name: str = Field(description="Name of the program to open (e.g., 'kate', 'firefox', 'libreoffice')")
+        arguments: list[str] = Field(default=[], description="Additional arguments to pass to the program")
+
+    class ExecuteCommand(BaseModel):
+        """Function to execute a shell command"""
+        function_name: Literal["execute_command"] = Field(description="The name of the function to call")
+        command: str = Field(description="The shell command to execute")
+        arguments: list[str] = Field(default=[], description="Additional arguments to pass to the command")
+
+    class ListDirectory(BaseModel):
+        """Function to list directory contents"""
+        function_name: Literal["list_directory"] = Field(description="The name of the function to call")
+        path: str = Field(default=".", description="Path to the directory to list")
+
+    class ReadFile(BaseModel):
+        """Function to read a file"""
+        function_name: Literal["read_file"] = Field(description="The name of the function to call")
+        path: str = Field(description="Path to the file to read")
+
+    class FunctionCall(BaseModel):
+        """Represents a function call from the AI model"""
+        thought: str = Field(description="The reasoning behind the function call")
+        function: Union[OpenProgram, ExecuteCommand, ListDirectory, ReadFile] = Field(description="The function to call")
+
+    for model in (OpenProgram, ExecuteCommand, ListDirectory, ReadFile, FunctionCall):
+        model.__module__ = __name__
+        model.__qualname__ = model.__name__
+
+    # Validates the "function" object on its own, as soon as it closes in a streamed response
+    FunctionAdapter = TypeAdapter(Union[OpenProgram, ExecuteCommand, ListDirectory, ReadFile])
+
+
+def __getattr__(name: str) -> Any:
+    if name in MODELS:
+        _define_models()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def cached_function_call(data: Dict[str, Any]) -> SimpleNamespace:
+    """
+    Chamada de função a partir de uma resposta já validada (por exemplo, vinda do cache)
+
+    Tem os mesmos atributos de FunctionCall (thought, function.function_name, ...), com os
+    valores padrão preenchidos, sem importar o pydantic.
+    """
+    function = dict(data["function"])
+    for key, value in FUNCTION_DEFAULTS.get(function.get("function_name"), {}).items():
+        function.setdefault(key, list(value) if isinstance(value, list) else value)
+    return SimpleNamespace(thought=data.get("thought", ""), function=SimpleNamespace(**function))
+
+
+def get_command_string(function_call):
+    """
+    Retorna uma representação em string do comando a ser executado
+    """
+    func = function_call.function
+
+    if func.function_name == "open_program":
+        cmd = [func.program_name] + (func.arguments or [])
+        return " ".join(cmd)
+    elif func.function_name == "execute_command":
+        cmd = [func.command] + (func.arguments or [])
+        return " ".join(cmd)
+    elif func.function_name == "list_directory":
+        return f"ls -la {func.path}"
+    elif func.function_name == "read_file":
+        return f"cat {func.path}"
+    else:
+        return f"Função desconhecida: {func.function_name}"
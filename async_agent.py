@@ -0,0 +1,275 @@
+"""
+Núcleo assíncrono (asyncio) do agente com memória (ia_agent.py)
+
+A entrada do teclado, a geração do modelo (ollama.AsyncClient, pelo OllamaGateway), a
+síntese e a reprodução da fala rodam como tarefas do mesmo event loop. Cada resposta é
+uma tarefa; uma nova mensagem ou Ctrl+C a cancela na hora: o stream do Ollama é fechado
+(o que interrompe a geração no servidor) e a fala para, sem esperar o fim de nenhum dos
+dois. O que já tinha sido respondido fica no histórico, marcado como interrompido.
+
+Exemplo:
+    agent = AsyncIA_Agent(model='gemma3:latest', stream=True)
+    agent.start_conversation()   # ou: await agent.conversation()
+"""
+import asyncio
+import signal
+import sys
+import threading
+from typing import AsyncIterator, Callable, Optional
+
+from ia_agent import (
+    MEMORY_RESPONSE_SCHEMA,
+    IA_Agent,
+    ConversationMemory,
+    build_memory_messages,
+    parse_memory_response
+)
+from json_stream import astream_chat
+from ollama_gateway import format_timing, get_gateway
+from speech_pipeline import AsyncSpeechPipeline
+
+
+# Marca acrescentada à resposta parcial guardada no histórico quando ela é cancelada
+INTERRUPTED_MARK = " [resposta interrompida pelo usuário]"
+
+
+async def arun_agent_with_memory(
+    user_input: str,
+    memory: ConversationMemory,
+    model: str = 'gemma3:latest',
+    on_response_delta: Optional[Callable[[str], None]] = None
+) -> str:
+    """
+    run_agent_with_memory em asyncio, sempre em streaming
+
+    Se a tarefa for cancelada, a geração é interrompida e o trecho da resposta já gerado
+    entra no histórico com INTERRUPTED_MARK, para o modelo saber onde parou.
+    """
+    memory.add_message("user", user_input)
+    partial = []
+
+    def on_string_delta(key, delta):
+        if key == 'response':
+            partial.append(delta)
+            if on_response_delta is not None:
+                on_response_delta(delta)
+
+    try:
+        response_content = await astream_chat(
+            model,
+            build_memory_messages(memory),
+            format=MEMORY_RESPONSE_SCHEMA,
+            options={'temperature': 0.7},
+            client=get_gateway(),
+            on_string_delta=on_string_delta
+        )
+    except asyncio.CancelledError:
+        if partial:
+            memory.add_message("assistant", "".join(partial) + INTERRUPTED_MARK)
+        raise
+
+    response_text = parse_memory_response(response_content)
+    if response_text is None:
+        return "Erro ao analisar a resposta do modelo"
+    memory.add_message("assistant", response_text)
+    return response_text
+
+
+class AsyncIA_Agent(IA_Agent):
+    """
+    IA_Agent com o loop de conversa em asyncio e respostas canceláveis
+
+    Mesma memória, sessões e opções do IA_Agent; a fala usa o AsyncSpeechPipeline.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.speech_factory = lambda: AsyncSpeechPipeline(voice=self.voice, repo_id='hexgrad/Kokoro-82M')
+        self.turn: Optional[asyncio.Task] = None
+        self.interrupted = 0
+        self._reprompt = False
+        self._conversation: Optional[asyncio.Task] = None
+
+    async def aprocess_input(self, user_input: str, text_only: bool = False) -> str:
+        """
+        Responde à mensagem em texto e/ou áudio; retorna quando a fala terminar
+
+        A fala começa na primeira frase completa, enquanto o modelo ainda gera o restante.
+        """
+        print(f"\nUsuário: {user_input}")
+
+        speech = None if text_only else self.speech_factory()
+        self.speech = speech
+        spoken = []
+
+        def on_response_delta(delta):
+            if self.stream:
+                print(delta, end="", flush=True)
+            if speech is not None:
+                spoken.append(delta)
+                speech.feed(delta)
+
+        try:
+            if self.stream:
+                print("\nAssistente: ", end="", flush=True)
+            response_text = await arun_agent_with_memory(
+                user_input, self.memory, model=self.model, on_response_delta=on_response_delta
+            )
+            if self.stream:
+                print()
+            else:
+                print(f"\nAssistente: {response_text}")
+            if self.show_timings:
+                print(format_timing(get_gateway().last_timing))
+
+            if speech is not None:
+                # Respostas que não vieram do campo "response" (mensagens de erro) são faladas inteiras
+                if not spoken:
+                    speech.feed(response_text)
+                speech.finish()
+                await speech.wait()
+            return response_text
+        except asyncio.CancelledError:
+            if speech is not None:
+                speech.cancel()
+            raise
+        finally:
+            if self.speech is speech:
+                self.speech = None
+
+    def process_input(self, user_input: str, text_only: bool = False, wait_audio: bool = True):
+        """
+        Mesma interface do IA_Agent, para quem chama fora de um event loop (modo de um prompt)
+
+        A resposta roda em um event loop próprio, que termina com ela: a fala é sempre
+        esperada (wait_audio é ignorado). Dentro de um event loop, use aprocess_input.
+        """
+        return asyncio.run(self.aprocess_input(user_input, text_only))
+
+    def stop_speaking(self):
+        """Interrompe a fala em andamento, se houver"""
+        if self.speech is not None:
+            self.speech.cancel()
+        self.speech = None
+
+    @property
+    def busy(self) -> bool:
+        """Há uma resposta sendo gerada ou falada"""
+        return self.turn is not None and not self.turn.done()
+
+    async def submit(self, user_input: str, text_only: bool = False) -> asyncio.Task:
+        """Cancela a resposta em andamento (se houver) e começa a responder a nova mensagem"""
+        await self.cancel_turn()
+        self.turn = asyncio.create_task(self._respond(user_input, text_only), name="agent-turn")
+        return self.turn
+
+    async def cancel_turn(self) -> bool:
+        """Cancela a resposta em andamento e espera a limpeza; retorna False se não havia nenhuma"""
+        turn = self.turn
+        if turn is None or turn.done():
+            return False
+        turn.cancel()
+        await asyncio.wait({turn})
+        return True
+
+    def interrupt(self) -> None:
+        """Ctrl+C: cancela a resposta em andamento ou, sem resposta, encerra a conversa"""
+        if self.busy:
+            self._reprompt = True
+            self.turn.cancel()
+        elif self._conversation is not None:
+            self._conversation.cancel()
+
+    async def _respond(self, user_input: str, text_only: bool) -> Optional[str]:
+        try:
+            response_text = await self.aprocess_input(user_input, text_only)
+        except asyncio.CancelledError:
+            self.interrupted += 1
+            print("\n[Resposta interrompida]")
+            # Interrompida por Ctrl+C: pede a próxima mensagem (se foi uma nova mensagem, ela já está sendo respondida)
+            if self._reprompt and self.running:
+                print("\nSua mensagem: ", end="", flush=True)
+            self._reprompt = False
+            raise
+        except Exception as e:
+            print(f"Erro durante a conversa: {e}")
+            response_text = None
+        if self.running:
+            print("\nSua mensagem: ", end="", flush=True)
+        return response_text
+
+    async def _stdin_lines(self) -> AsyncIterator[str]:
+        """Linhas do teclado, lidas por uma thread daemon (input() não pode ser cancelado)"""
+        loop = asyncio.get_running_loop()
+        lines: asyncio.Queue = asyncio.Queue()
+
+        def reader():
+            try:
+                for line in iter(sys.stdin.readline, ''):
+                    loop.call_soon_threadsafe(lines.put_nowait, line)
+                loop.call_soon_threadsafe(lines.put_nowait, None)
+            except RuntimeError:
+                pass  # O event loop já foi fechado
+
+        threading.Thread(target=reader, name="stdin-reader", daemon=True).start()
+        while (line := await lines.get()) is not None:
+            yield line
+
+    async def conversation(self, text_only: bool = False, lines: Optional[AsyncIterator[str]] = None):
+        """
+        Conversa interativa: cada linha digitada vira uma resposta, que a próxima linha cancela
+
+        Args:
+            lines: Fonte das mensagens (padrão: o teclado)
+        """
+        self.running = True
+        self._conversation = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.interrupt)
+            handles_sigint = True
+        except (NotImplementedError, RuntimeError, ValueError):
+            handles_sigint = False  # Fora da thread principal ou sem suporte a sinais no loop
+
+        print("Iniciando conversa com o agente de IA.")
+        print("Digite 'sair' para encerrar a conversa.")
+        print("Digite 'limpar' para limpar o histórico da conversa.")
+        print("Digite 'resumo' para ver um resumo da conversa.")
+        print("Uma nova mensagem ou Ctrl+C interrompe a resposta em andamento.")
+        print("-" * 50)
+        print("\nSua mensagem: ", end="", flush=True)
+
+        try:
+            async for line in (lines if lines is not None else self._stdin_lines()):
+                user_input = line.strip()
+                if user_input.lower() in ['sair', 'exit', 'quit']:
+                    print("Encerrando conversa...")
+                    break
+                elif user_input.lower() in ['limpar', 'clear']:
+                    await self.cancel_turn()
+                    self.memory.clear()
+                    print("Histórico da conversa limpo.")
+                elif user_input.lower() == 'resumo':
+                    print(f"\nResumo da conversa:\n{self.memory.get_summary()}")
+                elif user_input:
+                    await self.submit(user_input, text_only)
+                    continue
+                else:
+                    continue
+                print("\nSua mensagem: ", end="", flush=True)
+            else:
+                # Fim da entrada: a última resposta termina normalmente
+                if self.turn is not None:
+                    await asyncio.wait({self.turn})
+        except asyncio.CancelledError:
+            print("\n\nConversa interrompida pelo usuário.")
+        finally:
+            self.running = False
+            await self.cancel_turn()
+            self._conversation = None
+            if handles_sigint:
+                loop.remove_signal_handler(signal.SIGINT)
+
+    def start_conversation(self, text_only: bool = False):
+        """Inicia a conversa interativa em um event loop próprio"""
+        asyncio.run(self.conversation(text_only))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória e tempo de carga: modelos pydantic x baralho em colunas
+
+Para cada tamanho, compara:
+- memória de QuestionItem + SpacedRepetitionState + histórico em dicts com a do ColumnarDeck
+- tempo de carga (JSON + pydantic x np.load de um .npz)
+- tempo para registrar uma resposta em todos os cartões (update um a um x vetorizado)
+
+Uso:
+    python bench_columnar_deck.py
+    python bench_columnar_deck.py --sizes 10000 100000 500000
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from columnar_deck import ColumnarDeck
+from study_partner import QuestionItem, SpacedRepetitionState
+
+
+def synthetic_items(size: int):
+    return [{"question": f"Qual é o termo número {i} do glossário?", "answer": f"Termo {i}"} for i in range(size)]
+
+
+def build_models(items):
+    questions = [QuestionItem(**item) for item in items]
+    states = {q.card_id: SpacedRepetitionState() for q in questions}
+    history = [
+        {'question': q.question, 'correct_answer': q.answer, 'selected_answer': q.answer,
+         'is_correct': True, 'timestamp': datetime.now().isoformat()}
+        for q in questions
+    ]
+    return questions, states, history
+
+
+def build_columnar(items):
+    deck = ColumnarDeck.from_items(items)
+    # Histórico equivalente em colunas: linha, acerto e momento
+    history = (np.arange(len(deck)), np.ones(len(deck), dtype=bool), np.full(len(deck), time.time()))
+    return deck, history
+
+
+def traced(build, *args):
+    """Memória alocada (MB) e tempo (s) para construir o resultado"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build(*args)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 1e6, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do baralho em colunas")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 500_000], help='Tamanhos dos baralhos')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            items = synthetic_items(size)
+            json_path = os.path.join(tmp, f"deck_{size}.json")
+            npz_path = os.path.join(tmp, f"deck_{size}.npz")
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(items, f)
+
+            (questions, states, _), models_mb, _ = traced(build_models, items)
+            (deck, _), columnar_mb, _ = traced(build_columnar, items)
+            deck.save(npz_path)
+
+            started = time.perf_counter()
+            with open(json_path, 'r', encoding='utf-8') as f:
+                build_models(json.load(f))
+            models_load = time.perf_counter() - started
+            started = time.perf_counter()
+            ColumnarDeck.load(npz_path)
+            columnar_load = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for state in states.values():
+                state.update(True)
+            models_update = time.perf_counter() - started
+            started = time.perf_counter()
+            deck.update(np.arange(size), 5)
+            columnar_update = time.perf_counter() - started
+
+            print(f"{size:>8} cartões")
+            print(f"  memória:     modelos {models_mb:8.1f} MB | colunas {columnar_mb:8.1f} MB | {models_mb / columnar_mb:5.1f}x")
+            print(f"  carga:       modelos {models_load:8.3f} s  | colunas {columnar_load:8.3f} s  | {models_load / columnar_load:5.0f}x")
+            print(f"  atualização: modelos {models_update:8.3f} s  | colunas {columnar_update:8.3f} s  | {models_update / columnar_update:5.0f}x")
+            del questions, states, deck
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark da escolha da próxima pergunta em baralhos sintéticos grandes
+
+Compara a fila de revisões (heap) usada pelo StudySession com a varredura completa
+da lista de perguntas feita antes dela. Parte dos cartões já foi revisada (alguns
+atrasados, outros agendados para o futuro) e o restante nunca foi visto.
+
+Uso:
+    python bench_due_queue.py                       # 10k, 100k e 1M cartões
+    python bench_due_queue.py --sizes 10000 50000 --rounds 2000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from study_partner import QuestionItem, SpacedRepetitionState, StudySession
+
+
+def synthetic_session(size: int, reviewed: float = 0.8) -> StudySession:
+    """Baralho com `reviewed` dos cartões já revisados, metade deles atrasados"""
+    now = datetime.now()
+    questions = [QuestionItem(question=f"Pergunta {i}?", answer=f"Resposta {i}") for i in range(size)]
+    states = {}
+    for item in questions[:int(size * reviewed)]:
+        offset = timedelta(hours=random.uniform(-240, 240))
+        states[item.card_id] = SpacedRepetitionState(repetition_count=1, last_review=now, next_review=now + offset)
+    return StudySession(questions=questions, question_states=states)
+
+
+def scan_select(session: StudySession) -> QuestionItem:
+    """Escolha por varredura completa (algoritmo anterior à fila de revisões)"""
+    now = datetime.now()
+    reviewable = []
+    for q in session.questions:
+        if q.card_id not in session.question_states:
+            session.question_states[q.card_id] = SpacedRepetitionState()
+        state = session.question_states[q.card_id]
+        if state.next_review is None or state.next_review <= now:
+            reviewable.append(q)
+    if not reviewable:
+        random.shuffle(session.questions)
+        reviewable = [session.questions[0]]
+    return random.choice(reviewable)
+
+
+def answer(session: StudySession, item: QuestionItem) -> None:
+    """Responde corretamente e reagenda o cartão (como check_answer)"""
+    state = session.question_states.get(item.card_id) or SpacedRepetitionState()
+    state.update(True)
+    session.record_state(item.card_id, state)
+
+
+def measure(session: StudySession, select, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        answer(session, select(session))
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da escolha da próxima pergunta")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help='Tamanhos dos baralhos')
+    parser.add_argument('--rounds', type=int, default=1000, help='Perguntas respondidas com a fila de revisões')
+    parser.add_argument('--scan-rounds', type=int, default=5, help='Perguntas respondidas com a varredura')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        session = synthetic_session(size)
+        started = time.perf_counter()
+        session._ensure_index()
+        build = time.perf_counter() - started
+        heap = measure(session, lambda s: s._select_question(), args.rounds)
+
+        session = synthetic_session(size)
+        scan = measure(session, scan_select, args.scan_rounds)
+        print(
+            f"{size:>9} cartões: fila {heap * 1e6:8.1f} µs/pergunta (montagem {build * 1000:7.1f} ms) | "
+            f"varredura {scan * 1e3:8.1f} ms/pergunta | {scan / heap:8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
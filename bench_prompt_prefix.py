@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark da avaliação do prompt por turno no agente com memória
+
+Compara a montagem atual das mensagens (instruções em uma mensagem de sistema e histórico
+enviado sem alterações, ver ia_agent.build_memory_messages) com a montagem antiga, que
+acrescentava sufixos a cada mensagem do usuário e repetia a entrada atual. Com o prefixo
+estável, o Ollama reaproveita o KV cache e só avalia as mensagens novas: o tempo de
+avaliação do prompt fica constante enquanto a conversa cresce.
+
+Uso:
+    python bench_prompt_prefix.py                  # Ollama local (modelo gemma3:latest)
+    python bench_prompt_prefix.py --fake           # servidor fake com KV cache simulado
+    python bench_prompt_prefix.py --turns 30 --model llama3.2
+"""
+import argparse
+import json
+import statistics
+
+from ia_agent import MEMORY_RESPONSE_SCHEMA, ConversationMemory, build_memory_messages
+from ollama_gateway import configure_gateway, get_gateway
+
+
+QUESTIONS = [
+    "Quais são as capitais dos estados do Sul do Brasil?",
+    "E qual delas tem a maior população?",
+    "Que rios passam por ela?",
+    "Quanto tempo leva uma viagem de carro até São Paulo?",
+    "Quais pratos típicos devo experimentar por lá?",
+]
+
+LEGACY_INSTRUCTIONS = (
+    "\n\nInstruções:\n- Responda com um pensamento e uma resposta clara\n"
+    "- Se apropriado, inclua uma função a ser executada\n- Mantenha o contexto da conversa"
+)
+LEGACY_NO_MARKDOWN = "\n\nPor favor, responda sem usar formatação markdown (sem asteriscos, negrito, itálico, etc.)."
+
+
+def legacy_messages(memory: ConversationMemory, user_input: str):
+    """Montagem anterior: entrada atual repetida com as instruções e sufixo em toda mensagem do usuário"""
+    messages = memory.get_context() + [{'role': 'user', 'content': user_input + LEGACY_INSTRUCTIONS}]
+    return [
+        {'role': msg['role'], 'content': msg['content'] + LEGACY_NO_MARKDOWN} if msg['role'] == 'user' else msg
+        for msg in messages
+    ]
+
+
+def run_conversation(model: str, turns: int, stable: bool):
+    """Conversa de `turns` turnos; retorna [(tokens avaliados, segundos de avaliação do prompt)]"""
+    memory = ConversationMemory(max_messages=1000)
+    gateway = get_gateway()
+    results = []
+    for turn in range(turns):
+        user_input = QUESTIONS[turn % len(QUESTIONS)]
+        memory.add_message("user", user_input)
+        messages = build_memory_messages(memory) if stable else legacy_messages(memory, user_input)
+        response = gateway.chat(
+            model=model,
+            messages=messages,
+            format=MEMORY_RESPONSE_SCHEMA,
+            options={'temperature': 0, 'num_predict': 80}
+        )
+        try:
+            reply = json.loads(response['message']['content']).get('response', '')
+        except json.JSONDecodeError:
+            reply = response['message']['content']
+        memory.add_message("assistant", reply)
+        timing = gateway.last_timing or {}
+        results.append((timing.get("prompt_tokens", 0), timing.get("prompt_eval", 0.0)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da avaliação do prompt por turno")
+    parser.add_argument('--model', '-m', default='gemma3:latest', help='Modelo Ollama a ser usado')
+    parser.add_argument('--turns', type=int, default=20, help='Turnos da conversa')
+    parser.add_argument('--fake', action='store_true', help='Usar o servidor fake (0,2 ms por token de prompt avaliado)')
+    args = parser.parse_args()
+
+    server = None
+    if args.fake:
+        import ollama
+        from fake_ollama import FakeOllamaServer
+        reply = json.dumps({"thought": "ok", "response": "Uma resposta de tamanho razoável para o benchmark. " * 3})
+        server = FakeOllamaServer(lambda request: reply, prompt_token_delay=0.0002).start()
+        configure_gateway(client=ollama.Client(host=server.url))
+
+    try:
+        for stable in (False, True):
+            results = run_conversation(args.model, args.turns, stable)
+            label = "estável" if stable else "antigo"
+            print(f"\nMontagem {label}:")
+            print("turno | tokens avaliados | avaliação do prompt")
+            for turn, (tokens, seconds) in enumerate(results, 1):
+                print(f"{turn:5d} | {tokens:16d} | {seconds * 1e3:9.1f} ms")
+            later = results[1:]
+            print(
+                f"Média a partir do 2º turno: {statistics.mean(t for t, _ in later):.0f} tokens, "
+                f"{statistics.mean(s for _, s in later) * 1e3:.1f} ms; "
+                f"último turno: {later[-1][0]} tokens, {later[-1][1] * 1e3:.1f} ms"
+            )
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca do cache semântico com muitos pedidos sintéticos
+
+Os embeddings são agrupados em torno de "intenções" (como pedidos reais, que se repetem
+com outras palavras). Compara a busca exata na matriz com o índice IVF do VectorIndex:
+tempo por consulta, concordância do vizinho mais próximo, tempo de treino e memória.
+
+Uso:
+    python bench_semantic_cache.py                        # 10k e 100k pedidos, 768 dimensões
+    python bench_semantic_cache.py --sizes 50000 --dim 384 --queries 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from semantic_cache import VectorIndex
+
+
+def synthetic_embeddings(size: int, dim: int, intents: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(intents, dim)).astype(np.float32)
+    labels = rng.integers(0, intents, size)
+    return centers[labels] + 0.3 * rng.normal(size=(size, dim)).astype(np.float32)
+
+
+def measure(index: VectorIndex, queries: np.ndarray) -> tuple:
+    started = time.perf_counter()
+    nearest = [index.search(query)[0][0] for query in queries]
+    return (time.perf_counter() - started) / len(queries), np.array(nearest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da busca do cache semântico")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help='Números de pedidos')
+    parser.add_argument('--dim', type=int, default=768, help='Dimensão dos embeddings (nomic-embed-text: 768)')
+    parser.add_argument('--queries', type=int, default=1000, help='Consultas por medição')
+    parser.add_argument('--nprobe', type=int, default=4, help='Listas percorridas por consulta no IVF')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        vectors = synthetic_embeddings(size, args.dim, max(1, size // 20), rng)
+        queries = vectors[rng.integers(0, size, args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+        exact = VectorIndex(args.dim, train_size=size + 1)
+        exact.add(vectors)
+        exact_time, exact_nearest = measure(exact, queries)
+
+        ivf = VectorIndex(args.dim, train_size=size + 1, nprobe=args.nprobe)
+        ivf.add(vectors)
+        started = time.perf_counter()
+        ivf.train()
+        train = time.perf_counter() - started
+        ivf_time, ivf_nearest = measure(ivf, queries)
+
+        agreement = np.mean(exact_nearest == ivf_nearest)
+        print(
+            f"{size:>7} pedidos: exata {exact_time * 1e3:7.3f} ms | IVF {ivf_time * 1e3:7.3f} ms "
+            f"({exact_time / ivf_time:5.1f}x, mesmo vizinho em {agreement:.1%}) | "
+            f"treino {train:5.2f} s | {ivf.nbytes() / 2**20:6.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
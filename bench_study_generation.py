@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark das estratégias de geração de perguntas do parceiro de estudos
+
+Compara "separate" (reformulação e distratores em duas chamadas) com "combined"
+(uma única chamada estruturada), medindo o tempo e o número de chamadas por pergunta.
+
+Uso:
+    python bench_study_generation.py                 # contra o Ollama local
+    python bench_study_generation.py --fake 0.5      # servidor fake com 0.5 s por chamada
+"""
+import argparse
+import json
+import statistics
+import time
+
+import ollama
+
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import get_gateway
+from study_partner import QuestionItem, StudySession
+
+
+def fake_responder(request):
+    """Responde a qualquer um dos três schemas usados pelo parceiro de estudos"""
+    properties = request.get('format', {}).get('properties', {})
+    response = {}
+    if 'reformulated_question' in properties:
+        response['reformulated_question'] = "Pergunta reformulada?"
+    if 'wrong_answers' in properties:
+        response['wrong_answers'] = ["Errada 1", "Errada 2", "Errada 3"]
+    return json.dumps(response)
+
+
+class CountingClient:
+    """Conta as chamadas feitas ao cliente do Ollama"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+
+    def chat(self, *args, **kwargs):
+        self.calls += 1
+        return self.client.chat(*args, **kwargs)
+
+
+def run(strategy: str, questions, rounds: int, client) -> dict:
+    get_gateway().client = client
+    session = StudySession(questions=questions, generation_strategy=strategy)
+    timings = []
+    client.calls = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        question = session.get_next_question()
+        timings.append(time.perf_counter() - started)
+        session.check_answer(question.correct_answer)
+    return {
+        "strategy": strategy,
+        "mean_s": statistics.mean(timings),
+        "p50_s": statistics.median(timings),
+        "calls_per_question": client.calls / rounds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das estratégias de geração de perguntas")
+    parser.add_argument('--question-file', '-q', default='sample_questions.json', help='Arquivo JSON com perguntas')
+    parser.add_argument('--rounds', '-n', type=int, default=10, help='Perguntas por estratégia')
+    parser.add_argument('--fake', type=float, metavar='LATENCIA', help='Usar servidor Ollama fake com esta latência por chamada')
+    args = parser.parse_args()
+
+    with open(args.question_file, 'r', encoding='utf-8') as f:
+        questions = [QuestionItem(**q) for q in json.load(f)]
+
+    server = FakeOllamaServer(fake_responder, latency=args.fake).start() if args.fake is not None else None
+    try:
+        client = CountingClient(ollama.Client(host=server.url) if server else ollama.Client())
+        for strategy in ("separate", "combined"):
+            result = run(strategy, questions, args.rounds, client)
+            print(
+                f"{result['strategy']:>9}: média {result['mean_s'] * 1000:8.1f} ms | "
+                f"p50 {result['p50_s'] * 1000:8.1f} ms | "
+                f"{result['calls_per_question']:.1f} chamadas por pergunta"
+            )
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Baralho em colunas (NumPy) para questionários muito grandes
+
+Alternativa compacta a uma lista de QuestionItem com um SpacedRepetitionState por
+cartão: o estado SM-2 fica em arrays (intervalo, fator de facilidade, repetições e
+próxima revisão em segundos desde a época) e os textos em tabelas de strings UTF-8
+contíguas. A atualização do SM-2 roda vetorizada sobre vários cartões de uma vez, com
+o mesmo resultado de SpacedRepetitionState.update.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from due_queue import NEVER_REVIEWED, review_timestamp
+from question_pack import QuestionPack
+
+
+DAY_SECONDS = 86400.0
+
+
+class StringTable:
+    """Strings imutáveis guardadas como um único buffer UTF-8 mais os offsets de cada uma"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringTable":
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes
+
+
+def sm2_update(
+    interval: np.ndarray,
+    easiness: np.ndarray,
+    repetitions: np.ndarray,
+    quality: np.ndarray,
+    now: float
+) -> tuple:
+    """
+    Aplica o SM-2 a vários cartões de uma vez
+
+    Mesmas regras de SpacedRepetitionState.update: qualidade >= 3 conta como acerto
+    (o modo interativo usa 5 para acerto e 2 para erro).
+
+    Args:
+        interval: Intervalo atual em dias
+        easiness: Fator de facilidade atual
+        repetitions: Número de acertos acumulados
+        quality: Qualidade da resposta (0-5) de cada cartão
+        now: Momento da revisão (segundos desde a época)
+
+    Returns:
+        tuple: (intervalo, fator de facilidade, repetições, próxima revisão) atualizados
+    """
+    quality = np.asarray(quality, dtype=np.float64)
+    correct = quality >= 3
+    miss = 5.0 - quality
+    easiness = np.maximum(1.3, easiness + 0.1 - miss * (0.08 + miss * 0.02))
+
+    grown = np.where(repetitions == 0, 1.0, np.where(repetitions == 1, 6.0, interval * easiness))
+    interval = np.where(correct, grown, 1.0)
+    repetitions = np.where(correct, repetitions + 1, np.maximum(0, repetitions - 1)).astype(np.int32)
+    next_review = now + interval * DAY_SECONDS
+    return interval, easiness, repetitions, next_review
+
+
+class ColumnarDeck:
+    """Cartões e estado SM-2 em colunas; cada cartão é uma linha"""
+
+    def __init__(
+        self,
+        questions: StringTable,
+        answers: StringTable,
+        card_ids: np.ndarray,
+        interval: Optional[np.ndarray] = None,
+        easiness: Optional[np.ndarray] = None,
+        repetitions: Optional[np.ndarray] = None,
+        last_review: Optional[np.ndarray] = None,
+        next_review: Optional[np.ndarray] = None
+    ):
+        size = len(questions)
+        self.questions = questions
+        self.answers = answers
+        self.card_ids = card_ids
+        self.interval = interval if interval is not None else np.ones(size, dtype=np.float64)
+        self.easiness = easiness if easiness is not None else np.full(size, 2.5, dtype=np.float64)
+        self.repetitions = repetitions if repetitions is not None else np.zeros(size, dtype=np.int32)
+        # Cartões nunca revisados: -inf (vêm antes de qualquer cartão agendado, como na DueQueue)
+        self.last_review = last_review if last_review is not None else np.full(size, NEVER_REVIEWED)
+        self.next_review = next_review if next_review is not None else np.full(size, NEVER_REVIEWED)
+        self._rows: Optional[Dict[str, int]] = None
+        self._order: Optional[np.ndarray] = None
+        self._sorted_ids: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_items(cls, items: Sequence[Dict[str, str]]) -> "ColumnarDeck":
+        """Cria o baralho a partir da lista de perguntas (formato do arquivo JSON)"""
+        questions = [item['question'] for item in items]
+        answers = [item['answer'] for item in items]
+        card_ids = np.array(
+            [QuestionPack.item_key(q, a) for q, a in zip(questions, answers)],
+            dtype='S32'
+        )
+        return cls(StringTable.from_strings(questions), StringTable.from_strings(answers), card_ids)
+
+    @classmethod
+    def load(cls, path: str) -> "ColumnarDeck":
+        """Carrega um baralho salvo com save()"""
+        with np.load(path) as data:
+            return cls(
+                StringTable(data['questions_data'], data['questions_offsets']),
+                StringTable(data['answers_data'], data['answers_offsets']),
+                data['card_ids'],
+                data['interval'],
+                data['easiness'],
+                data['repetitions'],
+                data['last_review'],
+                data['next_review']
+            )
+
+    def save(self, path: str) -> None:
+        """Salva todas as colunas em um arquivo .npz (sem compressão, para carregar rápido)"""
+        np.savez(
+            path,
+            questions_data=self.questions.data,
+            questions_offsets=self.questions.offsets,
+            answers_data=self.answers.data,
+            answers_offsets=self.answers.offsets,
+            card_ids=self.card_ids,
+            interval=self.interval,
+            easiness=self.easiness,
+            repetitions=self.repetitions,
+            last_review=self.last_review,
+            next_review=self.next_review
+        )
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelas colunas"""
+        columns = (self.card_ids, self.interval, self.easiness, self.repetitions, self.last_review, self.next_review)
+        return self.questions.nbytes + self.answers.nbytes + sum(column.nbytes for column in columns)
+
+    def row(self, card_id: str) -> int:
+        """Linha do cartão (o índice por card_id é montado na primeira consulta)"""
+        if self._rows is None:
+            self._rows = {card_id.decode('ascii'): i for i, card_id in enumerate(self.card_ids.tolist())}
+        return self._rows[card_id]
+
+    def item(self, row: int) -> Dict[str, str]:
+        return {'question': self.questions[row], 'answer': self.answers[row]}
+
+    def update(self, rows: Any, quality: Any, now: Optional[float] = None) -> None:
+        """
+        Registra as respostas de vários cartões de uma vez
+
+        Args:
+            rows: Linhas dos cartões (sem repetições)
+            quality: Qualidade de cada resposta (0-5), ou um único valor para todas
+            now: Momento das respostas (padrão: agora)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        now = datetime.now().timestamp() if now is None else now
+        quality = np.broadcast_to(np.asarray(quality, dtype=np.float64), rows.shape)
+        interval, easiness, repetitions, next_review = sm2_update(
+            self.interval[rows], self.easiness[rows], self.repetitions[rows], quality, now
+        )
+        self.interval[rows] = interval
+        self.easiness[rows] = easiness
+        self.repetitions[rows] = repetitions
+        self.last_review[rows] = now
+        self.next_review[rows] = next_review
+
+    def rows_for(self, card_ids: Sequence[str]) -> np.ndarray:
+        """Linhas de vários cartões de uma vez (busca binária sobre os card_id ordenados)"""
+        if self._order is None:
+            self._order = np.argsort(self.card_ids, kind='stable')
+            self._sorted_ids = self.card_ids[self._order]
+        wanted = np.asarray(card_ids, dtype='S32')
+        positions = np.searchsorted(self._sorted_ids, wanted)
+        positions = np.minimum(positions, len(self._sorted_ids) - 1)
+        if len(wanted) and not np.array_equal(self._sorted_ids[positions], wanted):
+            missing = wanted[self._sorted_ids[positions] != wanted][0].decode('ascii')
+            raise KeyError(missing)
+        return self._order[positions]
+
+    def apply_grades(self, rows: Any, grades: Any, now: Optional[float] = None) -> None:
+        """
+        Aplica um vetor de notas (qualidade 0-5) a vários cartões de uma vez
+
+        Ao contrário de update(), aceita o mesmo cartão mais de uma vez: as notas de um
+        cartão são aplicadas na ordem em que aparecem, em rodadas vetorizadas.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        grades = np.broadcast_to(np.asarray(grades, dtype=np.float64), rows.shape)
+        if len(rows) == 0:
+            return
+        now = datetime.now().timestamp() if now is None else now
+        # Posição de cada nota entre as notas do mesmo cartão (0 para a primeira, 1 para a segunda...)
+        order = np.argsort(rows, kind='stable')
+        sorted_rows = rows[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        occurrence = np.empty(len(rows), dtype=np.int64)
+        occurrence[order] = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        for round_ in range(int(occurrence.max()) + 1):
+            selected = occurrence == round_
+            self.update(rows[selected], grades[selected], now=now)
+
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None) -> np.ndarray:
+        """Linhas prontas para revisão, das mais atrasadas para as mais recentes"""
+        now = datetime.now().timestamp() if now is None else now
+        rows = np.flatnonzero(self.next_review <= now)
+        if limit is not None and len(rows) > limit:
+            rows = rows[np.argpartition(self.next_review[rows], limit)[:limit]]
+        return rows[np.argsort(self.next_review[rows], kind='stable')]
+
+    def state(self, row: int) -> "SpacedRepetitionState":
+        """Estado do cartão no modelo usado pelo StudySession"""
+        from study_partner import SpacedRepetitionState
+
+        return SpacedRepetitionState(
+            difficulty=float(self.interval[row]),
+            repetition_count=int(self.repetitions[row]),
+            last_review=_datetime(self.last_review[row]),
+            easiness_factor=float(self.easiness[row]),
+            next_review=_datetime(self.next_review[row])
+        )
+
+    def set_state(self, row: int, state: "SpacedRepetitionState") -> None:
+        self.interval[row] = state.difficulty
+        self.repetitions[row] = state.repetition_count
+        self.last_review[row] = review_timestamp(state.last_review)
+        self.easiness[row] = state.easiness_factor
+        self.next_review[row] = review_timestamp(state.next_review)
+
+    def question_states(self, rows: Optional[Iterable[int]] = None) -> Dict[str, "SpacedRepetitionState"]:
+        """Estados por card_id dos cartões já revisados (para StudySession.question_states)"""
+        reviewed = np.flatnonzero(np.isfinite(self.next_review)) if rows is None else rows
+        return {self.card_ids[row].decode('ascii'): self.state(row) for row in reviewed}
+
+    def question_items(self) -> List["QuestionItem"]:
+        """Cartões como QuestionItem (para StudySession.questions)"""
+        from study_partner import QuestionItem
+
+        return [
+            QuestionItem(question=self.questions[row], answer=self.answers[row], card_id=card_id.decode('ascii'))
+            for row, card_id in enumerate(self.card_ids.tolist())
+        ]
+
+
+def _datetime(timestamp: float) -> Optional[datetime]:
+    return datetime.fromtimestamp(timestamp) if np.isfinite(timestamp) else None
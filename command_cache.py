@@ -0,0 +1,191 @@
+"""
+Cache persistente (SQLite) das respostas do modelo na geração de comandos
+
+O agente principal chama o modelo com temperature 0 e sempre o mesmo modelo de prompt,
+então o mesmo pedido ("listar arquivos no diretório atual") gera a mesma chamada de
+função. A resposta fica guardada com uma chave formada pelo digest do modelo, pelas
+mensagens, pelas opções e pelo hash do schema: trocar o modelo (ou atualizá-lo com
+`ollama pull`), o prompt ou o schema invalida o cache naturalmente. As entradas expiram
+após um TTL, e as usadas há mais tempo são descartadas quando o limite é atingido (LRU).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from question_cache import default_cache_dir
+
+
+_digests: Dict[str, str] = {}
+
+
+def _manifest_path(model: str) -> Path:
+    """Manifesto do modelo no diretório do Ollama (OLLAMA_MODELS ou ~/.ollama/models)"""
+    base = os.environ.get('OLLAMA_MODELS') or os.path.join(os.path.expanduser('~'), '.ollama', 'models')
+    name, _, tag = model.partition(':')
+    parts = name.split('/')
+    if len(parts) == 1:
+        parts = ['library'] + parts
+    if len(parts) == 2:
+        parts = ['registry.ollama.ai'] + parts
+    return Path(base, 'manifests', *parts, tag or 'latest')
+
+
+def model_digest(model: str, client: Any = None) -> str:
+    """
+    Digest do modelo instalado no Ollama (lido uma vez por processo)
+
+    O digest é o sha256 do manifesto do modelo (o mesmo de `ollama list`), lido direto do
+    disco quando possível, sem importar o cliente do Ollama nem fazer uma requisição.
+    Senão, pergunta ao servidor; se o Ollama não responder ou o modelo não estiver na
+    lista, retorna o próprio nome, que continua sendo uma chave válida (só não percebe
+    atualizações do modelo).
+    """
+    if model in _digests:
+        return _digests[model]
+    try:
+        digest = hashlib.sha256(_manifest_path(model).read_bytes()).hexdigest()
+    except OSError:
+        pass
+    else:
+        _digests[model] = digest
+        return digest
+
+    if client is None:
+        from ollama_gateway import get_gateway
+        client = get_gateway()
+
+    digest = model
+    try:
+        wanted = model if ':' in model else f"{model}:latest"
+        for entry in client.list()['models']:
+            if entry['model'] in (model, wanted):
+                digest = entry['digest']
+                break
+    except Exception:
+        return model
+    _digests[model] = digest
+    return digest
+
+
+def schema_hash(schema: Any) -> str:
+    """Hash estável de um JSON schema"""
+    payload = json.dumps(schema, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CommandCache:
+    """Respostas do modelo por (digest do modelo, mensagens, opções, schema), em SQLite"""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 30 * 24 * 3600, max_entries: int = 5000):
+        """
+        Args:
+            path: Arquivo SQLite (padrão: ~/.cache/agent/command_cache.sqlite3); ':memory:' para testes
+            ttl: Validade de cada resposta, em segundos (None: nunca expira)
+            max_entries: Número máximo de respostas guardadas (as menos usadas recentemente saem primeiro)
+        """
+        if path is None:
+            default_cache_dir().mkdir(parents=True, exist_ok=True)
+            path = str(default_cache_dir() / 'command_cache.sqlite3')
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(digest: str, messages: List[Dict[str, Any]], schema: Any, options: Optional[Dict[str, Any]] = None) -> str:
+        """Chave de conteúdo do pedido"""
+        payload = json.dumps([digest, messages, options or {}, schema_hash(schema)], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Resposta guardada (o conteúdo da mensagem do modelo), ou None se não houver ou tiver expirado"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str, model: str = "") -> None:
+        """Guarda a resposta do modelo (substituindo a anterior, se houver)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Remove as respostas expiradas e depois as usadas há mais tempo até respeitar max_entries"""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = total - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Acertos e falhas desta execução, taxa de acerto, tamanho do cache e acertos acumulados"""
+        with self._lock:
+            entries, total_hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "total_hits": total_hits
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
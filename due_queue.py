@@ -0,0 +1,88 @@
+"""
+Fila de revisões do SM-2 ordenada pela próxima revisão (heap)
+
+Cada cartão tem uma entrada válida no heap; ao ser reagendado, uma nova entrada é
+inserida e a anterior passa a ser ignorada quando chegar ao topo (remoção preguiçosa).
+Escolher o próximo cartão custa O(log N) em vez de percorrer o baralho inteiro.
+"""
+import heapq
+import random
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+
+# Cartões nunca revisados vêm antes de qualquer cartão agendado
+NEVER_REVIEWED = float('-inf')
+
+
+def review_timestamp(next_review: Optional[datetime]) -> float:
+    """Prioridade de um cartão no heap"""
+    return next_review.timestamp() if next_review is not None else NEVER_REVIEWED
+
+
+class DueQueue:
+    """Heap de (próxima revisão, desempate aleatório, chave) com remoção preguiçosa"""
+
+    def __init__(self, entries: Iterable[Tuple[str, Optional[datetime]]] = ()):
+        self._heap: List[Tuple[float, float, str]] = []
+        self._current = {}
+        self.build(entries)
+
+    def build(self, entries: Iterable[Tuple[str, Optional[datetime]]]) -> None:
+        """Reconstrói o heap inteiro em O(N)"""
+        self._current = {key: review_timestamp(next_review) for key, next_review in entries}
+        # O desempate aleatório mantém a ordem variada entre cartões com a mesma prioridade
+        self._heap = [(ts, random.random(), key) for key, ts in self._current.items()]
+        heapq.heapify(self._heap)
+
+    def push(self, key: str, next_review: Optional[datetime]) -> None:
+        """Agenda (ou reagenda) um cartão"""
+        ts = review_timestamp(next_review)
+        self._current[key] = ts
+        heapq.heappush(self._heap, (ts, random.random(), key))
+        if len(self._heap) > 2 * len(self._current) + 64:
+            self._compact()
+
+    def remove(self, key: str) -> None:
+        self._current.pop(key, None)
+
+    def peek(self, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """
+        Cartão com a revisão mais próxima (diferente de `exclude`, se houver outro)
+
+        Returns:
+            tuple: (chave, prioridade) ou None se a fila estiver vazia
+        """
+        popped = []
+        chosen = None
+        while True:
+            entry = self._pop_valid()
+            if entry is None:
+                break
+            popped.append(entry)
+            if entry[2] != exclude:
+                chosen = entry
+                break
+        for entry in popped:
+            heapq.heappush(self._heap, entry)
+        if chosen is None:
+            return None
+        return chosen[2], chosen[0]
+
+    def _pop_valid(self) -> Optional[Tuple[float, float, str]]:
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if self._current.get(entry[2]) == entry[0]:
+                return entry
+        return None
+
+    def _compact(self) -> None:
+        """Descarta as entradas obsoletas acumuladas pelos reagendamentos"""
+        self._heap = [entry for entry in self._heap if self._current.get(entry[2]) == entry[0]]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._current
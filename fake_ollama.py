@@ -0,0 +1,249 @@
+"""
+Servidor HTTP local que imita a API do Ollama, para testes e testes de carga sem modelo
+
+Exemplo:
+    with FakeOllamaServer(lambda request: '{"thought": "ok"}') as server:
+        client = ollama.Client(host=server.url)
+        client.chat(model='gemma3:latest', messages=[...])
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def hash_embedding(text: str, dim: int = 64) -> List[float]:
+    """Embedding determinístico (saco de palavras com hashing): textos com palavras em comum ficam próximos"""
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.sha1(word.encode('utf-8')).digest()
+        vector[int.from_bytes(digest[:4], 'little') % dim] += 1.0 if digest[4] % 2 else -1.0
+    return vector
+
+
+class FakeOllamaServer:
+    """
+    Servidor fake do Ollama rodando em uma thread
+
+    Args:
+        responder: Função que recebe o corpo da requisição (dict) e retorna o texto da resposta
+        chunk_size: Número de caracteres por chunk no modo stream
+        token_delay: Espera entre chunks (simula a geração de tokens)
+        latency: Espera antes do primeiro token (simula o processamento do prompt)
+        models: Modelos instalados (nome -> digest), listados em /api/tags
+        embedder: Função texto -> vetor usada em /api/embed (padrão: hash_embedding)
+        load_delay: Tempo de carregamento de um modelo que ainda não está na memória
+            (keep_alive 0 descarrega o modelo ao fim da resposta)
+        prompt_token_delay: Tempo de avaliação de cada token do prompt. Como no Ollama, o
+            começo do prompt igual ao da chamada anterior do mesmo modelo vem do cache
+            (KV cache) e não é avaliado de novo nem contado em prompt_eval_count
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+        chunk_size: int = 4,
+        token_delay: float = 0.0,
+        latency: float = 0.0,
+        models: Optional[Dict[str, str]] = None,
+        embedder: Optional[Callable[[str], List[float]]] = None,
+        load_delay: float = 0.0,
+        prompt_token_delay: float = 0.0
+    ):
+        self.responder = responder or (lambda request: '{}')
+        self.chunk_size = chunk_size
+        self.token_delay = token_delay
+        self.latency = latency
+        self.embedder = embedder or hash_embedding
+        self.load_delay = load_delay
+        self.prompt_token_delay = prompt_token_delay
+        self.loaded: set = set()
+        self._last_prompt: Dict[str, str] = {}
+        self.models = models if models is not None else {'gemma3:latest': 'a2af6cc3eb7f' + '0' * 52}
+        self.requests: List[Dict[str, Any]] = []
+        self.aborted = 0  # Streams interrompidos porque o cliente fechou a conexão
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _load(self, model: str) -> int:
+        """Carrega o modelo se preciso; retorna o tempo de carregamento em ns"""
+        with self._lock:
+            if model in self.loaded:
+                return 0
+            self.loaded.add(model)
+        started = time.perf_counter()
+        if self.load_delay:
+            time.sleep(self.load_delay)
+        return int((time.perf_counter() - started) * 1e9)
+
+    def _evaluate_prompt(self, body: Dict[str, Any]) -> int:
+        """Avalia o prompt reaproveitando o prefixo da chamada anterior; retorna os tokens avaliados"""
+        if body.get('messages') is not None:
+            prompt = "".join(f"<{msg.get('role')}>{msg.get('content')}\n" for msg in body['messages'])
+        else:
+            prompt = body.get('prompt') or ""
+        model = body.get('model')
+        with self._lock:
+            previous = self._last_prompt.get(model, "")
+            self._last_prompt[model] = prompt
+        cached = 0
+        limit = min(len(previous), len(prompt))
+        while cached < limit and previous[cached] == prompt[cached]:
+            cached += 1
+        tokens = -(-(len(prompt) - cached) // 4)  # ~4 caracteres por token
+        if self.prompt_token_delay:
+            time.sleep(tokens * self.prompt_token_delay)
+        return tokens
+
+    def _record(self, path: str, body: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests.append({"path": path, **body})
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self._send_json(200, {"models": [
+                        {"name": name, "model": name, "modified_at": _timestamp(), "digest": digest, "size": 0}
+                        for name, digest in server.models.items()
+                    ]})
+                else:
+                    self._send_json(404, {"error": f"rota não suportada: {self.path}"})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                server._record(self.path, body)
+
+                if self.path == '/api/chat':
+                    self._generate(body, lambda piece: {"message": {"role": "assistant", "content": piece}})
+                elif self.path == '/api/generate':
+                    self._generate(body, lambda piece: {"response": piece})
+                elif self.path == '/api/embed':
+                    texts = body.get('input') or []
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._send_json(200, {
+                        "model": body.get('model'),
+                        "embeddings": [server.embedder(text) for text in texts]
+                    })
+                else:
+                    self._send_json(404, {"error": f"rota não suportada: {self.path}"})
+
+            def _generate(self, body, wrap):
+                started = time.perf_counter()
+                load_ns = server._load(body.get('model'))
+                prompt_started = time.perf_counter()
+                prompt_tokens = server._evaluate_prompt(body)
+                if server.latency:
+                    time.sleep(server.latency)
+                content = server.responder(body) if body.get('messages') or body.get('prompt') else ""
+                prompt_eval_ns = int((time.perf_counter() - prompt_started) * 1e9)
+                if body.get('keep_alive') in (0, "0", "0s"):
+                    with server._lock:
+                        server.loaded.discard(body.get('model'))
+                        server._last_prompt.pop(body.get('model'), None)
+
+                if not body.get('stream', True):
+                    self._send_json(200, {
+                        "model": body.get('model'),
+                        "created_at": _timestamp(),
+                        **wrap(content),
+                        "done": True,
+                        "done_reason": "stop",
+                        **self._timings(started, load_ns, prompt_tokens, prompt_eval_ns, content)
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                size = max(1, server.chunk_size)
+                try:
+                    for i in range(0, len(content), size):
+                        if server.token_delay:
+                            time.sleep(server.token_delay)
+                        self._write_chunk({
+                            "model": body.get('model'),
+                            "created_at": _timestamp(),
+                            **wrap(content[i:i + size]),
+                            "done": False
+                        })
+                except (BrokenPipeError, ConnectionResetError):
+                    # Como o Ollama, para de gerar quando o cliente desiste
+                    with server._lock:
+                        server.aborted += 1
+                    self.close_connection = True
+                    return
+                self._write_chunk({
+                    "model": body.get('model'),
+                    "created_at": _timestamp(),
+                    **wrap(""),
+                    "done": True,
+                    "done_reason": "stop",
+                    **self._timings(started, load_ns, prompt_tokens, prompt_eval_ns, content)
+                })
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _timings(self, started, load_ns, prompt_tokens, prompt_eval_ns, content):
+                total_ns = int((time.perf_counter() - started) * 1e9)
+                return {
+                    "total_duration": total_ns,
+                    "load_duration": load_ns,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": prompt_eval_ns,
+                    "eval_count": -(-len(content) // max(1, server.chunk_size)),
+                    "eval_duration": max(0, total_ns - load_ns - prompt_eval_ns)
+                }
+
+            def _write_chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -1,27 +1,53 @@
 import json
+import re
 import subprocess
-import ollama
 import sys
 import argparse
 import warnings
 from pydantic import BaseModel, Field
-from typing import Literal, Union, List, Optional, Dict, Any
+from typing import Literal, Union, List, Optional, Dict, Any, Callable
 from pathlib import Path
 import os
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import threading
-import queue
 
 # Suprimir todos os avisos
 warnings.filterwarnings("ignore")
 
-# Importando as funções existentes do main.py
-from main import run_agent_interactive
+# Leitura incremental das respostas em streaming
+from json_stream import stream_chat
+
+# Funções que o agente pode chamar (schema compartilhado com o main.py)
+from agent_functions import FUNCTION_CALL_SCHEMA
+
+# Cliente compartilhado do Ollama (junção de pedidos, limite de concorrência e prioridades)
+from ollama_gateway import BACKGROUND, configure_gateway, format_timing, get_gateway, request_priority, warmup_model
 
 # Importando as funções do TTS
-from tts_response import get_kokoro_audio, play_audio_from_bytes
+from tts_response import warmup_kokoro_pipeline
+
+# Pipeline de fala: LLM -> frases -> síntese -> reprodução
+from speech_pipeline import SpeechPipeline
+
+# Sessões de conversa gravadas em disco
+from session_store import SessionStore
+
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Número aproximado de tokens de um texto
+
+    Conta palavras e sinais de pontuação, e cada palavra longa como vários pedaços de até
+    6 caracteres, perto do que os tokenizadores BPE fazem com português. Não precisa do
+    tokenizador do modelo e custa uma passada de regex.
+    """
+    return sum(1 + (len(piece) - 1) // 6 for piece in _TOKEN_PATTERN.findall(text))
 
 
 class Message(BaseModel):
@@ -29,44 +55,256 @@ class Message(BaseModel):
     role: str  # 'user' ou 'assistant'
     content: str
     timestamp: float = Field(default_factory=time.time)
+    tokens: int = 0  # Estimativa, calculada uma vez ao entrar no histórico
+    seq: int = 0  # Número da mensagem na sessão gravada (0: sem sessão)
+
+
+def llm_summarizer(model: str = 'gemma3:latest', max_words: int = 150) -> Callable[[str, List[Dict[str, str]]], str]:
+    """
+    Resumidor que pede ao modelo para juntar o resumo anterior com as mensagens antigas
+
+    As chamadas têm prioridade de segundo plano no gateway: a resposta ao usuário passa na frente.
+    """
+    def summarize(previous_summary: str, messages: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(
+            f"{'Usuário' if msg['role'] == 'user' else 'Assistente'}: {msg['content']}" for msg in messages
+        )
+        prompt = (
+            f"Resumo da conversa até agora:\n{previous_summary or '(vazio)'}\n\n"
+            f"Mensagens seguintes:\n{transcript}\n\n"
+            f"Escreva um novo resumo, com no máximo {max_words} palavras, que junte o resumo e as mensagens. "
+            "Guarde nomes, fatos, pedidos e decisões importantes. Responda apenas com o resumo, sem markdown."
+        )
+        with request_priority(BACKGROUND):
+            response = get_gateway().chat(
+                model=model,
+                messages=[{'role': 'user', 'content': prompt}],
+                options={'temperature': 0.2}
+            )
+        return response['message']['content'].strip()
+
+    return summarize
 
 
 class ConversationMemory:
-    """Classe para gerenciar a memória da conversa"""
+    """
+    Classe para gerenciar a memória da conversa
+
+    Sem max_tokens, guarda as últimas max_messages mensagens. Com max_tokens, o contexto
+    (resumo + mensagens recentes) fica dentro desse orçamento de tokens: quando as
+    mensagens passam da sua parte do orçamento, as mais antigas saem do histórico e são
+    incorporadas ao resumo por um resumidor (normalmente o LLM, ver llm_summarizer) em
+    uma thread de segundo plano. Enquanto o novo resumo não fica pronto, o contexto usa o
+    resumo anterior.
     
-    def __init__(self, max_messages: int = 20):
+    Com store e session, cada mensagem e cada novo resumo são gravados na sessão
+    (session_store.SessionStore) assim que acontecem, e load() retoma a sessão.
+    """
+    
+    def __init__(
+        self,
+        max_messages: int = 20,
+        max_tokens: Optional[int] = None,
+        summarizer: Optional[Callable[[str, List[Dict[str, str]]], str]] = None,
+        summary_share: float = 0.25,
+        store: Optional["SessionStore"] = None,
+        session: Optional[str] = None
+    ):
+        """
+        Args:
+            max_messages: Número máximo de mensagens (sem max_tokens)
+            max_tokens: Orçamento de tokens do contexto (resumo + mensagens)
+            summarizer: Função (resumo anterior, mensagens antigas) -> novo resumo; sem ela,
+                o resumo é um trecho das mensagens antigas
+            summary_share: Fração do orçamento reservada ao resumo
+            store: Onde gravar a conversa (com session)
+            session: Nome da sessão no store
+        """
         self.messages: List[Message] = []
         self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary = ""
+        self.summary_budget = int(max_tokens * summary_share) if max_tokens else 0
+        self.message_budget = max_tokens - self.summary_budget if max_tokens else 0
+        self.tokens = 0  # Tokens das mensagens guardadas
+        self.folded = 0  # Mensagens já incorporadas ao resumo
+        self.store = store if session else None
+        self.session = session
+        
+        self._lock = threading.Lock()
+        self._generation = 0  # Muda a cada clear(): resumos pendentes de antes são descartados
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = []
     
     def add_message(self, role: str, content: str):
         """Adiciona uma mensagem ao histórico"""
-        message = Message(role=role, content=content)
-        self.messages.append(message)
-        
-        # Mantém apenas as mensagens mais recentes
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages:]
+        message = Message(role=role, content=content, tokens=estimate_tokens(content))
+        with self._lock:
+            if self.store is not None:
+                message.seq = self.store.append(self.session, role, content, message.timestamp, message.tokens)
+            self.messages.append(message)
+            self.tokens += message.tokens
+            
+            if self.max_tokens is None:
+                # Mantém apenas as mensagens mais recentes
+                if len(self.messages) > self.max_messages:
+                    self.messages = self.messages[-self.max_messages:]
+                    self.tokens = sum(msg.tokens for msg in self.messages)
+            elif self.tokens > self.message_budget:
+                self._fold()
+    
+    def _fold(self):
+        """Tira as mensagens mais antigas até sobrar metade da parte do orçamento e as manda para o resumo"""
+        folded = []
+        upto = 0
+        while len(self.messages) > 1 and (self.tokens > self.message_budget // 2 or not folded):
+            message = self.messages.pop(0)
+            self.tokens -= message.tokens
+            folded.append({"role": message.role, "content": message.content})
+            upto = message.seq
+        if folded:
+            self._submit_summary(folded, upto)
+    
+    def _submit_summary(self, folded: List[Dict[str, str]], upto: int):
+        self.folded += len(folded)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+        # Um resumo por vez, na ordem: cada um parte do resultado do anterior
+        self._pending = [future for future in self._pending if not future.done()]
+        self._pending.append(self._executor.submit(self._summarize, folded, upto, self._generation))
+    
+    def _summarize(self, folded: List[Dict[str, str]], upto: int, generation: int):
+        with self._lock:
+            previous = self.summary
+        summary = None
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(previous, folded)
+            except Exception as e:
+                print(f"Erro ao resumir a conversa: {e}")
+        if not summary:
+            # Sem resumidor (ou se ele falhar), o resumo é o próprio texto, cortado ao orçamento
+            summary = " ".join([previous] + [
+                f"{'Usuário' if msg['role'] == 'user' else 'Assistente'}: {msg['content']}" for msg in folded
+            ]).strip()
+        summary = self._truncate(summary, self.summary_budget)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.summary = summary
+        if self.store is not None and upto:
+            self.store.set_summary(self.session, summary, upto)
+    
+    @staticmethod
+    def _truncate(text: str, budget: int) -> str:
+        """Corta o texto para caber no orçamento (pelo fim, que no resumo é o mais recente)"""
+        if estimate_tokens(text) <= budget:
+            return text
+        words = text.split()
+        while words and estimate_tokens("... " + " ".join(words)) > budget:
+            words = words[max(1, len(words) // 10):]
+        return "... " + " ".join(words)
+    
+    def wait_for_summary(self, timeout: Optional[float] = None):
+        """Espera os resumos em andamento (útil antes de salvar ou em testes)"""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result(timeout=timeout)
+    
+    def context_tokens(self) -> int:
+        """Tokens estimados do contexto enviado ao modelo (resumo + mensagens)"""
+        with self._lock:
+            return self.tokens + (estimate_tokens(self.summary) if self.summary else 0)
     
     def get_context(self) -> List[Dict[str, str]]:
         """Retorna o contexto da conversa no formato necessário para o Ollama"""
-        return [
-            {
-                "role": msg.role,
-                "content": msg.content
-            }
-            for msg in self.messages
-        ]
+        with self._lock:
+            context = [
+                {
+                    "role": msg.role,
+                    "content": msg.content
+                }
+                for msg in self.messages
+            ]
+            if self.summary:
+                context.insert(0, {"role": "system", "content": f"Resumo da conversa anterior: {self.summary}"})
+        return context
+    
+    def load(self) -> int:
+        """
+        Retoma a sessão gravada: o resumo e o fim do log, lido de trás para frente até
+        encher o orçamento (ou max_messages)
+
+        Mensagens antigas que saíram da memória mas cujo resumo não chegou a ser gravado
+        (o programa terminou antes) voltam para a fila do resumo.
+
+        Returns:
+            int: Número de mensagens carregadas na memória
+        """
+        if self.store is None:
+            return 0
+        meta = self.store.get(self.session)
+        if meta is None:
+            return 0
+        
+        token_mode = self.max_tokens is not None
+        tail = self.store.iter_tail(self.session, after=meta["summary_upto"] if token_mode else 0)
+        loaded, tokens, leftover = [], 0, []
+        for row in tail:
+            full = tokens + row["tokens"] > self.message_budget if token_mode else len(loaded) >= self.max_messages
+            if full and loaded:
+                if token_mode:
+                    # Sem resumo: vão para o resumidor (até o dobro do orçamento, o resto fica só no log)
+                    leftover.append(row)
+                    leftover_tokens = row["tokens"]
+                    for older in tail:
+                        if leftover_tokens + older["tokens"] > 2 * self.max_tokens:
+                            break
+                        leftover.append(older)
+                        leftover_tokens += older["tokens"]
+                break
+            loaded.append(row)
+            tokens += row["tokens"]
+        
+        with self._lock:
+            self._generation += 1
+            self.messages = [
+                Message(role=row["role"], content=row["content"], timestamp=row["timestamp"], tokens=row["tokens"], seq=row["seq"])
+                for row in reversed(loaded)
+            ]
+            self.tokens = tokens
+            self.summary = meta["summary"] if token_mode else ""
+            self.folded = meta["messages"] - len(loaded) - len(leftover)
+            if leftover:
+                leftover.reverse()
+                self._submit_summary(
+                    [{"role": row["role"], "content": row["content"]} for row in leftover],
+                    leftover[-1]["seq"]
+                )
+        return len(loaded)
     
     def clear(self):
-        """Limpa o histórico de mensagens"""
-        self.messages = []
+        """Limpa o histórico de mensagens (e o da sessão gravada)"""
+        with self._lock:
+            self.messages = []
+            self.tokens = 0
+            self.folded = 0
+            self.summary = ""
+            self._generation += 1
+            if self.store is not None:
+                self.store.clear(self.session)
     
     def get_summary(self) -> str:
         """Retorna um resumo do histórico de mensagens"""
-        if not self.messages:
+        if not self.messages and not self.summary:
             return "Nenhuma conversa realizada ainda."
         
-        summary = f"Conversa com {len(self.messages)} mensagens:\n"
+        summary = f"Conversa com {len(self.messages) + self.folded} mensagens:\n"
+        if self.max_tokens is not None:
+            summary += f"Contexto: ~{self.context_tokens()} de {self.max_tokens} tokens ({self.folded} mensagens resumidas)\n"
+        if self.summary:
+            summary += f"Resumo das mensagens antigas: {self.summary}\n"
         for i, msg in enumerate(self.messages[-5:], 1):  # Mostra as últimas 5 mensagens
             role = "Usuário" if msg.role == "user" else "Assistente"
             content_preview = msg.content[:50] + "..." if len(msg.content) > 50 else msg.content
@@ -76,127 +314,108 @@ class ConversationMemory:
         return summary
 
 
+# Instruções fixas, em uma única mensagem de sistema no começo do prompt
+AGENT_INSTRUCTIONS = (
+    "Você é um assistente em uma conversa contínua com o usuário.\n"
+    "Instruções:\n"
+    "- Responda com um pensamento e uma resposta clara\n"
+    "- Se apropriado, inclua uma função a ser executada\n"
+    "- Mantenha o contexto da conversa\n"
+    "- Responda sem usar formatação markdown (sem asteriscos, negrito, itálico, etc.)"
+)
+
+# Schema da saída estruturada: pensamento, resposta e, opcionalmente, uma função
+MEMORY_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "thought": {
+            "type": "string",
+            "description": "The reasoning behind the response"
+        },
+        "response": {
+            "type": "string",
+            "description": "The actual response to the user"
+        },
+        "function": FUNCTION_CALL_SCHEMA["properties"]["function"]
+    },
+    "required": ["thought", "response"]
+}
+
+
+def build_memory_messages(memory: ConversationMemory, instructions: str = AGENT_INSTRUCTIONS) -> List[Dict[str, str]]:
+    """
+    Mensagens enviadas ao modelo: instruções, resumo (se houver) e o histórico, sem alterações
+
+    Cada mensagem do histórico é enviada exatamente como foi guardada, então o prompt de um
+    turno começa com o prompt inteiro do turno anterior (até o histórico ser resumido) e o
+    Ollama reaproveita o prefixo já avaliado (KV cache) em vez de avaliá-lo de novo.
+    """
+    return [{"role": "system", "content": instructions}] + memory.get_context()
+
+
+def parse_memory_response(response_content: Any) -> Optional[str]:
+    """Campo "response" da saída estruturada, ou None se ela não for um JSON válido"""
+    if isinstance(response_content, str):
+        try:
+            parsed_response = json.loads(response_content)
+        except json.JSONDecodeError:
+            print(f"Não foi possível analisar a resposta como JSON: {response_content}")
+            return None
+    else:
+        parsed_response = response_content
+    return parsed_response.get('response', 'Desculpe, não consegui processar sua solicitação.')
+
+
 def run_agent_with_memory(
     user_input: str, 
     memory: ConversationMemory, 
     model: str = 'gemma3:latest', 
     execute: bool = False, 
-    explain: bool = False
+    explain: bool = False,
+    on_response_delta: Optional[Callable[[str], None]] = None
 ):
     """
     Runs the agent with conversation memory to maintain context
+
+    If on_response_delta is given, the model is called with stream=True and the
+    callback receives each new piece of the "response" field as it is generated.
     """
-    # Adiciona a entrada do usuário ao histórico
+    # Adiciona a entrada do usuário ao histórico (é a última mensagem do prompt)
     memory.add_message("user", user_input)
-    
-    # Define o schema para saída estruturada
-    schema = {
-        "type": "object",
-        "properties": {
-            "thought": {
-                "type": "string",
-                "description": "The reasoning behind the response"
-            },
-            "response": {
-                "type": "string",
-                "description": "The actual response to the user"
-            },
-            "function": {
-                "type": "object",
-                "oneOf": [
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "open_program"},
-                            "program_name": {"type": "string", "description": "Name of the program to open"},
-                            "arguments": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "default": []
-                            }
-                        },
-                        "required": ["function_name", "program_name"]
-                    },
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "execute_command"},
-                            "command": {"type": "string", "description": "The shell command to execute"},
-                            "arguments": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "default": []
-                            }
-                        },
-                        "required": ["function_name", "command"]
-                    },
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "list_directory"},
-                            "path": {"type": "string", "description": "Path to the directory to list"}
-                        },
-                        "required": ["function_name"]
-                    },
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "read_file"},
-                            "path": {"type": "string", "description": "Path to the file to read"}
-                        },
-                        "required": ["function_name", "path"]
-                    }
-                ],
-                "discriminator": {
-                    "propertyName": "function_name"
-                }
-            }
-        },
-        "required": ["thought", "response"]
-    }
+    schema = MEMORY_RESPONSE_SCHEMA
+    formatted_messages = build_memory_messages(memory)
 
-    # Prepara as mensagens com histórico
-    messages = memory.get_context()
+    options = {
+        'temperature': 0.7  # Um pouco mais criativo para conversas
+    }
     
-    # Adiciona a nova mensagem do usuário
-    messages.append({
-        'role': 'user',
-        'content': f'{user_input}\n\nInstruções:\n- Responda com um pensamento e uma resposta clara\n- Se apropriado, inclua uma função a ser executada\n- Mantenha o contexto da conversa'
-    })
-
-    # Chama o modelo com histórico de conversa
-    # Adicionando instruções para não usar markdown
-    formatted_messages = []
-    for msg in messages:
-        if msg['role'] == 'user':
-            # Adiciona instrução para não usar markdown
-            content = msg['content'] + "\n\nPor favor, responda sem usar formatação markdown (sem asteriscos, negrito, itálico, etc.)."
-            formatted_messages.append({'role': msg['role'], 'content': content})
-        else:
-            formatted_messages.append(msg)
-
-    response = ollama.chat(
-        model=model,
-        messages=formatted_messages,
-        options={
-            'temperature': 0.7  # Um pouco mais criativo para conversas
-        },
-        format=schema
-    )
+    if on_response_delta is not None:
+        def on_string_delta(key, delta):
+            if key == 'response':
+                on_response_delta(delta)
 
-    # Parse the response
-    response_content = response['message']['content']
-    if isinstance(response_content, str):
-        try:
-            parsed_response = json.loads(response_content)
-        except json.JSONDecodeError:
-            print(f"Não foi possível analisar a resposta como JSON: {response_content}")
-            return "Erro ao analisar a resposta do modelo"
+        response_content = stream_chat(
+            model,
+            formatted_messages,
+            format=schema,
+            options=options,
+            client=get_gateway(),
+            on_string_delta=on_string_delta
+        )
     else:
-        parsed_response = response_content
+        response = get_gateway().chat(
+            model=model,
+            messages=formatted_messages,
+            options=options,
+            format=schema
+        )
+        response_content = response['message']['content']
+
+    response_text = parse_memory_response(response_content)
+    if response_text is None:
+        return "Erro ao analisar a resposta do modelo"
 
     # Adiciona a resposta do assistente ao histórico
-    response_text = parsed_response.get('response', 'Desculpe, não consegui processar sua solicitação.')
     memory.add_message("assistant", response_text)
     
     return response_text
@@ -207,43 +426,109 @@ class IA_Agent:
     Agente de IA com memória que responde em texto e áudio
     """
     
-    def __init__(self, model: str = 'gemma3:latest', voice: str = 'pf_dora'):
+    def __init__(
+        self,
+        model: str = 'gemma3:latest',
+        voice: str = 'pf_dora',
+        warmup_tts: bool = False,
+        stream: bool = False,
+        preload: bool = False,
+        show_timings: bool = False,
+        context_tokens: Optional[int] = 1500,
+        session: Optional[str] = None,
+        session_store: Optional[SessionStore] = None
+    ):
         self.model = model
         self.voice = voice
-        self.memory = ConversationMemory()
+        self.stream = stream
+        self.show_timings = show_timings
+        self.session = session
+        store = (session_store or SessionStore()) if session else None
+        # Histórico limitado em tokens; as mensagens antigas viram um resumo feito pelo modelo
+        if context_tokens:
+            self.memory = ConversationMemory(
+                max_tokens=context_tokens, summarizer=llm_summarizer(model), store=store, session=session
+            )
+        else:
+            self.memory = ConversationMemory(store=store, session=session)
         self.running = False
-        self.audio_queue = queue.Queue()
+        
+        # Retoma a sessão gravada (só o fim do log é lido)
+        if session:
+            loaded = self.memory.load()
+            if loaded:
+                print(f"Sessão '{session}' retomada: {loaded} mensagens no contexto, {self.memory.folded} resumidas")
+        
+        # Fala da resposta atual (cancelada quando chega uma nova mensagem)
+        self.speech: Optional[SpeechPipeline] = None
+        self.speech_factory = lambda: SpeechPipeline(voice=self.voice, repo_id='hexgrad/Kokoro-82M')
+        
+        # Carrega o pipeline do Kokoro em segundo plano para que a primeira resposta não pague o carregamento
+        if warmup_tts:
+            warmup_kokoro_pipeline(voice=self.voice, background=True)
+        
+        # Carrega o modelo no Ollama enquanto o usuário digita a primeira mensagem
+        if preload:
+            warmup_model(self.model, background=True)
     
-    def process_input(self, user_input: str, text_only: bool = False):
+    def process_input(self, user_input: str, text_only: bool = False, wait_audio: bool = True):
         """
         Processa a entrada do usuário e retorna resposta em texto e/ou áudio
+        
+        Com áudio, a resposta é falada frase a frase enquanto o modelo ainda a gera.
+        Com wait_audio=False, retorna sem esperar o fim da fala, que é interrompida
+        quando a próxima mensagem chegar.
         """
+        # Uma nova mensagem interrompe a fala da resposta anterior
+        self.stop_speaking()
+        
         print(f"\nUsuário: {user_input}")
         
-        # Obtém a resposta do modelo com memória
+        speech = None if text_only else self.speech_factory()
+        self.speech = speech
+        spoken = []
+        
+        def on_response_delta(delta):
+            if self.stream:
+                print(delta, end="", flush=True)
+            if speech is not None:
+                spoken.append(delta)
+                speech.feed(delta)
+        
+        # Obtém a resposta do modelo com memória (em streaming se for mostrada ou falada enquanto é gerada)
+        if self.stream:
+            print("\nAssistente: ", end="", flush=True)
         response_text = run_agent_with_memory(
             user_input, 
             self.memory, 
             model=self.model, 
             execute=False, 
-            explain=False
+            explain=False,
+            on_response_delta=on_response_delta if self.stream or speech is not None else None
         )
+        if self.stream:
+            print()
+        else:
+            print(f"\nAssistente: {response_text}")
+        if self.show_timings:
+            print(format_timing(get_gateway().last_timing))
         
-        print(f"\nAssistente: {response_text}")
-        
-        if not text_only:
-            # Gera e reproduz o áudio
-            print("\nGerando áudio...")
-            audio_array, sample_rate = get_kokoro_audio(response_text, voice=self.voice, repo_id='hexgrad/Kokoro-82M')
-            
-            if len(audio_array) > 0:
-                print("Reproduzindo resposta em áudio...")
-                play_audio_from_bytes(audio_array, sample_rate)
-            else:
-                print("Não foi possível gerar o áudio da resposta.")
+        if speech is not None:
+            # Respostas que não vieram do campo "response" (mensagens de erro) são faladas inteiras
+            if not spoken:
+                speech.feed(response_text)
+            speech.finish()
+            if wait_audio:
+                speech.wait()
         
         return response_text
     
+    def stop_speaking(self):
+        """Interrompe a fala em andamento, se houver"""
+        if self.speech is not None and self.speech.active:
+            self.speech.cancel()
+        self.speech = None
+    
     def start_conversation(self, text_only: bool = False):
         """
         Inicia uma conversa interativa com o usuário
@@ -261,6 +546,7 @@ class IA_Agent:
                 
                 if user_input.lower() in ['sair', 'exit', 'quit']:
                     print("Encerrando conversa...")
+                    self.stop_speaking()
                     self.running = False
                     break
                 elif user_input.lower() in ['limpar', 'clear']:
@@ -273,11 +559,12 @@ class IA_Agent:
                 elif user_input == "":
                     continue
                 
-                # Processa a entrada do usuário
-                self.process_input(user_input, text_only)
+                # Processa a entrada do usuário (a fala continua enquanto a próxima mensagem é digitada)
+                self.process_input(user_input, text_only, wait_audio=False)
                 
             except KeyboardInterrupt:
                 print("\n\nConversa interrompida pelo usuário.")
+                self.stop_speaking()
                 self.running = False
                 break
             except Exception as e:
@@ -299,8 +586,35 @@ def main():
     parser.add_argument('--voice', '-v', default='pf_dora', help='Voz do Kokoro TTS a ser usada')
     parser.add_argument('--text-only', action='store_true', help='Apenas responder em texto, sem áudio')
     parser.add_argument('--interactive', '-i', action='store_true', help='Modo interativo')
+    parser.add_argument('--warmup-tts', action='store_true', help='Pré-carregar o Kokoro TTS ao iniciar')
+    parser.add_argument('--stream', action='store_true', help='Mostrar a resposta enquanto é gerada')
+    parser.add_argument('--preload', action='store_true', help='Carregar o modelo no Ollama ao iniciar')
+    parser.add_argument('--keep-alive', default=os.environ.get('AGENT_OLLAMA_KEEP_ALIVE') or '30m',
+                        help='Tempo que o modelo fica carregado no Ollama entre as mensagens (ex.: 30m, 1h, -1 para sempre)')
+    parser.add_argument('--timings', action='store_true', help='Mostrar os tempos de carregamento do modelo, do prompt e da geração')
+    parser.add_argument('--context-tokens', type=int, default=1500,
+                        help='Orçamento de tokens do histórico; as mensagens antigas viram um resumo (0: últimas 20 mensagens)')
+    parser.add_argument('--session', help='Nome da sessão gravada em disco (retomada se já existir)')
+    parser.add_argument('--list-sessions', action='store_true', help='Listar as sessões gravadas e sair')
+    parser.add_argument('--delete-session', metavar='NOME', help='Apagar uma sessão gravada e sair')
+    parser.add_argument('--sync', action='store_true',
+                        help='Modo interativo antigo (input() bloqueante), sem interromper a resposta com uma nova mensagem')
     
     args = parser.parse_args()
+    configure_gateway(keep_alive=args.keep_alive)
+    
+    if args.list_sessions:
+        sessions = SessionStore().list_sessions()
+        if not sessions:
+            print("Nenhuma sessão gravada.")
+        for session in sessions:
+            updated = datetime.fromtimestamp(session['updated']).strftime("%d/%m/%Y %H:%M")
+            print(f"{session['name']}: {session['messages']} mensagens, atualizada em {updated} - {session['preview']}")
+        return
+    if args.delete_session:
+        deleted = SessionStore().delete(args.delete_session)
+        print(f"Sessão '{args.delete_session}' apagada." if deleted else f"Sessão '{args.delete_session}' não encontrada.")
+        return
     
     # Check for stdin input (when piped)
     stdin_passed = not sys.stdin.isatty()
@@ -316,10 +630,27 @@ def main():
     elif stdin and not prompt:
         prompt = stdin
     
+    interactive = args.interactive or not prompt
+    
+    # No modo interativo, o núcleo em asyncio permite interromper a resposta em andamento
+    agent_class = IA_Agent
+    if interactive and not args.sync:
+        from async_agent import AsyncIA_Agent
+        agent_class = AsyncIA_Agent
+    
     # Create the IA agent
-    agent = IA_Agent(model=args.model, voice=args.voice)
+    agent = agent_class(
+        model=args.model,
+        voice=args.voice,
+        warmup_tts=args.warmup_tts and not args.text_only,
+        stream=args.stream,
+        preload=args.preload,
+        show_timings=args.timings,
+        context_tokens=args.context_tokens,
+        session=args.session
+    )
     
-    if args.interactive or not prompt:
+    if interactive:
         # Interactive mode
         agent.start_conversation(text_only=args.text_only)
     else:
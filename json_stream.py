@@ -0,0 +1,263 @@
+"""
+Leitura incremental de respostas JSON do Ollama em streaming (stream=True)
+
+O parser recebe o texto token a token e avisa:
+- on_string_delta(chave, trecho): cada novo pedaço de um campo de texto de primeiro nível
+  (por exemplo "thought" ou "response"), já com os escapes JSON decodificados
+- on_value(chave, valor): quando um campo de primeiro nível termina (por exemplo o objeto
+  "function"), permitindo validá-lo antes do fim da resposta
+"""
+import json
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+
+_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+
+class IncrementalJSONParser:
+    """Parser incremental para o objeto JSON de primeiro nível retornado pelo modelo"""
+
+    def __init__(
+        self,
+        on_string_delta: Optional[Callable[[str, str], None]] = None,
+        on_value: Optional[Callable[[str, Any], None]] = None
+    ):
+        self.on_string_delta = on_string_delta
+        self.on_value = on_value
+        self.buffer = ""
+        self.values: Dict[str, Any] = {}
+
+        self._depth = 0
+        self._expect = None  # No primeiro nível: 'key', 'colon', 'value' ou 'comma'
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._primitive = False
+
+        self._in_string = False
+        self._string_role: Optional[str] = None  # 'key', 'value' ou None (string aninhada)
+        self._string_chars: List[str] = []
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._delta: List[str] = []
+
+    def feed(self, text: str) -> None:
+        """Processa mais um pedaço do texto da resposta"""
+        start = len(self.buffer)
+        self.buffer += text
+
+        for index, ch in enumerate(text, start):
+            if self._in_string:
+                self._consume_string_char(ch)
+                continue
+
+            if self._primitive:
+                if ch not in ',}]' and not ch.isspace():
+                    continue
+                self._primitive = False
+                self._complete(self._key, self.buffer[self._value_start:index])
+                self._value_start = None
+                self._expect = 'comma'
+
+            if ch == '"':
+                self._in_string = True
+                self._string_chars = []
+                if self._depth == 1 and self._expect == 'key':
+                    self._string_role = 'key'
+                elif self._depth == 1 and self._expect == 'value':
+                    self._string_role = 'value'
+                else:
+                    self._string_role = None
+            elif ch in '{[':
+                if self._depth == 1 and self._expect == 'value':
+                    self._value_start = index
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect = 'key'
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    self._complete(self._key, self.buffer[self._value_start:index + 1])
+                    self._value_start = None
+                    self._expect = 'comma'
+            elif self._depth == 1:
+                if ch == ':':
+                    self._expect = 'value'
+                elif ch == ',':
+                    self._expect = 'key'
+                elif not ch.isspace() and self._expect == 'value':
+                    self._primitive = True
+                    self._value_start = index
+
+        self._flush_delta()
+
+    def result(self) -> Any:
+        """Retorna o JSON completo (levanta json.JSONDecodeError se estiver incompleto)"""
+        return json.loads(self.buffer)
+
+    def _consume_string_char(self, ch: str) -> None:
+        decoded = None
+        if self._escape is None:
+            if ch == '\\':
+                self._escape = ''
+            elif ch == '"':
+                self._in_string = False
+                self._close_string()
+                return
+            else:
+                decoded = ch
+        elif self._escape == '':
+            if ch == 'u':
+                self._escape = 'u'
+            else:
+                self._escape = None
+                decoded = _ESCAPES.get(ch, ch)
+        else:
+            self._escape += ch
+            if len(self._escape) == 5:
+                code = int(self._escape[1:], 16)
+                self._escape = None
+                if 0xD800 <= code < 0xDC00:
+                    self._high_surrogate = code
+                elif 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                    decoded = chr(0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00))
+                    self._high_surrogate = None
+                else:
+                    decoded = chr(code)
+
+        if decoded is None or self._string_role is None:
+            return
+        self._string_chars.append(decoded)
+        if self._string_role == 'value':
+            self._delta.append(decoded)
+
+    def _close_string(self) -> None:
+        text = ''.join(self._string_chars)
+        if self._string_role == 'key':
+            self._key = text
+            self._expect = 'colon'
+        elif self._string_role == 'value':
+            self._flush_delta()
+            self._expect = 'comma'
+            self.values[self._key] = text
+            if self.on_value:
+                self.on_value(self._key, text)
+        self._string_role = None
+
+    def _flush_delta(self) -> None:
+        if self._delta:
+            delta = ''.join(self._delta)
+            self._delta = []
+            if self.on_string_delta:
+                self.on_string_delta(self._key, delta)
+
+    def _complete(self, key: Optional[str], raw: str) -> None:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        self.values[key] = value
+        if self.on_value:
+            self.on_value(key, value)
+
+
+class StreamPrinter:
+    """Imprime campos de texto à medida que chegam, cada um com seu rótulo"""
+
+    def __init__(self, labels: Dict[str, str], out=None):
+        self.labels = labels
+        self.out = out
+        self._current: Optional[str] = None
+        self.printed: Dict[str, str] = {}
+
+    def on_string_delta(self, key: str, delta: str) -> None:
+        if key not in self.labels:
+            return
+        out = self.out or sys.stdout
+        if key != self._current:
+            self._end_line()
+            out.write(f"\n{self.labels[key]}: ")
+            self._current = key
+        out.write(delta)
+        out.flush()
+        self.printed[key] = self.printed.get(key, "") + delta
+
+    def on_value(self, key: str, value: Any) -> None:
+        if key == self._current:
+            self._end_line()
+
+    def _end_line(self) -> None:
+        if self._current is not None:
+            (self.out or sys.stdout).write("\n")
+            self._current = None
+
+
+def stream_chat(
+    model: str,
+    messages: List[Dict[str, str]],
+    format: Optional[Any] = None,
+    options: Optional[Dict[str, Any]] = None,
+    client: Any = None,
+    on_string_delta: Optional[Callable[[str, str], None]] = None,
+    on_value: Optional[Callable[[str, Any], None]] = None
+) -> str:
+    """
+    Chama o Ollama com stream=True, alimentando o parser incremental com cada token
+
+    Args:
+        client: Cliente com o método chat (padrão: o módulo ollama)
+
+    Returns:
+        str: Conteúdo completo da resposta, como no modo sem streaming
+    """
+    if client is None:
+        import ollama
+        client = ollama
+
+    parser = IncrementalJSONParser(on_string_delta=on_string_delta, on_value=on_value)
+    for chunk in client.chat(model=model, messages=messages, options=options, format=format, stream=True):
+        parser.feed(chunk['message']['content'])
+    return parser.buffer
+
+
+async def astream_chat(
+    model: str,
+    messages: List[Dict[str, str]],
+    format: Optional[Any] = None,
+    options: Optional[Dict[str, Any]] = None,
+    client: Any = None,
+    on_string_delta: Optional[Callable[[str, str], None]] = None,
+    on_value: Optional[Callable[[str, Any], None]] = None
+) -> str:
+    """
+    Versão asyncio de stream_chat
+
+    Args:
+        client: Cliente com o método achat (o OllamaGateway) ou chat assíncrono
+            (padrão: ollama.AsyncClient())
+
+    Se a tarefa for cancelada, o stream é fechado na hora e o Ollama para de gerar.
+    """
+    if client is None:
+        import ollama
+        client = ollama.AsyncClient()
+
+    chat = getattr(client, 'achat', None) or client.chat
+    parser = IncrementalJSONParser(on_string_delta=on_string_delta, on_value=on_value)
+    stream = await chat(model=model, messages=messages, options=options, format=format, stream=True)
+    try:
+        async for chunk in stream:
+            parser.feed(chunk['message']['content'])
+    finally:
+        if hasattr(stream, 'aclose'):
+            await stream.aclose()
+    return parser.buffer
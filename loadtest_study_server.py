@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do servidor de estudos com um Ollama fake
+
+Sobe o FakeOllamaServer e o StudyServer no mesmo processo e simula centenas de
+estudantes pedindo perguntas e respondendo ao mesmo tempo, cada um em sua conexão
+HTTP. Mede latência, vazão e quantas chamadas ao modelo foram evitadas pelo
+compartilhamento de variantes entre estudantes.
+
+Uso:
+    python loadtest_study_server.py --learners 300 --rounds 10 --cards 100 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import ollama
+
+from bench_study_generation import fake_responder
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import get_gateway
+from sm2_store import SM2StateStore
+from study_partner import QuestionItem
+from study_server import StudyServer
+
+
+class StudyClient:
+    """Cliente HTTP mínimo (uma conexão keep-alive) para o servidor de estudos"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self._writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+        )
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        data = await self._reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('content-type') == 'application/json':
+            return status, json.loads(data)
+        return status, data
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def simulate_learner(
+    name: str,
+    client: StudyClient,
+    rounds: int,
+    answers: Dict[str, str],
+    accuracy: float,
+    latencies: Dict[str, List[float]]
+):
+    """Um estudante: pede uma pergunta, responde (acertando com probabilidade `accuracy`), repete"""
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            status, question = await client.request('POST', f'/learners/{name}/next')
+            latencies['next'].append(time.perf_counter() - started)
+            assert status == 200, question
+
+            correct = answers[question['card_id']]
+            wrong = [option for option in question['options'] if option != correct]
+            choice = correct if random.random() < accuracy or not wrong else random.choice(wrong)
+            started = time.perf_counter()
+            status, result = await client.request('POST', f'/learners/{name}/answer', {"answer": choice})
+            latencies['answer'].append(time.perf_counter() - started)
+            assert status == 200, result
+    finally:
+        await client.close()
+
+
+async def run_load_test(
+    learners: int = 200,
+    rounds: int = 10,
+    cards: int = 50,
+    latency: float = 0.2,
+    llm_workers: int = 4,
+    variants: int = 3,
+    accuracy: float = 0.7,
+    state_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """Executa o teste de carga e retorna as métricas"""
+    fake = FakeOllamaServer(fake_responder, latency=latency).start()
+    gateway = get_gateway()
+    original_client = gateway.client
+    gateway.client = ollama.Client(host=fake.url)
+    questions = [{"question": f"Pergunta sintética {i}?", "answer": f"Resposta {i}"} for i in range(cards)]
+    answers = {QuestionItem(**q).card_id: q['answer'] for q in questions}
+    server = StudyServer(
+        questions,
+        state_store=SM2StateStore(state_path or ':memory:'),
+        port=0,
+        llm_workers=llm_workers,
+        variants_per_card=variants
+    )
+    await server.start()
+    latencies: Dict[str, List[float]] = {'next': [], 'answer': []}
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            simulate_learner(f"estudante-{i}", StudyClient(server.host, server.port), rounds, answers, accuracy, latencies)
+            for i in range(learners)
+        ))
+        elapsed = time.perf_counter() - started
+        stats = server.stats()
+        answered = sum(learner.session.total_questions for learner in server.learners.values())
+        score = sum(learner.session.score for learner in server.learners.values())
+    finally:
+        await server.stop()
+        fake.stop()
+        gateway.client = original_client
+
+    served = learners * rounds
+    return {
+        "elapsed": elapsed,
+        "questions_served": served,
+        "requests_per_second": 2 * served / elapsed,
+        "llm_calls": len(fake.requests),
+        "llm_calls_per_question": len(fake.requests) / served,
+        "next_p50": statistics.median(latencies['next']),
+        "next_p95": statistics.quantiles(latencies['next'], n=20)[-1],
+        "answer_p50": statistics.median(latencies['answer']),
+        "accuracy": score / answered if answered else 0.0,
+        "server": stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do servidor de estudos")
+    parser.add_argument('--learners', type=int, default=200, help='Estudantes simultâneos')
+    parser.add_argument('--rounds', type=int, default=10, help='Perguntas por estudante')
+    parser.add_argument('--cards', type=int, default=50, help='Perguntas no questionário')
+    parser.add_argument('--latency', type=float, default=0.2, help='Latência de cada chamada ao Ollama fake (s)')
+    parser.add_argument('--llm-workers', type=int, default=4, help='Chamadas simultâneas ao modelo')
+    parser.add_argument('--variants', type=int, default=3, help='Variantes compartilhadas por pergunta')
+    parser.add_argument('--accuracy', type=float, default=0.7, help='Probabilidade de o estudante acertar')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(run_load_test(
+            learners=args.learners,
+            rounds=args.rounds,
+            cards=args.cards,
+            latency=args.latency,
+            llm_workers=args.llm_workers,
+            variants=args.variants,
+            accuracy=args.accuracy,
+            state_path=f"{tmp}/state.sqlite3"
+        ))
+
+    print(f"{args.learners} estudantes x {args.rounds} perguntas em {result['elapsed']:.1f} s "
+          f"({result['requests_per_second']:.0f} req/s)")
+    print(f"Próxima pergunta: p50 {result['next_p50'] * 1000:.1f} ms | p95 {result['next_p95'] * 1000:.1f} ms")
+    print(f"Resposta: p50 {result['answer_p50'] * 1000:.1f} ms | taxa de acerto {result['accuracy'] * 100:.0f}%")
+    print(f"Chamadas ao modelo: {result['llm_calls']} para {result['questions_served']} perguntas "
+          f"({result['llm_calls_per_question']:.3f} por pergunta)")
+    print(f"Variantes: {json.dumps(result['server']['material'])}")
+
+
+if __name__ == "__main__":
+    main()
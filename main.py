@@ -1,44 +1,34 @@
 import json
 import subprocess
-import ollama
 import sys
+import time
 import argparse
-from pydantic import BaseModel, Field
-from typing import Literal, Union, List, Optional
-from pathlib import Path
-import os
-
-
-class OpenProgram(BaseModel):
-    """Function to open a program on the system"""
-    function_name: Literal["open_program"] = Field(description="The name of the function to call")
-    program_name: str = Field(description="Name of the program to open (e.g., 'kate', 'firefox', 'libreoffice')")
-    arguments: list[str] = Field(default=[], description="Additional arguments to pass to the program")
-
-
-class ExecuteCommand(BaseModel):
-    """Function to execute a shell command"""
-    function_name: Literal["execute_command"] = Field(description="The name of the function to call")
-    command: str = Field(description="The shell command to execute")
-    arguments: list[str] = Field(default=[], description="Additional arguments to pass to the command")
-
-
-class ListDirectory(BaseModel):
-    """Function to list directory contents"""
-    function_name: Literal["list_directory"] = Field(description="The name of the function to call")
-    path: str = Field(default=".", description="Path to the directory to list")
-
-
-class ReadFile(BaseModel):
-    """Function to read a file"""
-    function_name: Literal["read_file"] = Field(description="The name of the function to call")
-    path: str = Field(description="Path to the file to read")
-
-
-class FunctionCall(BaseModel):
-    """Represents a function call from the AI model"""
-    thought: str = Field(description="The reasoning behind the function call")
-    function: Union[OpenProgram, ExecuteCommand, ListDirectory, ReadFile] = Field(description="The function to call")
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Optional
+
+# Light imports only: pydantic, ollama and numpy are loaded when first needed
+from agent_functions import (
+    AGENT_ANSWER_SCHEMA,
+    AGENT_LOOP_SCHEMA,
+    FUNCTION_CALL_SCHEMA,
+    READ_ONLY_FUNCTIONS,
+    cached_function_call,
+    get_command_string
+)
+from command_cache import CommandCache, model_digest
+from json_stream import StreamPrinter, stream_chat
+from ollama_gateway import configure_gateway, format_timing, get_gateway
+
+if TYPE_CHECKING:
+    from semantic_cache import SemanticCache
+
+
+def __getattr__(name):
+    # The function models now live in agent_functions (main.FunctionCall still works)
+    import agent_functions
+    if name in agent_functions.MODELS:
+        return getattr(agent_functions, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def explain_command(function_call):
@@ -100,26 +90,6 @@ Detalhes:
     return explanation.strip()
 
 
-def get_command_string(function_call):
-    """
-    Retorna uma representação em string do comando a ser executado
-    """
-    func = function_call.function
-    
-    if func.function_name == "open_program":
-        cmd = [func.program_name] + (func.arguments or [])
-        return " ".join(cmd)
-    elif func.function_name == "execute_command":
-        cmd = [func.command] + (func.arguments or [])
-        return " ".join(cmd)
-    elif func.function_name == "list_directory":
-        return f"ls -la {func.path}"
-    elif func.function_name == "read_file":
-        return f"cat {func.path}"
-    else:
-        return f"Função desconhecida: {func.function_name}"
-
-
 def open_program(program_name: str, arguments: list[str] = None):
     """
     Opens a program on the system
@@ -202,7 +172,42 @@ def read_file(path: str):
         return f"Error reading file {path}: {str(e)}"
 
 
-def interaction_loop(full_completion: str, model: str = 'gemma3:latest', explain: bool = False):
+def run_function(func) -> str:
+    """
+    Runs a validated function (OpenProgram, ExecuteCommand, ListDirectory or ReadFile) and returns its output
+    """
+    if func.function_name == "open_program":
+        return open_program(func.program_name, func.arguments)
+    elif func.function_name == "execute_command":
+        return execute_command(func.command, func.arguments)
+    elif func.function_name == "list_directory":
+        return list_directory(func.path)
+    elif func.function_name == "read_file":
+        return read_file(func.path)
+    else:
+        return f"Função desconhecida: {func.function_name}"
+
+
+def confirm_reused_command(command: str) -> bool:
+    """
+    Asks the user to confirm a command reused from a similar request (semantic cache)
+
+    Without a terminal to ask (piped input), the command is not run.
+    """
+    if not sys.stdin.isatty():
+        print("Comando reutilizado de outro pedido: não é executado sem confirmação (use --no-cache para consultar o modelo).")
+        return False
+    try:
+        answer = input(f"Executar o comando reutilizado \"{command}\"? [s/N] ").strip().lower()
+    except (EOFError, KeyboardInterrupt):
+        answer = ""
+    if answer not in ('s', 'sim', 'y', 'yes'):
+        print("Comando não executado.")
+        return False
+    return True
+
+
+def interaction_loop(full_completion: str, model: str = 'gemma3:latest', explain: bool = False, stream: bool = False):
     """
     Interactive loop to handle command execution choices similar to SGPT
     """
@@ -245,18 +250,34 @@ def interaction_loop(full_completion: str, model: str = 'gemma3:latest', explain
                     "required": ["explanation"]
                 }
                 
-                response = ollama.chat(
-                    model=model,
-                    messages=[
-                        {
-                            'role': 'user', 
-                            'content': f'Explique detalhadamente o seguinte comando shell: {full_completion}'
-                        }
-                    ],
-                    format=schema
-                )
+                messages = [
+                    {
+                        'role': 'user', 
+                        'content': f'Explique detalhadamente o seguinte comando shell: {full_completion}'
+                    }
+                ]
+                
+                if stream:
+                    # Print the explanation while it is being generated
+                    printer = StreamPrinter({'explanation': 'Descrição'})
+                    response_content = stream_chat(
+                        model,
+                        messages,
+                        format=schema,
+                        client=get_gateway(),
+                        on_string_delta=printer.on_string_delta,
+                        on_value=printer.on_value
+                    )
+                    if printer.printed:
+                        continue
+                else:
+                    response = get_gateway().chat(
+                        model=model,
+                        messages=messages,
+                        format=schema
+                    )
+                    response_content = response['message']['content']
                 
-                response_content = response['message']['content']
                 if isinstance(response_content, str):
                     try:
                         parsed_response = json.loads(response_content)
@@ -277,89 +298,102 @@ def interaction_loop(full_completion: str, model: str = 'gemma3:latest', explain
             break
 
 
-def run_agent_interactive(user_input: str, model: str = 'gemma3:latest', execute: bool = False, explain: bool = False):
+def build_messages(user_input: str) -> list:
+    """
+    Messages sent to the model for a request (also part of the response cache key)
+    """
+    return [
+        {
+            'role': 'user', 
+            'content': f'A seguir está uma solicitação do usuário: "{user_input}". Decida qual ação tomar. Responda em formato JSON com os campos thought e function. A função deve ter function_name e os parâmetros apropriados. Para a entrada "{user_input}", retorne a chamada de função apropriada como JSON. Funções suportadas: open_program, execute_command, list_directory, read_file. Exemplos: "abrir o kate" -> open_program, "listar arquivos" -> list_directory, "ler arquivo.txt" -> read_file, "executar ls -la" -> execute_command.'
+        }
+    ]
+
+
+def run_agent_interactive(
+    user_input: str,
+    model: str = 'gemma3:latest',
+    execute: bool = False,
+    explain: bool = False,
+    stream: bool = False,
+    cache: Optional[CommandCache] = None,
+    semantic_cache: Optional["SemanticCache"] = None
+):
     """
     Runs the agent with structured outputs to decide which function to call, with interactive options
+
+    With stream=True the thought is printed while it is generated and the function
+    is validated as soon as its JSON object closes. With a cache, a request already
+    answered by the same model (same digest, prompt and schema) skips the model call;
+    with a semantic cache, so does a request similar enough to one answered before.
     """
-    # Define the schema for structured output with multiple possible functions
-    schema = {
-        "type": "object",
-        "properties": {
-            "thought": {
-                "type": "string",
-                "description": "The reasoning behind the function call"
-            },
-            "function": {
-                "type": "object",
-                "oneOf": [
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "open_program"},
-                            "program_name": {"type": "string", "description": "Name of the program to open"},
-                            "arguments": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "default": []
-                            }
-                        },
-                        "required": ["function_name", "program_name"]
-                    },
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "execute_command"},
-                            "command": {"type": "string", "description": "The shell command to execute"},
-                            "arguments": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "default": []
-                            }
-                        },
-                        "required": ["function_name", "command"]
-                    },
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "list_directory"},
-                            "path": {"type": "string", "description": "Path to the directory to list"}
-                        },
-                        "required": ["function_name"]
-                    },
-                    {
-                        "type": "object",
-                        "properties": {
-                            "function_name": {"const": "read_file"},
-                            "path": {"type": "string", "description": "Path to the file to read"}
-                        },
-                        "required": ["function_name", "path"]
-                    }
-                ],
-                "discriminator": {
-                    "propertyName": "function_name"
-                }
-            }
-        },
-        "required": ["thought", "function"]
+    schema = FUNCTION_CALL_SCHEMA
+    messages = build_messages(user_input)
+    options = {
+        'temperature': 0  # For more deterministic output
     }
 
+    # Generation is deterministic (temperature 0), so a previous answer can be reused
+    cache_key = None
+    cached_content = None
+    if cache is not None and options['temperature'] == 0:
+        cache_key = CommandCache.make_key(model_digest(model), messages, schema, options)
+        cached_content = cache.get(cache_key)
+        if cached_content is not None:
+            print("(resposta do cache)")
+    exact_hit = cached_content is not None
+
+    if cached_content is None and semantic_cache is not None:
+        try:
+            match = semantic_cache.lookup(user_input, model)
+        except Exception as e:
+            print(f"Cache semântico indisponível: {e}")
+            semantic_cache = None
+            match = None
+        if match is not None:
+            cached_content, similarity, original = match
+            print(f'(comando reutilizado do pedido "{original}", similaridade {similarity:.2f})')
+    semantic_hit = cached_content is not None and not exact_hit
+
     # Call the model with structured output
-    response = ollama.chat(
-        model=model,
-        messages=[
-            {
-                'role': 'user', 
-                'content': f'A seguir está uma solicitação do usuário: "{user_input}". Decida qual ação tomar. Responda em formato JSON com os campos thought e function. A função deve ter function_name e os parâmetros apropriados. Para a entrada "{user_input}", retorne a chamada de função apropriada como JSON. Funções suportadas: open_program, execute_command, list_directory, read_file. Exemplos: "abrir o kate" -> open_program, "listar arquivos" -> list_directory, "ler arquivo.txt" -> read_file, "executar ls -la" -> execute_command.'
-            }
-        ],
-        options={
-            'temperature': 0  # For more deterministic output
-        },
-        format=schema
-    )
+    early_function = {}
+    if cached_content is not None:
+        response_content = cached_content
+        stream = False
+    elif stream:
+        from agent_functions import FunctionAdapter, FunctionCall
+        printer = StreamPrinter({'thought': 'Pensamento'})
+
+        def on_value(key, value):
+            printer.on_value(key, value)
+            if key == 'function':
+                # Validate the function without waiting for the rest of the response
+                try:
+                    early_function['function'] = FunctionAdapter.validate_python(value)
+                except Exception:
+                    return
+                command_str = get_command_string(FunctionCall(thought="", function=early_function['function']))
+                print(f"\nComando sugerido: {command_str}")
+
+        response_content = stream_chat(
+            model,
+            messages,
+            format=schema,
+            options=options,
+            client=get_gateway(),
+            on_string_delta=printer.on_string_delta,
+            on_value=on_value
+        )
+    else:
+        response = get_gateway().chat(
+            model=model,
+            messages=messages,
+            options=options,
+            format=schema
+        )
+        response_content = response['message']['content']
 
     # Parse the response
-    response_content = response['message']['content']
     if isinstance(response_content, str):
         try:
             parsed_response = json.loads(response_content)
@@ -369,36 +403,46 @@ def run_agent_interactive(user_input: str, model: str = 'gemma3:latest', execute
     else:
         parsed_response = response_content
 
-    print(f"Resposta bruta: {parsed_response}")
+    if not stream:
+        print(f"Resposta bruta: {parsed_response}")
     
     try:
-        # Validate and execute the function
-        function_call = FunctionCall.model_validate(parsed_response)
+        # Validate and execute the function (answers from the cache were validated when stored)
+        if cached_content is not None:
+            function_call = cached_function_call(parsed_response)
+        else:
+            from agent_functions import FunctionCall
+            function_call = FunctionCall.model_validate(parsed_response)
         
-        print(f"\nPensamento: {function_call.thought}")
+        if not stream:
+            print(f"\nPensamento: {function_call.thought}")
+
+        if cached_content is None:
+            content = function_call.model_dump_json()
+            if cache_key is not None:
+                cache.put(cache_key, content, model=model)
+            if semantic_cache is not None:
+                semantic_cache.add(user_input, content, model)
+        # A command reused from a similar request is never stored under this request's key:
+        # only what the model generated for the exact prompt goes into the exact cache
         
         # Show the command
         command_str = get_command_string(function_call)
-        print(f"\nComando sugerido: {command_str}")
+        if 'function' not in early_function:
+            print(f"\nComando sugerido: {command_str}")
         
         if explain:
             explanation = explain_command(function_call)
             print(f"\nExplicação:")
             print(explanation)
         
+        # A command reused from another request only runs after the user confirms it
+        if execute and semantic_hit and not confirm_reused_command(command_str):
+            execute = False
+        
         if execute:
             print(f"\nExecutando...")
-            func = function_call.function
-            if func.function_name == "open_program":
-                result = open_program(func.program_name, func.arguments)
-            elif func.function_name == "execute_command":
-                result = execute_command(func.command, func.arguments)
-            elif func.function_name == "list_directory":
-                result = list_directory(func.path)
-            elif func.function_name == "read_file":
-                result = read_file(func.path)
-            else:
-                result = f"Função desconhecida: {func.function_name}"
+            result = run_function(function_call.function)
             
             print(f"\nResultado: {result}")
             return result
@@ -415,6 +459,188 @@ def run_agent_interactive(user_input: str, model: str = 'gemma3:latest', execute
         return "Erro ao processar a chamada de função"
 
 
+LOOP_INSTRUCTIONS = (
+    "Você é um agente que atende à solicitação do usuário chamando funções e lendo os resultados.\n"
+    "Funções: open_program, execute_command, list_directory, read_file.\n"
+    "Em cada passo, responda em JSON com thought, calls e answer:\n"
+    "- calls: as funções a chamar agora. Elas rodam juntas e não veem os resultados umas das outras; "
+    "o que depender de um resultado fica para o passo seguinte\n"
+    "- Os resultados chegam na próxima mensagem\n"
+    "- Quando não precisar de mais nada, deixe calls vazia e responda ao usuário em answer"
+)
+
+
+def plan_waves(functions: list) -> list:
+    """
+    Groups the calls of one step into waves that run one after the other
+
+    Read-only calls next to each other share a wave and run in parallel; each call with
+    side effects (execute_command, open_program) gets its own wave, so commands keep the
+    order the model gave them. Invalid calls (None) are left out.
+    """
+    waves = []
+    reads = None
+    for index, func in enumerate(functions):
+        if func is None:
+            continue
+        if func.function_name in READ_ONLY_FUNCTIONS:
+            if reads is None:
+                reads = []
+                waves.append(reads)
+            reads.append(index)
+        else:
+            waves.append([index])
+            reads = None
+    return waves
+
+
+def _run_call(func, execute: bool, allow_read: bool) -> dict:
+    """
+    Runs one call of the agent loop, timing it
+
+    As in run_agent_interactive, every function needs execute=True; allow_read=True
+    lets only the read-only ones (list_directory, read_file) run without it.
+    """
+    started = time.perf_counter()
+    if execute or (allow_read and func.function_name in READ_ONLY_FUNCTIONS):
+        result, executed = run_function(func), True
+    elif func.function_name in READ_ONLY_FUNCTIONS:
+        result, executed = "Não executado: o usuário não autorizou a leitura de arquivos (--allow-read ou --execute).", False
+    else:
+        result, executed = "Não executado: o usuário não autorizou funções com efeitos (--execute).", False
+    return {"result": result, "executed": executed, "seconds": time.perf_counter() - started}
+
+
+def format_results(calls: list, max_chars: int = 4000) -> str:
+    """Message with the results of one step, sent back to the model (each result capped at max_chars)"""
+    parts = ["Resultados das funções:"]
+    for number, call in enumerate(calls, 1):
+        result = call["result"]
+        if len(result) > max_chars:
+            result = result[:max_chars] + f"\n[... {len(result) - max_chars} caracteres omitidos]"
+        parts.append(f"[{number}] {call['command']}\n{result}")
+    return "\n\n".join(parts)
+
+
+def run_agent_loop(
+    user_input: str,
+    model: str = 'gemma3:latest',
+    execute: bool = False,
+    allow_read: bool = False,
+    max_steps: int = 5,
+    max_workers: int = 4,
+    max_result_chars: int = 4000
+) -> dict:
+    """
+    Runs the agent as a multi-step tool loop: the model asks for a list of calls, their
+    results go back to it, and it either asks for more calls or answers
+
+    The calls of a step run in waves (see plan_waves): read-only calls in parallel on a
+    thread pool, calls with side effects one at a time. Nothing runs without execute=True,
+    except the read-only calls when allow_read=True; the model is told what did not run.
+    At most max_steps model calls are made; the last one allowed uses a schema with no
+    calls, so the model has to answer with what it has.
+
+    Returns:
+        dict with answer, steps (thought, calls with result and seconds, model_seconds,
+        tools_seconds, seconds), total_seconds and budget_exhausted
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from agent_functions import FunctionAdapter
+
+    messages = [
+        {'role': 'system', 'content': LOOP_INSTRUCTIONS},
+        {'role': 'user', 'content': user_input}
+    ]
+    options = {'temperature': 0}
+    steps = []
+    answer = ""
+    budget_exhausted = False
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool") as pool:
+        for number in range(1, max_steps + 1):
+            last = number == max_steps
+            step_started = time.perf_counter()
+            response = get_gateway().chat(
+                model=model,
+                messages=messages,
+                format=AGENT_ANSWER_SCHEMA if last else AGENT_LOOP_SCHEMA,
+                options=options
+            )
+            content = response['message']['content']
+            model_seconds = time.perf_counter() - step_started
+            try:
+                parsed = json.loads(content)
+            except json.JSONDecodeError:
+                parsed = None
+            if not isinstance(parsed, dict):
+                parsed = {"thought": "", "answer": content}
+
+            step = {"thought": parsed.get('thought', ''), "calls": [], "model_seconds": model_seconds, "tools_seconds": 0.0}
+            steps.append(step)
+            print(f"\nPasso {number}: {step['thought']}")
+
+            raw_calls = [] if last else parsed.get('calls') or []
+            if not isinstance(raw_calls, list):
+                # Neither iterated key by key nor character by character: the error goes back to the model
+                raw_calls = [{"calls": raw_calls}]
+            if not raw_calls:
+                answer = parsed.get('answer') or ""
+                budget_exhausted = last and number > 1
+                step["seconds"] = time.perf_counter() - step_started
+                break
+
+            # Invalid calls are not run; the error goes back to the model with the other results
+            functions = []
+            for raw in raw_calls:
+                try:
+                    func = FunctionAdapter.validate_python(raw)
+                except Exception as e:
+                    functions.append(None)
+                    step["calls"].append({"command": json.dumps(raw, ensure_ascii=False), "result": f"Erro: chamada inválida: {e}",
+                                          "executed": False, "seconds": 0.0})
+                    continue
+                functions.append(func)
+                step["calls"].append({"command": get_command_string(SimpleNamespace(function=func))})
+
+            tools_started = time.perf_counter()
+            for wave in plan_waves(functions):
+                if len(wave) == 1:
+                    outcomes = [_run_call(functions[wave[0]], execute, allow_read)]
+                else:
+                    outcomes = list(pool.map(lambda index: _run_call(functions[index], execute, allow_read), wave))
+                for index, outcome in zip(wave, outcomes):
+                    step["calls"][index].update(outcome)
+            step["tools_seconds"] = time.perf_counter() - tools_started
+
+            for call in step["calls"]:
+                status = "" if call["executed"] else " (não executada)"
+                print(f"  -> {call['command']}{status} [{call['seconds']:.2f} s]")
+
+            results = format_results(step["calls"], max_result_chars)
+            if number + 1 == max_steps:
+                results += "\n\nLimite de passos atingido: responda agora em answer, com o que já sabe."
+            messages.append({'role': 'assistant', 'content': content})
+            messages.append({'role': 'user', 'content': results})
+            step["seconds"] = time.perf_counter() - step_started
+
+    total_seconds = time.perf_counter() - started
+    print(f"\nResposta: {answer}")
+    print(
+        f"Passos: {len(steps)} de {max_steps} | "
+        f"modelo {sum(step['model_seconds'] for step in steps):.2f} s | "
+        f"funções {sum(step['tools_seconds'] for step in steps):.2f} s | "
+        f"total {total_seconds:.2f} s"
+    )
+    return {
+        "answer": answer,
+        "steps": steps,
+        "total_seconds": total_seconds,
+        "budget_exhausted": budget_exhausted
+    }
+
+
 def main():
     """
     Main function to run the agent with options similar to sgpt
@@ -428,8 +654,34 @@ def main():
     parser.add_argument('--temperature', '-t', type=float, default=0.0, help='Temperatura para geracao (0.0-2.0)')
     parser.add_argument('--describe-shell', '-d', action='store_true', help='Descrever um comando shell')
     parser.add_argument('--interaction', action='store_true', help='Modo interativo para comandos shell')
+    parser.add_argument('--stream', action='store_true', help='Mostrar a resposta do modelo enquanto é gerada')
+    parser.add_argument('--no-cache', action='store_true', help='Não usar o cache de respostas do modelo')
+    parser.add_argument('--cache-stats', action='store_true', help='Mostrar as estatísticas do cache de respostas e sair')
+    parser.add_argument('--semantic-cache', action='store_true',
+                        help='Reaproveitar o comando de pedidos parecidos já respondidos (usa um modelo de embeddings)')
+    parser.add_argument('--embedding-model', default='nomic-embed-text', help='Modelo de embeddings do cache semântico')
+    parser.add_argument('--similarity', type=float, default=0.92, help='Similaridade mínima (0-1) para reaproveitar um comando')
+    parser.add_argument('--keep-alive', default=None,
+                        help='Tempo que o modelo fica carregado no Ollama após a resposta (ex.: 10m, 1h, -1 para sempre; padrão: AGENT_OLLAMA_KEEP_ALIVE ou o do Ollama)')
+    parser.add_argument('--timings', action='store_true', help='Mostrar os tempos de carregamento do modelo, do prompt e da geração')
+    parser.add_argument('--max-steps', type=int, default=0,
+                        help='Loop de várias etapas: os resultados das funções voltam para o modelo, até N passos (0: uma única função)')
+    parser.add_argument('--allow-read', action='store_true',
+                        help='No loop de várias etapas, deixar o modelo listar pastas e ler arquivos sem --execute')
     
     args = parser.parse_args()
+    if args.keep_alive is not None:
+        configure_gateway(keep_alive=args.keep_alive)
+
+    cache = None if args.no_cache else CommandCache()
+    semantic_cache = None
+    if args.semantic_cache and not args.no_cache:
+        from semantic_cache import SemanticCache
+        semantic_cache = SemanticCache(embedding_model=args.embedding_model, threshold=args.similarity)
+    if args.cache_stats:
+        stats = (cache or CommandCache()).stats()
+        print(f"Respostas em cache: {stats['entries']} ({stats['total_hits']} acertos acumulados)")
+        return
     
     # Check for stdin input (when piped)
     stdin_passed = not sys.stdin.isatty()
@@ -450,14 +702,35 @@ def main():
         parser.print_help()
         return
     
+    if args.max_steps > 0:
+        # Multi-step loop: functions run only with --execute (or, for reads, --allow-read)
+        run_agent_loop(prompt, model=args.model, execute=args.execute or args.shell,
+                       allow_read=args.allow_read, max_steps=args.max_steps)
+        if args.timings:
+            print(format_timing(get_gateway().last_timing))
+        return
+    
     # Process the command with options
-    result = run_agent_interactive(prompt, model=args.model, execute=args.execute or args.shell, explain=args.explain)
+    result = run_agent_interactive(
+        prompt,
+        model=args.model,
+        execute=args.execute or args.shell,
+        explain=args.explain,
+        stream=args.stream,
+        cache=cache,
+        semantic_cache=semantic_cache
+    )
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} acerto(s), {stats['misses']} falha(s)")
+    if args.timings:
+        print(format_timing(get_gateway().last_timing))
     
     # If shell interaction is enabled and result is a command string
     if args.interaction and isinstance(result, dict):
         command = result['command']
         print(f"\nComando gerado: {command}")
-        interaction_loop(command, model=args.model, explain=args.explain)
+        interaction_loop(command, model=args.model, explain=args.explain, stream=args.stream)
     elif args.interaction and isinstance(result, str) and not result.startswith("Erro"):
         # If execute was already done but interaction was requested
         print("O comando já foi executado.")
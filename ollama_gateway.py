@@ -0,0 +1,490 @@
+"""
+Camada compartilhada de acesso ao Ollama
+
+Todas as chamadas ao modelo (main.py, ia_agent.py, study_partner.py...) passam por um
+único OllamaGateway, que:
+- junta pedidos idênticos em andamento (mesmo modelo, mensagens, formato e opções)
+  em uma única chamada, entregando o mesmo resultado a todos, quando a resposta é
+  determinística (temperature 0 ou seed fixo): pedidos com amostragem, como as
+  variantes de uma pergunta, vão cada um ao modelo;
+- limita as chamadas simultâneas ao Ollama local (AGENT_OLLAMA_CONCURRENCY, padrão 4);
+- atende primeiro os pedidos interativos e depois o trabalho de segundo plano, como a
+  pré-busca de perguntas;
+- mede a fila (profundidade e tempo de espera);
+- repassa o keep_alive configurado (AGENT_OLLAMA_KEEP_ALIVE ou --keep-alive dos
+  programas), para o modelo continuar na memória entre as chamadas;
+- separa, nos tempos que o Ollama devolve, o carregamento do modelo da avaliação do
+  prompt e da geração;
+- oferece a mesma chamada em asyncio (achat, com ollama.AsyncClient), sob o mesmo
+  limite e as mesmas prioridades; cancelar a tarefa fecha a conexão e o Ollama para
+  de gerar.
+
+Exemplo:
+    from ollama_gateway import BACKGROUND, get_gateway, request_priority
+
+    with request_priority(BACKGROUND):
+        get_gateway().chat(model='gemma3:latest', messages=[...])
+"""
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import statistics
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+
+# Prioridades (menor é atendida primeiro)
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# Carregamentos acima deste tempo (em segundos) contam como o modelo saindo do disco
+COLD_LOAD_THRESHOLD = 0.5
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar('ollama_priority', default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Define a prioridade das chamadas feitas dentro do bloco (na thread atual)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_keep_alive(value: Any) -> Any:
+    """
+    keep_alive como o Ollama espera: números (em segundos, negativos: para sempre) ou
+    durações como "30m" e "1h"
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    value = str(value).strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def response_timing(response: Any) -> Optional[Dict[str, float]]:
+    """Tempos de uma resposta do Ollama (em segundos), ou None se ela não os trouxer"""
+    if response.get('total_duration') is None:
+        return None
+    return {
+        "total": (response.get('total_duration') or 0) / 1e9,
+        "load": (response.get('load_duration') or 0) / 1e9,
+        "prompt_eval": (response.get('prompt_eval_duration') or 0) / 1e9,
+        "prompt_tokens": response.get('prompt_eval_count') or 0,
+        "eval": (response.get('eval_duration') or 0) / 1e9,
+        "eval_tokens": response.get('eval_count') or 0
+    }
+
+
+def format_timing(timing: Optional[Dict[str, float]]) -> str:
+    """Tempos de uma resposta em uma linha"""
+    if not timing:
+        return "Tempos: indisponíveis"
+    rate = timing["eval_tokens"] / timing["eval"] if timing["eval"] else 0.0
+    return (
+        f"Tempos: carga {timing['load']:.2f} s | "
+        f"prompt {timing['prompt_tokens']} tokens em {timing['prompt_eval']:.2f} s | "
+        f"geração {timing['eval_tokens']} tokens em {timing['eval']:.2f} s ({rate:.1f} tokens/s) | "
+        f"total {timing['total']:.2f} s"
+    )
+
+
+def is_deterministic(options: Optional[Dict[str, Any]]) -> bool:
+    """A resposta é a mesma para o mesmo pedido: temperature 0 ou seed fixo"""
+    options = options or {}
+    return options.get('temperature') == 0 or options.get('seed') is not None
+
+
+class _InFlight:
+    """Chamada em andamento à qual pedidos idênticos se juntam"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # Lugar do líder na fila enquanto ele espera uma vaga ([prioridade, ordem])
+        self.entry: Optional[list] = None
+
+
+class OllamaGateway:
+    """Cliente compartilhado do Ollama com junção de pedidos, limite de concorrência e prioridades"""
+
+    def __init__(
+        self,
+        client: Any = None,
+        max_concurrency: int = 4,
+        keep_alive: Any = None,
+        async_client: Any = None,
+        async_host: Optional[str] = None
+    ):
+        """
+        Args:
+            client: Cliente com o método chat (padrão: o módulo ollama, importado na primeira chamada)
+            async_client: Cliente assíncrono para achat, usado como está (só serve ao event loop em que foi usado)
+            async_host: Endereço do Ollama para os clientes assíncronos criados pelo gateway
+                (padrão: OLLAMA_HOST); sem async_client, cada event loop ganha o seu
+            max_concurrency: Número máximo de chamadas simultâneas ao Ollama
+            keep_alive: Tempo que o modelo fica na memória após cada chamada (None: o padrão do Ollama)
+        """
+        self.client = client
+        self.async_client = async_client
+        self.async_host = async_host
+        self._async_clients: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+        self.max_concurrency = max_concurrency
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting: List[list] = []
+        self._seq = itertools.count()
+        self._inflight: Dict[str, _InFlight] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+        self.max_queue_depth = 0
+        self._waits: Dict[int, deque] = {}
+        self.last_timing: Optional[Dict[str, float]] = None
+        self._timings: deque = deque(maxlen=1000)
+
+    def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        format: Optional[Any] = None,
+        options: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        priority: Optional[int] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Mesma interface de ollama.chat
+
+        Só pedidos determinísticos (is_deterministic) são juntados: com amostragem, cada
+        chamada deve ter a sua resposta. Quem se junta com prioridade maior que a do
+        pedido que está na fila o adianta. Chamadas com stream=True não são juntadas
+        (cada uma tem seus próprios tokens), mas respeitam o limite de concorrência
+        durante todo o streaming.
+        """
+        priority = _priority.get() if priority is None else priority
+        request = dict(model=model, messages=messages, format=format, options=options, **kwargs)
+        if self.keep_alive is not None:
+            request.setdefault('keep_alive', self.keep_alive)
+        if stream:
+            return self._stream(request, priority)
+        if not is_deterministic(options):
+            self._acquire(priority)
+            try:
+                response = self._backend().chat(**request)
+            finally:
+                self._release()
+            self._record_timing(response)
+            return response
+
+        key = json.dumps(request, sort_keys=True, default=str)
+        with self._cond:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+                if call.entry is not None and priority < call.entry[0]:
+                    # O líder ainda está na fila: passa a esperar com a prioridade de quem se juntou
+                    call.entry[0] = priority
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            self._acquire(priority, call)
+            try:
+                call.result = self._backend().chat(**request)
+            finally:
+                self._release()
+            self._record_timing(call.result)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    async def achat(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        format: Optional[Any] = None,
+        options: Optional[Dict[str, Any]] = None,
+        stream: bool = False,
+        priority: Optional[int] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Mesma interface de ollama.AsyncClient().chat, com o limite de concorrência e as prioridades
+
+        Não junta pedidos. Cancelar a tarefa (inclusive na fila) devolve a vaga; durante o
+        streaming, fecha a conexão e o Ollama interrompe a geração.
+        """
+        priority = _priority.get() if priority is None else priority
+        request = dict(model=model, messages=messages, format=format, options=options, **kwargs)
+        if self.keep_alive is not None:
+            request.setdefault('keep_alive', self.keep_alive)
+        if stream:
+            return self._astream(request, priority)
+
+        await self._aacquire(priority)
+        try:
+            response = await self._async_backend().chat(**request)
+        finally:
+            self._release()
+        self._record_timing(response)
+        return response
+
+    def embed(self, model: str, input: Any, priority: Optional[int] = None, **kwargs: Any) -> Any:
+        """Mesma interface de ollama.embed, dentro do limite de concorrência"""
+        if self.keep_alive is not None:
+            kwargs.setdefault('keep_alive', self.keep_alive)
+        self._acquire(_priority.get() if priority is None else priority)
+        try:
+            return self._backend().embed(model=model, input=input, **kwargs)
+        finally:
+            self._release()
+
+    def preload(self, model: str, keep_alive: Any = None, priority: Optional[int] = None) -> Optional[Dict[str, float]]:
+        """
+        Carrega o modelo na memória do Ollama sem gerar nada (chat com a lista de mensagens vazia)
+
+        Returns:
+            Os tempos da chamada ("load" é o carregamento), ou None se o cliente não os informar
+        """
+        keep_alive = self.keep_alive if keep_alive is None else parse_keep_alive(keep_alive)
+        request: Dict[str, Any] = dict(model=model, messages=[])
+        if keep_alive is not None:
+            request['keep_alive'] = keep_alive
+        self._acquire(_priority.get() if priority is None else priority)
+        try:
+            response = self._backend().chat(**request)
+        finally:
+            self._release()
+        return self._record_timing(response)
+
+    def list(self) -> Any:
+        """Mesma interface de ollama.list (não ocupa vaga: não roda o modelo)"""
+        return self._backend().list()
+
+    def _stream(self, request: Dict[str, Any], priority: int) -> Iterator[Any]:
+        self._acquire(priority)
+        try:
+            for chunk in self._backend().chat(stream=True, **request):
+                if chunk.get('done'):
+                    self._record_timing(chunk)
+                yield chunk
+        finally:
+            self._release()
+
+    async def _astream(self, request: Dict[str, Any], priority: int) -> AsyncIterator[Any]:
+        await self._aacquire(priority)
+        try:
+            stream = await self._async_backend().chat(stream=True, **request)
+            try:
+                async for chunk in stream:
+                    if chunk.get('done'):
+                        self._record_timing(chunk)
+                    yield chunk
+            finally:
+                # Fecha a resposta HTTP já, em vez de quando o gerador for coletado
+                if hasattr(stream, 'aclose'):
+                    await stream.aclose()
+        finally:
+            self._release()
+
+    def _record_timing(self, response: Any) -> Optional[Dict[str, float]]:
+        try:
+            timing = response_timing(response)
+        except AttributeError:
+            return None  # Cliente sem os campos de tempo
+        if timing is not None:
+            with self._cond:
+                self.last_timing = timing
+                self._timings.append(timing)
+        return timing
+
+    def _backend(self) -> Any:
+        if self.client is None:
+            import ollama
+            return ollama
+        return self.client
+
+    def _async_backend(self) -> Any:
+        if self.async_client is not None:
+            return self.async_client
+        # As conexões do httpx ficam presas ao event loop que as abriu: um cliente por loop
+        import asyncio
+        import ollama
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = ollama.AsyncClient(host=self.async_host)
+        return client
+
+    async def _aacquire(self, priority: int) -> None:
+        """_acquire sem bloquear o event loop; se a tarefa for cancelada na fila, a vaga é devolvida ao chegar"""
+        import asyncio  # Só quem usa achat paga a importação
+
+        future = asyncio.get_running_loop().run_in_executor(None, self._acquire, priority)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() is not None or self._release())
+            raise
+
+    def _acquire(self, priority: int, call: Optional[_InFlight] = None) -> None:
+        """
+        Espera uma vaga; entre os que esperam, vence a menor prioridade e depois a ordem de chegada
+
+        Com `call`, a entrada na fila fica em call.entry, para quem se junta ao pedido poder adiantá-lo.
+        """
+        started = time.perf_counter()
+        with self._cond:
+            entry = [priority, next(self._seq)]
+            heapq.heappush(self._waiting, entry)
+            if call is not None:
+                call.entry = entry
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            while self._waiting[0] is not entry or self._active >= self.max_concurrency:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            if call is not None:
+                call.entry = None
+            self._active += 1
+            self.calls += 1
+            self._waits.setdefault(entry[0], deque(maxlen=1000)).append(time.perf_counter() - started)
+            # O próximo da fila pode ter vaga também
+            self._cond.notify_all()
+
+    def _release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Chamadas, pedidos juntados, fila atual e tempos de espera (em segundos) por prioridade"""
+        with self._cond:
+            waits = {priority: list(values) for priority, values in self._waits.items()}
+            timings = list(self._timings)
+            metrics = {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "active": self._active,
+                "queue_depth": len(self._waiting),
+                "max_queue_depth": self.max_queue_depth,
+                "max_concurrency": self.max_concurrency
+            }
+        metrics["wait"] = {
+            priority: {
+                "count": len(values),
+                "mean": statistics.mean(values),
+                "max": max(values)
+            }
+            for priority, values in waits.items() if values
+        }
+        metrics["keep_alive"] = self.keep_alive
+        metrics["timings"] = {"count": len(timings)}
+        if timings:
+            for name in ("load", "prompt_eval", "eval"):
+                values = [timing[name] for timing in timings]
+                metrics["timings"][name] = {
+                    "total": sum(values),
+                    "mean": statistics.mean(values),
+                    "max": max(values)
+                }
+            metrics["timings"]["cold_loads"] = sum(1 for timing in timings if timing["load"] >= COLD_LOAD_THRESHOLD)
+        return metrics
+
+
+_gateway: Optional[OllamaGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> OllamaGateway:
+    """Gateway compartilhado pelo processo"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = OllamaGateway(
+                max_concurrency=int(os.environ.get('AGENT_OLLAMA_CONCURRENCY', 4)),
+                keep_alive=os.environ.get('AGENT_OLLAMA_KEEP_ALIVE') or None
+            )
+        return _gateway
+
+
+def configure_gateway(
+    client: Any = None,
+    max_concurrency: Optional[int] = None,
+    keep_alive: Any = None,
+    async_client: Any = None,
+    async_host: Optional[str] = None
+) -> OllamaGateway:
+    """Troca os clientes, o limite de concorrência ou o keep_alive do gateway compartilhado"""
+    gateway = get_gateway()
+    if client is not None:
+        gateway.client = client
+    if async_client is not None:
+        gateway.async_client = async_client
+    if async_host is not None:
+        gateway.async_host = async_host
+    if keep_alive is not None:
+        gateway.keep_alive = parse_keep_alive(keep_alive)
+    if max_concurrency is not None:
+        with gateway._cond:
+            gateway.max_concurrency = max_concurrency
+            gateway._cond.notify_all()
+    return gateway
+
+
+def warmup_model(model: str, keep_alive: Any = None, background: bool = False):
+    """
+    Carrega o modelo no Ollama antecipadamente, para que a primeira pergunta não pague o carregamento
+
+    Args:
+        model: Modelo a carregar
+        keep_alive: Tempo que o modelo fica na memória (padrão: o do gateway)
+        background: Se True, carrega em uma thread daemon e retorna a thread
+
+    Returns:
+        threading.Thread se background=True, caso contrário os tempos do carregamento
+    """
+    def _warmup():
+        try:
+            with request_priority(BACKGROUND):
+                return get_gateway().preload(model, keep_alive=keep_alive)
+        except Exception as e:
+            print(f"Erro ao pré-carregar o modelo {model}: {e}")
+            return None
+
+    if background:
+        thread = threading.Thread(target=_warmup, name="ollama-warmup", daemon=True)
+        thread.start()
+        return thread
+    return _warmup()
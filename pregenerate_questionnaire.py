@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Pré-geração offline de um questionário em um pacote (.pack)
+
+Gera, em paralelo e sem interação, várias variantes de cada pergunta (reformulação +
+respostas incorretas) e o áudio do Kokoro de cada variante, gravando tudo em um único
+arquivo SQLite (veja question_pack.py). Depois a sessão de estudo é servida do pacote:
+
+    python pregenerate_questionnaire.py questionnaires.json -o estudo.pack -n 3
+    python run_study_partner.py --pack estudo.pack
+
+O áudio das opções não é pré-gerado: as opções são embaralhadas a cada exibição.
+A geração pode ser interrompida e retomada; o que já está no pacote é reaproveitado.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ollama_gateway import BACKGROUND, request_priority
+from question_pack import QuestionPack
+from study_partner import QuestionItem, StudySession, flatten_questionnaire
+
+
+def pregenerate(
+    items,
+    output: str,
+    variants: int = 3,
+    workers: int = 4,
+    tts_workers: int = 1,
+    model: str = 'gemma3:latest',
+    voice: str = 'pf_dora',
+    generation_strategy: str = 'combined',
+    text_only: bool = False,
+    verbose: bool = True
+) -> dict:
+    """
+    Gera o pacote de perguntas
+
+    As chamadas ao modelo e a síntese de voz rodam em pools separados; toda escrita no
+    pacote acontece na thread principal, à medida que as tarefas terminam.
+
+    Returns:
+        dict: Contagens de variantes e áudios gerados, falhas e tempo total
+    """
+    pack = QuestionPack(output)
+    pack.set_meta(model=model, voice=voice, generation_strategy=generation_strategy, variants=variants)
+    keys = pack.add_items(items)
+    question_items = [QuestionItem(question=item['question'], answer=item['answer']) for item in items]
+
+    # Sessão usada apenas para reaproveitar os prompts e schemas de geração
+    session = StudySession(questions=[], model=model, generation_strategy=generation_strategy)
+
+    done_variants = pack.variant_indexes()
+    done_audio = pack.audio_indexes()
+    stats = {"variants": 0, "audio": 0, "failed": 0}
+    started = time.perf_counter()
+
+    def generate(item: QuestionItem):
+        with request_priority(BACKGROUND):
+            reformulated_question, choices = session._generate_material(item)
+        if not session._is_generated(item, reformulated_question, choices):
+            raise RuntimeError("o modelo não retornou uma variante válida")
+        return reformulated_question, choices
+
+    def synthesize(text: str):
+        from tts_response import get_kokoro_audio
+        return get_kokoro_audio(text, voice=voice, repo_id='hexgrad/Kokoro-82M')
+
+    llm_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pregen-llm")
+    tts_pool = ThreadPoolExecutor(max_workers=tts_workers, thread_name_prefix="pregen-tts")
+    pending = {}
+
+    def submit_audio(key: str, idx: int, text: str) -> None:
+        if not text_only and idx not in done_audio.get(key, []):
+            pending[tts_pool.submit(synthesize, text)] = ("audio", key, idx)
+
+    try:
+        for key, item in zip(keys, question_items):
+            existing = done_variants.get(key, [])
+            for idx in range(variants):
+                if idx not in existing:
+                    pending[llm_pool.submit(generate, item)] = ("variant", key, idx)
+            # Variantes de execuções anteriores que ainda não têm áudio
+            for idx, question, _ in pack.variants(key):
+                submit_audio(key, idx, question)
+
+        total = len(pending)
+        finished = 0
+        while pending:
+            completed, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in completed:
+                kind, key, idx = pending.pop(future)
+                finished += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"\nFalha ao gerar {kind} {idx} de {key[:8]}: {e}", file=sys.stderr)
+                    continue
+
+                if kind == "variant":
+                    question, choices = result
+                    pack.add_variant(key, idx, question, choices)
+                    stats["variants"] += 1
+                    total += not text_only
+                    submit_audio(key, idx, question)
+                else:
+                    audio, sample_rate = result
+                    if len(audio):
+                        pack.add_audio(key, idx, audio, sample_rate)
+                        stats["audio"] += 1
+
+                if verbose:
+                    elapsed = time.perf_counter() - started
+                    print(
+                        f"\r{finished}/{total} tarefas | {stats['variants']} variantes, "
+                        f"{stats['audio']} áudios | {finished / elapsed:.1f} tarefas/s",
+                        end="", flush=True
+                    )
+    finally:
+        llm_pool.shutdown(wait=True, cancel_futures=True)
+        tts_pool.shutdown(wait=True, cancel_futures=True)
+        pack.close()
+
+    stats["elapsed"] = time.perf_counter() - started
+    if verbose:
+        print()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pré-gera variantes e áudio de um questionário')
+    parser.add_argument('questionnaire', help='Arquivo JSON com as perguntas (lista ou dicionário de categorias)')
+    parser.add_argument('--output', '-o', required=True, help='Arquivo do pacote a ser gerado (ex.: estudo.pack)')
+    parser.add_argument('--variants', '-n', type=int, default=3, help='Variantes por pergunta')
+    parser.add_argument('--workers', '-w', type=int, default=4, help='Chamadas simultâneas ao modelo')
+    parser.add_argument('--tts-workers', type=int, default=1, help='Sínteses de voz simultâneas')
+    parser.add_argument('--model', '-m', default='gemma3:latest', help='Modelo Ollama a ser utilizado')
+    parser.add_argument('--voice', '-v', default='pf_dora', help='Voz para o Kokoro TTS')
+    parser.add_argument('--generation-strategy', choices=['combined', 'separate'], default='combined',
+                        help='Gerar reformulação e distratores em uma chamada (combined) ou em duas (separate)')
+    parser.add_argument('--text-only', '-t', action='store_true', help='Não gerar áudio')
+
+    args = parser.parse_args()
+
+    with open(args.questionnaire, 'r', encoding='utf-8') as f:
+        items = flatten_questionnaire(json.load(f))
+
+    print(f"Pré-gerando {len(items)} perguntas x {args.variants} variantes em {args.output}...")
+    stats = pregenerate(
+        items,
+        args.output,
+        variants=args.variants,
+        workers=args.workers,
+        tts_workers=args.tts_workers,
+        model=args.model,
+        voice=args.voice,
+        generation_strategy=args.generation_strategy,
+        text_only=args.text_only
+    )
+    rate = stats['variants'] / stats['elapsed'] if stats['elapsed'] else 0.0
+    print(
+        f"Concluído em {stats['elapsed']:.1f} s: {stats['variants']} variantes "
+        f"({rate:.1f}/s), {stats['audio']} áudios, {stats['failed']} falhas"
+    )
+
+
+if __name__ == "__main__":
+    main()
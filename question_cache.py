@@ -0,0 +1,153 @@
+"""
+Cache persistente (SQLite) de reformulações e distratores gerados para cada pergunta
+
+Cada pergunta é identificada por um hash do conteúdo (pergunta, resposta, modelo e versão
+do prompt), então mudar o modelo ou o prompt invalida o cache naturalmente. Várias
+variantes são guardadas por pergunta e entregues em rodízio; perguntas usadas há mais
+tempo são descartadas quando o limite é atingido (LRU).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+def default_cache_dir() -> Path:
+    """Diretório de cache do agente (respeita XDG_CACHE_HOME)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'agent'
+
+
+class QuestionVariantCache:
+    """Variantes (pergunta reformulada + respostas incorretas) por pergunta, em SQLite"""
+
+    def __init__(self, path: Optional[str] = None, max_questions: int = 10000, max_variants: int = 5):
+        """
+        Args:
+            path: Arquivo SQLite (padrão: ~/.cache/agent/question_variants.sqlite3); ':memory:' para testes
+            max_questions: Número máximo de perguntas no cache (as menos usadas recentemente saem primeiro)
+            max_variants: Número de variantes guardadas por pergunta
+        """
+        if path is None:
+            default_cache_dir().mkdir(parents=True, exist_ok=True)
+            path = str(default_cache_dir() / 'question_variants.sqlite3')
+        self.path = path
+        self.max_questions = max_questions
+        self.max_variants = max_variants
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS questions (
+                key TEXT PRIMARY KEY,
+                last_used REAL NOT NULL,
+                cursor INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS questions_last_used ON questions(last_used);
+            CREATE TABLE IF NOT EXISTS variants (
+                key TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                wrong_answers TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (key, idx)
+            );
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question: str, answer: str, model: str, prompt_version: str) -> str:
+        """Chave de conteúdo da pergunta"""
+        payload = json.dumps([question, answer, model, prompt_version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def next_variant(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        Retorna a próxima variante da pergunta em rodízio, ou None se não houver nenhuma
+
+        Returns:
+            tuple: (pergunta reformulada, respostas incorretas)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT cursor FROM questions WHERE key = ?", (key,)).fetchone()
+            variants = self._conn.execute(
+                "SELECT question, wrong_answers FROM variants WHERE key = ? ORDER BY idx", (key,)
+            ).fetchall() if row else []
+            if not variants:
+                self.misses += 1
+                return None
+
+            cursor = row[0]
+            question, wrong_answers = variants[cursor % len(variants)]
+            self._conn.execute(
+                "UPDATE questions SET cursor = ?, last_used = ? WHERE key = ?",
+                (cursor + 1, time.time(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return question, json.loads(wrong_answers)
+
+    def variant_count(self, key: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM variants WHERE key = ?", (key,)).fetchone()[0]
+
+    def add_variant(self, key: str, question: str, wrong_answers: List[str]) -> None:
+        """Guarda uma nova variante (substituindo a mais antiga se a pergunta já tiver o máximo)"""
+        now = time.time()
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM variants WHERE key = ?", (key,)).fetchone()[0]
+            if count < self.max_variants:
+                idx = count
+            else:
+                idx = self._conn.execute(
+                    "SELECT idx FROM variants WHERE key = ? ORDER BY created LIMIT 1", (key,)
+                ).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO variants (key, idx, question, wrong_answers, created) VALUES (?, ?, ?, ?, ?)",
+                (key, idx, question, json.dumps(wrong_answers, ensure_ascii=False), now)
+            )
+            self._conn.execute(
+                "INSERT INTO questions (key, last_used) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET last_used = excluded.last_used",
+                (key, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Remove as perguntas usadas há mais tempo até respeitar max_questions"""
+        total = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        excess = total - self.max_questions
+        if excess <= 0:
+            return
+        stale = [row[0] for row in self._conn.execute(
+            "SELECT key FROM questions ORDER BY last_used LIMIT ?", (excess,)
+        )]
+        self._conn.executemany("DELETE FROM variants WHERE key = ?", [(key,) for key in stale])
+        self._conn.executemany("DELETE FROM questions WHERE key = ?", [(key,) for key in stale])
+
+    def stats(self) -> Dict[str, float]:
+        """Acertos, falhas, taxa de acerto e tamanho do cache"""
+        with self._lock:
+            questions = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+            variants = self._conn.execute("SELECT COUNT(*) FROM variants").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "questions": questions,
+            "variants": variants
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,163 @@
+"""
+Pacote de perguntas pré-geradas (arquivo SQLite único)
+
+Guarda, para cada pergunta de um questionário, várias variantes já geradas pelo modelo
+(pergunta reformulada + respostas incorretas) e o áudio do Kokoro de cada variante em
+PCM de 16 bits. É escrito por pregenerate_questionnaire.py e lido pelo StudyPartner, de
+modo que a sessão de estudo não precise esperar pelo modelo.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class QuestionPack:
+    """Leitura e escrita de um pacote de perguntas pré-geradas"""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                key TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                category TEXT
+            );
+            CREATE TABLE IF NOT EXISTS variants (
+                key TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                wrong_answers TEXT NOT NULL,
+                PRIMARY KEY (key, idx)
+            );
+            CREATE TABLE IF NOT EXISTS audio (
+                key TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                sample_rate INTEGER NOT NULL,
+                pcm BLOB NOT NULL,
+                PRIMARY KEY (key, idx)
+            );
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def item_key(question: str, answer: str) -> str:
+        """Chave de conteúdo de uma pergunta do questionário"""
+        payload = json.dumps([question, answer], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    # Escrita
+
+    def set_meta(self, **values: Any) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                [(name, json.dumps(value)) for name, value in values.items()]
+            )
+            self._conn.commit()
+
+    def add_items(self, items: List[Dict[str, str]]) -> List[str]:
+        """Registra as perguntas do questionário (idempotente) e retorna suas chaves"""
+        keys = []
+        rows = []
+        for position, item in enumerate(items):
+            key = self.item_key(item['question'], item['answer'])
+            keys.append(key)
+            rows.append((key, position, item['question'], item['answer'], item.get('category')))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items (key, position, question, answer, category) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return keys
+
+    def add_variant(self, key: str, idx: int, question: str, wrong_answers: List[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO variants (key, idx, question, wrong_answers) VALUES (?, ?, ?, ?)",
+                (key, idx, question, json.dumps(wrong_answers, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def add_audio(self, key: str, idx: int, audio, sample_rate: int) -> None:
+        """Guarda o áudio de uma variante como PCM de 16 bits"""
+        import numpy as np
+
+        pcm = (np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0) * 32767).astype('<i2')
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO audio (key, idx, sample_rate, pcm) VALUES (?, ?, ?, ?)",
+                (key, idx, sample_rate, pcm.tobytes())
+            )
+            self._conn.commit()
+
+    # Leitura
+
+    def meta(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: json.loads(value) for name, value in self._conn.execute("SELECT name, value FROM meta")}
+
+    def items(self) -> List[Dict[str, str]]:
+        """Perguntas do pacote, na ordem do questionário original"""
+        with self._lock:
+            rows = self._conn.execute("SELECT question, answer, category FROM items ORDER BY position").fetchall()
+        return [
+            {"question": question, "answer": answer, **({"category": category} if category else {})}
+            for question, answer, category in rows
+        ]
+
+    def variants(self, key: str) -> List[Tuple[int, str, List[str]]]:
+        """Variantes da pergunta como (índice, pergunta reformulada, respostas incorretas)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, question, wrong_answers FROM variants WHERE key = ? ORDER BY idx", (key,)
+            ).fetchall()
+        return [(idx, question, json.loads(wrong_answers)) for idx, question, wrong_answers in rows]
+
+    def variant_indexes(self) -> Dict[str, List[int]]:
+        """Variantes já geradas por pergunta (usado para retomar a pré-geração)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT key, idx FROM variants").fetchall()
+        done: Dict[str, List[int]] = {}
+        for key, idx in rows:
+            done.setdefault(key, []).append(idx)
+        return done
+
+    def audio_indexes(self) -> Dict[str, List[int]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, idx FROM audio").fetchall()
+        done: Dict[str, List[int]] = {}
+        for key, idx in rows:
+            done.setdefault(key, []).append(idx)
+        return done
+
+    def audio(self, key: str, idx: int) -> Optional[Tuple[Any, int]]:
+        """Retorna (array float32, taxa de amostragem) do áudio da variante, se houver"""
+        import numpy as np
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sample_rate, pcm FROM audio WHERE key = ? AND idx = ?", (key, idx)
+            ).fetchone()
+        if row is None:
+            return None
+        sample_rate, pcm = row
+        return np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32767, sample_rate
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -3,21 +3,27 @@
 Script para iniciar o parceiro de estudos
 """
 
-from study_partner import StudyPartner
+from study_partner import SAMPLE_QUESTIONNAIRE, add_session_arguments, partner_from_args, print_timings
 import json
 import argparse
 
 def main():
     parser = argparse.ArgumentParser(description="Iniciar o Parceiro de Estudos")
-    parser.add_argument('--model', '-m', default='gemma3:latest', help='Modelo Ollama a ser usado')
-    parser.add_argument('--voice', '-v', default='pf_dora', help='Voz do Kokoro TTS a ser usada')
-    parser.add_argument('--text-only', action='store_true', help='Apenas texto, sem áudio')
     parser.add_argument('--question-file', '-q', default='sample_questions.json', help='Arquivo JSON com perguntas e respostas')
+    add_session_arguments(parser)
     
     args = parser.parse_args()
     
     # Criar parceiro de estudos
-    partner = StudyPartner(model=args.model, voice=args.voice)
+    partner = partner_from_args(args)
+    
+    if args.pack:
+        # Perguntas, variantes e áudio vêm do pacote pré-gerado
+        partner.load_questionnaire(pack_path=args.pack)
+        partner.start_study_session(text_only=args.text_only)
+        if args.timings:
+            print_timings()
+        return
     
     # Carregar perguntas do arquivo
     try:
@@ -25,31 +31,12 @@ def main():
             questions_data = json.load(f)
     except FileNotFoundError:
         print(f"Arquivo {args.question_file} não encontrado. Usando perguntas padrão.")
-        questions_data = [
-            {
-                "question": "Qual é a capital do Brasil?",
-                "answer": "Brasília"
-            },
-            {
-                "question": "Qual é a fórmula química da água?",
-                "answer": "H2O"
-            },
-            {
-                "question": "Quantos planetas existem no sistema solar?",
-                "answer": "8"
-            },
-            {
-                "question": "Qual é o maior oceano da Terra?",
-                "answer": "Oceano Pacífico"
-            },
-            {
-                "question": "Quem escreveu 'Dom Casmurro'?",
-                "answer": "Machado de Assis"
-            }
-        ]
+        questions_data = SAMPLE_QUESTIONNAIRE
     
     partner.load_questionnaire(questions_data)
     partner.start_study_session(text_only=args.text_only)
+    if args.timings:
+        print_timings()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
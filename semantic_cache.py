@@ -0,0 +1,391 @@
+"""
+Cache semântico de pedidos ao agente principal
+
+Pedidos parecidos ("mostrar uso de memória", "como ver a memória livre") levam ao mesmo
+comando. Cada pedido já respondido é guardado com o seu embedding (API de embeddings do
+Ollama) e a chamada de função validada; um pedido novo cuja similaridade de cosseno com
+um antigo passe do limite reaproveita o comando sem chamar o modelo de geração.
+
+A busca usa um índice em NumPy (VectorIndex): busca exata em uma matriz enquanto o índice
+é pequeno e, a partir de alguns milhares de pedidos, um índice IVF (k-means sobre os
+embeddings; a busca só olha as listas dos centróides mais próximos), o que mantém a
+consulta abaixo de 1 ms com 100 mil pedidos. Meça com `python bench_semantic_cache.py`.
+"""
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from question_cache import default_cache_dir
+
+
+class OllamaEmbedder:
+    """Embeddings pela API do Ollama (passando pelo gateway compartilhado)"""
+
+    def __init__(self, model: str = 'nomic-embed-text', client: Any = None):
+        self.model = model
+        self.client = client
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        client = self.client
+        if client is None:
+            from ollama_gateway import get_gateway
+            client = get_gateway()
+        response = client.embed(model=self.model, input=list(texts))
+        return np.asarray(response['embeddings'], dtype=np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """
+    Índice de vetores normalizados para busca por similaridade de cosseno
+
+    Até `train_size` vetores a busca é exata. Daí em diante o índice é treinado (k-means
+    com ~sqrt(N) centróides) e cada vetor fica em uma lista contígua do centróide mais
+    próximo; a busca compara a consulta com os centróides e só percorre as `nprobe`
+    listas mais próximas. O índice é treinado de novo quando o número de vetores
+    quadruplica. Depois do treino, cada vetor é guardado só na sua lista.
+    """
+
+    def __init__(self, dim: int, train_size: int = 4096, nprobe: int = 4, seed: int = 0):
+        self.dim = dim
+        self.train_size = train_size
+        self.nprobe = nprobe
+        self.trained_at = 0
+        self._rng = np.random.default_rng(seed)
+        self._vectors = np.empty((0, dim), dtype=np.float32)  # Todos os vetores, na ordem dos ids (antes do treino)
+        self._count = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)  # Lista de cada id
+        self._lists: List[Tuple[np.ndarray, np.ndarray]] = []  # (vetores, ids) por lista, com folga
+        self._list_sizes = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """Adiciona vetores (já normalizados ou não) e retorna os ids atribuídos"""
+        vectors = _normalize(np.atleast_2d(vectors))
+        ids = np.arange(self._count, self._count + len(vectors))
+        if self.centroids is None:
+            self._vectors = self._grow(self._vectors, self._count + len(vectors))
+            self._vectors[ids] = vectors
+        self._count += len(vectors)
+
+        if self.centroids is not None:
+            lists = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+            self.assignments = np.concatenate([self.assignments, lists])
+            self._append_to_lists(lists, ids, vectors)
+        if self._count >= self.train_size and self._count >= 4 * self.trained_at:
+            self.train()
+        return ids
+
+    def train(self, nlist: Optional[int] = None, iterations: int = 8) -> None:
+        """Treina os centróides (k-means esférico sobre uma amostra) e redistribui os vetores"""
+        vectors = self.vectors()
+        nlist = nlist or max(1, int(np.sqrt(self._count)))
+        sample_size = min(self._count, 64 * nlist)
+        sample = vectors[self._rng.choice(self._count, sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        assignments = np.empty(self._count, dtype=np.int32)
+        for start in range(0, self._count, 16384):
+            block = vectors[start:start + 16384]
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        self.set_lists(centroids, assignments, vectors)
+
+    def vectors(self) -> np.ndarray:
+        """Todos os vetores, na ordem dos ids"""
+        if self.centroids is None:
+            return self._vectors[:self._count]
+        vectors = np.empty((self._count, self.dim), dtype=np.float32)
+        for (list_vectors, list_ids), size in zip(self._lists, self._list_sizes):
+            vectors[list_ids[:size]] = list_vectors[:size]
+        return vectors
+
+    def set_lists(self, centroids: np.ndarray, assignments: np.ndarray, vectors: Optional[np.ndarray] = None) -> None:
+        """Usa centróides e listas já calculados (por exemplo, lidos do disco)"""
+        if vectors is None:
+            vectors = self.vectors()
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.trained_at = self._count
+        nlist = len(self.centroids)
+        self._lists = [(np.empty((0, self.dim), dtype=np.float32), np.empty(0, dtype=np.int64)) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self._append_to_lists(self.assignments, np.arange(self._count), vectors)
+        self._vectors = np.empty((0, self.dim), dtype=np.float32)
+
+    def _append_to_lists(self, lists: np.ndarray, ids: np.ndarray, vectors: np.ndarray) -> None:
+        order = np.argsort(lists, kind='stable')
+        lists, ids, vectors = lists[order], ids[order], vectors[order]
+        boundaries = np.flatnonzero(np.diff(lists)) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(lists)]):
+            if start == end:
+                continue
+            list_id = lists[start]
+            size = self._list_sizes[list_id]
+            list_vectors, list_ids = self._lists[list_id]
+            list_vectors = self._grow(list_vectors, size + end - start)
+            list_ids = self._grow(list_ids, size + end - start)
+            list_vectors[size:size + end - start] = vectors[start:end]
+            list_ids[size:size + end - start] = ids[start:end]
+            self._lists[list_id] = (list_vectors, list_ids)
+            self._list_sizes[list_id] = size + end - start
+
+    @staticmethod
+    def _grow(array: np.ndarray, needed: int) -> np.ndarray:
+        """Aumenta a capacidade (dobrando) mantendo o conteúdo"""
+        if needed <= len(array):
+            return array
+        grown = np.empty((max(needed, 2 * len(array), 16),) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Os k vetores mais parecidos com a consulta
+
+        Returns:
+            tuple: (ids, similaridades), da mais parecida para a menos
+        """
+        if self._count == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = _normalize(query).reshape(-1)
+
+        if self.centroids is None:
+            ids = np.arange(self._count)
+            scores = self._vectors[:self._count] @ query
+        else:
+            nprobe = min(self.nprobe, len(self.centroids))
+            probes = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+            id_parts, score_parts = [], []
+            for list_id in probes:
+                size = self._list_sizes[list_id]
+                if size:
+                    list_vectors, list_ids = self._lists[list_id]
+                    score_parts.append(list_vectors[:size] @ query)
+                    id_parts.append(list_ids[:size])
+            if not id_parts:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            ids = np.concatenate(id_parts)
+            scores = np.concatenate(score_parts)
+
+        k = min(k, len(ids))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return ids[top], scores[top]
+
+    def nbytes(self) -> int:
+        lists = sum(vectors.nbytes + ids.nbytes for vectors, ids in self._lists)
+        centroids = self.centroids.nbytes if self.centroids is not None else 0
+        return self._vectors.nbytes + lists + centroids + self.assignments.nbytes
+
+
+class SemanticCache:
+    """Pedidos já respondidos e suas chamadas de função, buscados por similaridade (SQLite + VectorIndex)"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        embedder: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+        threshold: float = 0.92,
+        embedding_model: Optional[str] = None,
+        train_size: int = 4096,
+        nprobe: int = 4
+    ):
+        """
+        Args:
+            path: Arquivo SQLite (padrão: ~/.cache/agent/semantic_cache.sqlite3); ':memory:' para testes
+            embedder: Função que recebe textos e retorna seus embeddings (padrão: OllamaEmbedder)
+            threshold: Similaridade de cosseno mínima para reaproveitar um comando
+            embedding_model: Nome do modelo de embeddings; trocar de modelo descarta o cache
+            train_size: Número de pedidos a partir do qual a busca usa o índice IVF
+        """
+        if path is None:
+            default_cache_dir().mkdir(parents=True, exist_ok=True)
+            path = str(default_cache_dir() / 'semantic_cache.sqlite3')
+        if embedder is None:
+            embedder = OllamaEmbedder(embedding_model or 'nomic-embed-text')
+        self.path = path
+        self.embedder = embedder
+        self.threshold = threshold
+        self.embedding_model = embedding_model or getattr(embedder, 'model', 'custom')
+        self.train_size = train_size
+        self.nprobe = nprobe
+        self.hits = 0
+        self.misses = 0
+        self.index: Optional[VectorIndex] = None
+        self._row_ids = np.empty(0, dtype=np.int64)  # id do índice -> id da linha no SQLite
+        self._models: List[str] = []  # id do índice -> modelo de geração
+        self._pending: Dict[str, np.ndarray] = {}  # Embeddings de consultas recentes, para o add
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value BLOB
+            );
+            CREATE TABLE IF NOT EXISTS prompts (
+                id INTEGER PRIMARY KEY,
+                prompt TEXT NOT NULL,
+                model TEXT NOT NULL,
+                content TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                list_id INTEGER,
+                created REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self._conn.commit()
+        self._load()
+
+    def _meta(self, name: str) -> Any:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _load(self) -> None:
+        """Lê todos os embeddings (e as listas do IVF, se houver) para a memória"""
+        if self._meta('embedding_model') not in (None, self.embedding_model):
+            # Embeddings de outro modelo não são comparáveis
+            self._conn.execute("DELETE FROM prompts")
+            self._conn.execute("DELETE FROM meta")
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('embedding_model', ?)", (self.embedding_model,)
+        )
+        self._conn.commit()
+
+        rows = self._conn.execute("SELECT id, model, embedding, list_id FROM prompts ORDER BY id").fetchall()
+        if not rows:
+            return
+        dim = len(rows[0][2]) // 4
+        vectors = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), dim)
+        self.index = VectorIndex(dim, train_size=self.train_size, nprobe=self.nprobe)
+        self.index.train_size = max(self.train_size, len(rows) + 1)  # Não treina durante a carga
+        self.index.add(vectors)
+        self.index.train_size = self.train_size
+        self._row_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._models = [row[1] for row in rows]
+
+        centroids = self._meta('centroids')
+        lists = [row[3] for row in rows]
+        if centroids is not None and None not in lists:
+            self.index.set_lists(np.frombuffer(centroids, dtype=np.float32).reshape(-1, dim), np.array(lists))
+            self.index.trained_at = int(self._meta('trained_at') or len(rows))
+        elif len(rows) >= self.train_size:
+            self.index.train()
+            self._save_lists()
+
+    def _save_lists(self) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('centroids', ?)", (self.index.centroids.tobytes(),)
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES ('trained_at', ?)", (self.index.trained_at,)
+        )
+        self._conn.executemany(
+            "UPDATE prompts SET list_id = ? WHERE id = ?",
+            zip(self.index.assignments.tolist(), self._row_ids.tolist())
+        )
+        self._conn.commit()
+
+    def _embed(self, prompt: str) -> np.ndarray:
+        vector = self._pending.get(prompt)
+        if vector is None:
+            vector = _normalize(self.embedder([prompt])[0])
+            self._pending[prompt] = vector
+            while len(self._pending) > 32:
+                self._pending.pop(next(iter(self._pending)))
+        return vector
+
+    def lookup(self, prompt: str, model: str) -> Optional[Tuple[str, float, str]]:
+        """
+        Procura um pedido parecido já respondido pelo mesmo modelo
+
+        Returns:
+            tuple: (conteúdo da resposta, similaridade, pedido original), ou None
+        """
+        vector = self._embed(prompt)
+        with self._lock:
+            if self.index is not None:
+                ids, scores = self.index.search(vector, k=4)
+                for index_id, score in zip(ids.tolist(), scores.tolist()):
+                    if score < self.threshold:
+                        break
+                    if self._models[index_id] != model:
+                        continue
+                    row_id = int(self._row_ids[index_id])
+                    content, original = self._conn.execute(
+                        "SELECT content, prompt FROM prompts WHERE id = ?", (row_id,)
+                    ).fetchone()
+                    self._conn.execute("UPDATE prompts SET hits = hits + 1 WHERE id = ?", (row_id,))
+                    self._conn.commit()
+                    self.hits += 1
+                    return content, score, original
+            self.misses += 1
+            return None
+
+    def add(self, prompt: str, content: str, model: str) -> None:
+        """Guarda a resposta validada de um pedido"""
+        vector = self._embed(prompt)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO prompts (prompt, model, content, embedding, created) VALUES (?, ?, ?, ?, ?)",
+                (prompt, model, content, vector.astype(np.float32).tobytes(), time.time())
+            )
+            if self.index is None:
+                self.index = VectorIndex(len(vector), train_size=self.train_size, nprobe=self.nprobe)
+            trained_at = self.index.trained_at
+            self.index.add(vector)
+            self._row_ids = np.append(self._row_ids, cursor.lastrowid)
+            self._models.append(model)
+            if self.index.centroids is None:
+                self._conn.commit()
+            elif self.index.trained_at != trained_at:
+                self._save_lists()
+            else:
+                self._conn.execute(
+                    "UPDATE prompts SET list_id = ? WHERE id = ?", (int(self.index.assignments[-1]), cursor.lastrowid)
+                )
+                self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM prompts")
+            self._conn.execute("DELETE FROM meta WHERE name != 'embedding_model'")
+            self._conn.commit()
+            self.index = None
+            self._row_ids = np.empty(0, dtype=np.int64)
+            self._models = []
+
+    def stats(self) -> Dict[str, float]:
+        """Acertos e falhas desta execução, taxa de acerto e número de pedidos guardados"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.index) if self.index is not None else 0,
+            "ivf": self.index is not None and self.index.centroids is not None
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
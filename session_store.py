@@ -0,0 +1,180 @@
+"""
+Sessões de conversa do agente com memória (ia_agent.py) gravadas em disco (SQLite)
+
+Cada mensagem é acrescentada ao log da sessão assim que entra na memória (uma transação
+curta, em WAL); nada é reescrito. A sessão guarda também o resumo das mensagens antigas
+e até qual mensagem ele vai. Ao retomar, só o fim do log é lido, de trás para frente,
+até encher o orçamento da memória: o custo não depende do tamanho da conversa. A lista
+de sessões vem de uma tabela com uma linha por sessão.
+
+Exemplo:
+    store = SessionStore()
+    memory = ConversationMemory(max_tokens=1500, store=store, session="trabalho")
+    memory.load()  # retoma a sessão, se existir
+"""
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from sm2_store import default_data_dir
+
+
+class SessionStore:
+    """Log de mensagens por sessão nomeada, em SQLite"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Arquivo SQLite (padrão: ~/.local/share/agent/sessions.sqlite3); ':memory:' para testes
+        """
+        if path is None:
+            default_data_dir().mkdir(parents=True, exist_ok=True)
+            path = str(default_data_dir() / 'sessions.sqlite3')
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                name TEXT PRIMARY KEY,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                messages INTEGER NOT NULL DEFAULT 0,
+                summary TEXT NOT NULL DEFAULT '',
+                summary_upto INTEGER NOT NULL DEFAULT 0,
+                preview TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated);
+            CREATE TABLE IF NOT EXISTS messages (
+                session TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                tokens INTEGER NOT NULL,
+                PRIMARY KEY (session, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+    def append(self, session: str, role: str, content: str, timestamp: float, tokens: int) -> int:
+        """Acrescenta uma mensagem ao log da sessão (criando a sessão) e retorna o número dela"""
+        now = time.time()
+        preview = content[:80] if role == "user" else None
+        with self._lock:
+            # Sem RETURNING (SQLite 3.35+): a leitura fica na mesma transação do UPSERT
+            self._conn.execute(
+                """
+                INSERT INTO sessions (name, created, updated, messages, preview) VALUES (?, ?, ?, 1, COALESCE(?, ''))
+                ON CONFLICT(name) DO UPDATE SET
+                    updated = excluded.updated,
+                    messages = messages + 1,
+                    preview = COALESCE(?, preview)
+                """,
+                (session, now, now, preview, preview)
+            )
+            seq = self._conn.execute("SELECT messages FROM sessions WHERE name = ?", (session,)).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                (session, seq, role, content, timestamp, tokens)
+            )
+            self._conn.commit()
+        return seq
+
+    def set_summary(self, session: str, summary: str, upto: int) -> None:
+        """Guarda o resumo das mensagens da sessão até a de número `upto`"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET summary = ?, summary_upto = ? WHERE name = ? AND summary_upto <= ?",
+                (summary, upto, session, upto)
+            )
+            self._conn.commit()
+
+    def get(self, session: str) -> Optional[Dict[str, Any]]:
+        """Dados da sessão (sem as mensagens), ou None se ela não existir"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, created, updated, messages, summary, summary_upto, preview FROM sessions WHERE name = ?",
+                (session,)
+            ).fetchone()
+        return self._session(row) if row else None
+
+    @staticmethod
+    def _session(row: tuple) -> Dict[str, Any]:
+        name, created, updated, messages, summary, summary_upto, preview = row
+        return {
+            "name": name,
+            "created": created,
+            "updated": updated,
+            "messages": messages,
+            "summary": summary,
+            "summary_upto": summary_upto,
+            "preview": preview
+        }
+
+    def iter_tail(self, session: str, after: int = 0, batch: int = 64) -> Iterator[Dict[str, Any]]:
+        """
+        Mensagens da sessão da mais recente para a mais antiga (só as de número maior que `after`)
+
+        Lidas em lotes pela chave primária: quem para no meio não paga pelo resto do log.
+        """
+        before = None
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT seq, role, content, timestamp, tokens FROM messages "
+                    "WHERE session = ? AND seq > ? AND seq < COALESCE(?, 9223372036854775807) "
+                    "ORDER BY seq DESC LIMIT ?",
+                    (session, after, before, batch)
+                ).fetchall()
+            for seq, role, content, timestamp, tokens in rows:
+                yield {"seq": seq, "role": role, "content": content, "timestamp": timestamp, "tokens": tokens}
+            if len(rows) < batch:
+                return
+            before = rows[-1][0]
+
+    def history(self, session: str, before: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Página do histórico completo, em ordem cronológica (as `limit` mensagens antes de `before`)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content, timestamp, tokens FROM messages "
+                "WHERE session = ? AND seq < COALESCE(?, 9223372036854775807) ORDER BY seq DESC LIMIT ?",
+                (session, before, limit)
+            ).fetchall()
+        return [
+            {"seq": seq, "role": role, "content": content, "timestamp": timestamp, "tokens": tokens}
+            for seq, role, content, timestamp, tokens in reversed(rows)
+        ]
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        """Sessões da mais recente para a mais antiga"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, created, updated, messages, summary, summary_upto, preview FROM sessions ORDER BY updated DESC"
+            ).fetchall()
+        return [self._session(row) for row in rows]
+
+    def clear(self, session: str) -> None:
+        """Apaga as mensagens e o resumo da sessão (o nome continua na lista)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session = ?", (session,))
+            self._conn.execute(
+                "UPDATE sessions SET messages = 0, summary = '', summary_upto = 0, preview = '', updated = ? WHERE name = ?",
+                (time.time(), session)
+            )
+            self._conn.commit()
+
+    def delete(self, session: str) -> bool:
+        """Remove a sessão; retorna False se ela não existir"""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session = ?", (session,))
+            deleted = self._conn.execute("DELETE FROM sessions WHERE name = ?", (session,)).rowcount
+            self._conn.commit()
+        return bool(deleted)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
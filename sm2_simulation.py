@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Simulador de carga de revisões do SM-2 para uma população de estudantes
+
+Repete meses de revisões sintéticas com o SM-2 vetorizado (columnar_deck.sm2_update):
+todos os cartões de todos os estudantes ficam em arrays únicos e cada dia é processado
+de uma vez. A probabilidade de lembrar cai com o atraso em relação ao intervalo
+(retenção ** (dias desde a revisão / intervalo)).
+
+Uso:
+    python sm2_simulation.py --learners 1000 --cards 2000 --days 180 --new-per-day 20
+"""
+import argparse
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from columnar_deck import DAY_SECONDS, sm2_update
+
+
+def simulate_workload(
+    learners: int,
+    cards: int,
+    days: int,
+    new_per_day: int = 20,
+    retention: float = 0.9,
+    new_recall: float = 0.6,
+    max_reviews_per_day: Optional[int] = None,
+    seed: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Simula `days` dias de estudo e retorna a carga diária
+
+    Args:
+        learners: Número de estudantes (cada um com o mesmo baralho)
+        cards: Cartões por estudante
+        days: Dias simulados
+        new_per_day: Cartões novos apresentados por estudante por dia
+        retention: Probabilidade de lembrar um cartão revisado exatamente no vencimento
+        new_recall: Probabilidade de acertar um cartão na primeira vez
+        max_reviews_per_day: Limite de revisões por estudante por dia (None: sem limite)
+        seed: Semente do gerador aleatório
+
+    Returns:
+        dict: Arrays por dia - 'reviews' e 'new' (totais da população), 'correct_rate'
+              e 'backlog' (revisões vencidas que ficaram para o dia seguinte)
+    """
+    rng = np.random.default_rng(seed)
+    size = learners * cards
+    interval = np.ones(size)
+    easiness = np.full(size, 2.5)
+    repetitions = np.zeros(size, dtype=np.int32)
+    last_review = np.zeros(size)
+    next_review = np.full(size, np.inf)  # Ainda não apresentado
+
+    learner_of = np.repeat(np.arange(learners), cards)
+    position = np.tile(np.arange(cards), learners)
+
+    history = {name: np.zeros(days) for name in ('reviews', 'new', 'correct_rate', 'backlog')}
+    for day in range(days):
+        now = day * DAY_SECONDS
+
+        # Cartões novos do dia: os próximos `new_per_day` de cada estudante
+        start = day * new_per_day
+        new_rows = np.flatnonzero((position >= start) & (position < start + new_per_day))
+        due_rows = np.flatnonzero(next_review <= now)
+
+        if max_reviews_per_day is not None and len(due_rows):
+            # Mais atrasados primeiro, até o limite de cada estudante
+            due_rows = due_rows[np.lexsort((next_review[due_rows], learner_of[due_rows]))]
+            owners = learner_of[due_rows]
+            first = np.searchsorted(owners, owners)
+            rank = np.arange(len(due_rows)) - first
+            history['backlog'][day] = np.count_nonzero(rank >= max_reviews_per_day)
+            due_rows = due_rows[rank < max_reviews_per_day]
+
+        elapsed_days = (now - last_review[due_rows]) / DAY_SECONDS
+        p_recall = np.concatenate([
+            retention ** (elapsed_days / interval[due_rows]),
+            np.full(len(new_rows), new_recall)
+        ])
+        rows = np.concatenate([due_rows, new_rows])
+        correct = rng.random(len(rows)) < p_recall
+        quality = np.where(correct, 5.0, 2.0)  # Mesmas notas do modo interativo
+
+        interval[rows], easiness[rows], repetitions[rows], next_review[rows] = sm2_update(
+            interval[rows], easiness[rows], repetitions[rows], quality, now
+        )
+        last_review[rows] = now
+
+        history['reviews'][day] = len(due_rows)
+        history['new'][day] = len(new_rows)
+        history['correct_rate'][day] = correct.mean() if len(rows) else 0.0
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula a carga diária de revisões do SM-2")
+    parser.add_argument('--learners', type=int, default=1000, help='Número de estudantes')
+    parser.add_argument('--cards', type=int, default=2000, help='Cartões por estudante')
+    parser.add_argument('--days', type=int, default=180, help='Dias simulados')
+    parser.add_argument('--new-per-day', type=int, default=20, help='Cartões novos por estudante por dia')
+    parser.add_argument('--retention', type=float, default=0.9, help='Probabilidade de lembrar no vencimento')
+    parser.add_argument('--max-reviews', type=int, help='Limite de revisões por estudante por dia')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador aleatório')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    history = simulate_workload(
+        args.learners,
+        args.cards,
+        args.days,
+        new_per_day=args.new_per_day,
+        retention=args.retention,
+        max_reviews_per_day=args.max_reviews,
+        seed=args.seed
+    )
+    elapsed = time.perf_counter() - started
+
+    reviews = history['reviews'] / args.learners
+    print(f"{args.learners} estudantes x {args.cards} cartões x {args.days} dias simulados em {elapsed:.1f} s")
+    print(f"Revisões por estudante por dia: média {reviews.mean():.1f} | pico {reviews.max():.0f} (dia {reviews.argmax() + 1})")
+    print(f"Revisões da população no pico: {history['reviews'].max():.0f}")
+    print(f"Taxa de acerto média: {history['correct_rate'].mean() * 100:.1f}%")
+    if args.max_reviews is not None:
+        print(f"Maior acúmulo de revisões adiadas: {history['backlog'].max():.0f}")
+    print("\nSemana | revisões/estudante/dia | novos/estudante/dia")
+    for week in range(0, args.days, 7):
+        span = slice(week, min(week + 7, args.days))
+        print(
+            f"{week // 7 + 1:>6} | {reviews[span].mean():>22.1f} | "
+            f"{history['new'][span].mean() / args.learners:>19.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Armazenamento persistente (SQLite) do estado de repetição espaçada (SM-2)
+
+Cada cartão ocupa uma linha, gravada individualmente a cada resposta; nada é reescrito
+em bloco. O arquivo usa WAL, então uma gravação custa uma única transação curta mesmo
+com centenas de milhares de cartões. Cartões nunca respondidos não são gravados: a
+ausência de linha equivale ao estado inicial.
+"""
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from study_partner import SpacedRepetitionState
+
+
+# Limite seguro de parâmetros por consulta no SQLite
+_BATCH = 900
+
+
+def default_data_dir() -> Path:
+    """Diretório de dados do agente (respeita XDG_DATA_HOME)"""
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return Path(base) / 'agent'
+
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def _from_timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
+class SM2StateStore:
+    """Estado SM-2 por cartão, em SQLite"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Arquivo SQLite (padrão: ~/.local/share/agent/study_state.sqlite3); ':memory:' para testes
+        """
+        if path is None:
+            default_data_dir().mkdir(parents=True, exist_ok=True)
+            path = str(default_data_dir() / 'study_state.sqlite3')
+        self.path = path
+        self.writes = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS states (
+                key TEXT PRIMARY KEY,
+                difficulty REAL NOT NULL,
+                repetition_count INTEGER NOT NULL,
+                last_review REAL,
+                easiness_factor REAL NOT NULL,
+                next_review REAL
+            );
+            CREATE INDEX IF NOT EXISTS states_next_review ON states(next_review);
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _row(key: str, state: "SpacedRepetitionState") -> tuple:
+        return (
+            key,
+            state.difficulty,
+            state.repetition_count,
+            _to_timestamp(state.last_review),
+            state.easiness_factor,
+            _to_timestamp(state.next_review)
+        )
+
+    @staticmethod
+    def _state(row: tuple, state_class=None) -> Tuple[str, "SpacedRepetitionState"]:
+        if state_class is None:
+            from study_partner import SpacedRepetitionState as state_class
+
+        key, difficulty, repetition_count, last_review, easiness_factor, next_review = row
+        return key, state_class(
+            difficulty=difficulty,
+            repetition_count=repetition_count,
+            last_review=_from_timestamp(last_review),
+            easiness_factor=easiness_factor,
+            next_review=_from_timestamp(next_review)
+        )
+
+    def get(self, key: str) -> Optional["SpacedRepetitionState"]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM states WHERE key = ?", (key,)).fetchone()
+        return self._state(row)[1] if row else None
+
+    def load(self, keys: Iterable[str]) -> Dict[str, "SpacedRepetitionState"]:
+        """Carrega o estado dos cartões informados que já foram respondidos alguma vez"""
+        from study_partner import SpacedRepetitionState
+
+        keys = list(keys)
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), _BATCH):
+                batch = keys[start:start + _BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._conn.execute(f"SELECT * FROM states WHERE key IN ({placeholders})", batch))
+        return dict(self._state(row, SpacedRepetitionState) for row in rows)
+
+    def schedule(self, keys: Iterable[str]) -> Dict[str, Optional[datetime]]:
+        """Próxima revisão dos cartões informados que já foram respondidos, sem montar os estados"""
+        keys = list(keys)
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), _BATCH):
+                batch = keys[start:start + _BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._conn.execute(f"SELECT key, next_review FROM states WHERE key IN ({placeholders})", batch))
+        return {key: _from_timestamp(next_review) for key, next_review in rows}
+
+    def save(self, key: str, state: "SpacedRepetitionState") -> None:
+        """Grava o estado de um cartão (uma transação por resposta)"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?, ?, ?)", self._row(key, state))
+            self._conn.commit()
+            self.writes += 1
+
+    def save_many(self, states: Dict[str, "SpacedRepetitionState"]) -> None:
+        """Grava vários estados em uma única transação (importação, benchmarks)"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?, ?, ?)",
+                [self._row(key, state) for key, state in states.items()]
+            )
+            self._conn.commit()
+            self.writes += len(states)
+
+    def namespace(self, name: str) -> "NamespacedStateStore":
+        """Visão do armazenamento restrita a um estudante (mesma conexão, chaves prefixadas)"""
+        return NamespacedStateStore(self, name)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM states").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class NamespacedStateStore:
+    """Estado SM-2 de um estudante dentro de um SM2StateStore compartilhado"""
+
+    def __init__(self, store: SM2StateStore, name: str):
+        self.store = store
+        self.prefix = f"{name}/"
+
+    def get(self, key: str) -> Optional["SpacedRepetitionState"]:
+        return self.store.get(self.prefix + key)
+
+    def load(self, keys: Iterable[str]) -> Dict[str, "SpacedRepetitionState"]:
+        states = self.store.load(self.prefix + key for key in keys)
+        return {key[len(self.prefix):]: state for key, state in states.items()}
+
+    def schedule(self, keys: Iterable[str]) -> Dict[str, Optional[datetime]]:
+        schedule = self.store.schedule(self.prefix + key for key in keys)
+        return {key[len(self.prefix):]: next_review for key, next_review in schedule.items()}
+
+    def save(self, key: str, state: "SpacedRepetitionState") -> None:
+        self.store.save(self.prefix + key, state)
+
+    def save_many(self, states: Dict[str, "SpacedRepetitionState"]) -> None:
+        self.store.save_many({self.prefix + key: state for key, state in states.items()})
@@ -0,0 +1,354 @@
+"""
+Pipeline de fala em três estágios: texto do modelo -> síntese -> reprodução
+
+O texto chega em pedaços (streaming do LLM) e é dividido em frases. Cada frase vai para
+a thread de síntese (Kokoro) e cada segmento de áudio sintetizado vai para a thread de
+reprodução. As filas entre os estágios são limitadas, e a fala começa assim que a
+primeira frase estiver pronta, enquanto o modelo ainda gera o restante da resposta.
+
+AsyncSpeechPipeline faz o mesmo em asyncio: síntese e reprodução são tarefas do event
+loop (o trabalho bloqueante do Kokoro e do dispositivo roda no executor), e cancel()
+interrompe as duas na hora.
+"""
+import asyncio
+import queue
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from tts_response import AudioSink, SoundDeviceSink, iter_kokoro_audio
+
+
+# Fim de frase: pontuação final seguida de espaço, ou quebra de linha
+_SENTENCE_END = re.compile(r'(?<=[.!?…])["\')\]]*\s+|\n+')
+
+# Marca de fim de fluxo entre os estágios
+_END = object()
+
+
+class SentenceSplitter:
+    """Divide texto recebido aos pedaços em frases completas"""
+
+    def __init__(self, min_length: int = 12):
+        # Frases muito curtas ("Olá!") são unidas à seguinte para evitar pausas artificiais
+        self.min_length = min_length
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Adiciona texto e retorna as frases que ficaram completas"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_length:
+                sentences.append(sentence)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Retorna o texto restante (a última frase, sem pontuação final)"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
+
+
+class SpeechPipeline:
+    """
+    Fala uma resposta enquanto ela é gerada
+
+    Uso:
+        speech = SpeechPipeline(voice='pf_dora')
+        for delta in deltas_do_modelo:
+            speech.feed(delta)
+        speech.finish()
+        speech.wait()      # ou speech.cancel() para interromper
+    """
+
+    def __init__(
+        self,
+        voice: str = 'pf_dora',
+        language: str = 'p',
+        repo_id: str = 'hexgrad/Kokoro-82M',
+        sink: Optional[AudioSink] = None,
+        synthesize: Optional[Callable[[str], object]] = None,
+        max_sentences: int = 8,
+        max_audio_chunks: int = 4
+    ):
+        """
+        Args:
+            sink: Destino do áudio (padrão: SoundDeviceSink)
+            synthesize: Função texto -> iterável de chunks de áudio (padrão: iter_kokoro_audio)
+            max_sentences: Capacidade da fila de frases aguardando síntese
+            max_audio_chunks: Capacidade da fila de áudio aguardando reprodução
+        """
+        self.sink = sink if sink is not None else SoundDeviceSink()
+        self.synthesize = synthesize or (
+            lambda text: iter_kokoro_audio(text, voice=voice, language=language, repo_id=repo_id)
+        )
+        self.splitter = SentenceSplitter()
+        self.sentences_fed = 0
+        self.metrics: Dict[str, float] = {}
+
+        self._sentences: queue.Queue = queue.Queue(maxsize=max_sentences)
+        self._audio: queue.Queue = queue.Queue(maxsize=max_audio_chunks)
+        self._cancelled = threading.Event()
+        self._finished = False
+        self._started_at = time.perf_counter()
+
+        self._synthesis_thread = threading.Thread(target=self._synthesis_worker, name="tts-synthesis", daemon=True)
+        self._playback_thread = threading.Thread(target=self._playback_worker, name="tts-playback", daemon=True)
+        self._synthesis_thread.start()
+        self._playback_thread.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def feed(self, text: str) -> None:
+        """Recebe mais um pedaço da resposta e envia as frases completas para a síntese"""
+        if self._finished or self.cancelled:
+            return
+        for sentence in self.splitter.feed(text):
+            self._put(self._sentences, sentence)
+            self.sentences_fed += 1
+
+    def finish(self) -> None:
+        """Indica que a resposta terminou; a última frase incompleta também será falada"""
+        if self._finished:
+            return
+        for sentence in self.splitter.flush():
+            self._put(self._sentences, sentence)
+            self.sentences_fed += 1
+        self._finished = True
+        self._put(self._sentences, _END)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda o fim da reprodução; retorna False se o tempo esgotar"""
+        self._playback_thread.join(timeout)
+        return not self._playback_thread.is_alive()
+
+    def cancel(self) -> None:
+        """Interrompe a síntese e a reprodução imediatamente"""
+        if self.cancelled:
+            return
+        self._cancelled.set()
+        self._finished = True
+        self.sink.abort()
+        for pending in (self._sentences, self._audio):
+            try:
+                while True:
+                    pending.get_nowait()
+            except queue.Empty:
+                pass
+
+    @property
+    def active(self) -> bool:
+        return self._playback_thread.is_alive()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Coloca o item na fila limitada sem bloquear para sempre se a fala for cancelada"""
+        while not self.cancelled:
+            try:
+                target.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue):
+        while not self.cancelled:
+            try:
+                return source.get(timeout=0.05)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _synthesis_worker(self) -> None:
+        try:
+            while True:
+                sentence = self._get(self._sentences)
+                if sentence is _END:
+                    break
+                chunks = self.synthesize(sentence)
+                for chunk in chunks:
+                    if self.cancelled or not self._put(self._audio, chunk):
+                        break
+                # Fecha o gerador para liberar o pipeline do Kokoro ao cancelar no meio da frase
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+        except ImportError:
+            print("O Kokoro TTS não está instalado. Por favor, instale com: pip install kokoro")
+        except Exception as e:
+            print(f"Erro ao gerar áudio com Kokoro TTS: {e}")
+        finally:
+            if not self.cancelled:
+                self._put(self._audio, _END)
+
+    def _playback_worker(self) -> None:
+        started = False
+        try:
+            while True:
+                chunk = self._get(self._audio)
+                if chunk is _END:
+                    break
+                if not started:
+                    self.sink.start(24000)
+                    started = True
+                    self.metrics["time_to_first_audio"] = time.perf_counter() - self._started_at
+                self.sink.write(chunk)
+            if started and self.cancelled:
+                # Cancelado durante a reprodução: garante que o stream não continue tocando
+                self.sink.abort()
+            elif started:
+                self.sink.finish()
+        except Exception as e:
+            print(f"Erro ao reproduzir áudio: {e}")
+            self.sink.abort()
+        finally:
+            self.metrics["total_time"] = time.perf_counter() - self._started_at
+
+
+def _close(chunks) -> None:
+    if hasattr(chunks, 'close'):
+        chunks.close()
+
+
+class AsyncSpeechPipeline:
+    """
+    SpeechPipeline em asyncio: a síntese e a reprodução são tarefas, canceladas juntas
+
+    Uso (dentro de uma corrotina):
+        speech = AsyncSpeechPipeline(voice='pf_dora')
+        async for delta in deltas_do_modelo:
+            speech.feed(delta)
+        speech.finish()
+        await speech.wait()   # ou speech.cancel() para interromper
+
+    feed() e finish() não esperam: a fila de frases não tem limite, para a fala nunca
+    atrasar a geração.
+    """
+
+    def __init__(
+        self,
+        voice: str = 'pf_dora',
+        language: str = 'p',
+        repo_id: str = 'hexgrad/Kokoro-82M',
+        sink: Optional[AudioSink] = None,
+        synthesize: Optional[Callable[[str], object]] = None,
+        max_audio_chunks: int = 4
+    ):
+        """Mesmos argumentos de SpeechPipeline; precisa ser criado com o event loop rodando"""
+        self.sink = sink if sink is not None else SoundDeviceSink()
+        self.synthesize = synthesize or (
+            lambda text: iter_kokoro_audio(text, voice=voice, language=language, repo_id=repo_id)
+        )
+        self.splitter = SentenceSplitter()
+        self.sentences_fed = 0
+        self.metrics: Dict[str, float] = {}
+        self.cancelled = False
+
+        self._sentences: asyncio.Queue = asyncio.Queue()
+        self._audio: asyncio.Queue = asyncio.Queue(maxsize=max_audio_chunks)
+        self._finished = False
+        self._started_at = time.perf_counter()
+        self._synthesis_task = asyncio.create_task(self._synthesis(), name="tts-synthesis")
+        self._playback_task = asyncio.create_task(self._playback(), name="tts-playback")
+
+    def feed(self, text: str) -> None:
+        """Recebe mais um pedaço da resposta e envia as frases completas para a síntese"""
+        if self._finished or self.cancelled:
+            return
+        for sentence in self.splitter.feed(text):
+            self._sentences.put_nowait(sentence)
+            self.sentences_fed += 1
+
+    def finish(self) -> None:
+        """Indica que a resposta terminou; a última frase incompleta também será falada"""
+        if self._finished or self.cancelled:
+            return
+        for sentence in self.splitter.flush():
+            self._sentences.put_nowait(sentence)
+            self.sentences_fed += 1
+        self._finished = True
+        self._sentences.put_nowait(_END)
+
+    async def wait(self) -> None:
+        """Aguarda o fim da reprodução (ou do cancelamento)"""
+        await asyncio.wait({self._playback_task})
+
+    def cancel(self) -> None:
+        """Interrompe a síntese e a reprodução imediatamente"""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self._finished = True
+        self._synthesis_task.cancel()
+        self._playback_task.cancel()
+        self.sink.abort()
+
+    @property
+    def active(self) -> bool:
+        return not self._playback_task.done()
+
+    async def _next_chunk(self, chunks):
+        """Próximo segmento de áudio, sintetizado no executor"""
+        future = asyncio.get_running_loop().run_in_executor(None, next, chunks, _END)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # O segmento em andamento termina no executor; o gerador é fechado logo depois
+            # para liberar o pipeline do Kokoro
+            future.add_done_callback(lambda f: _close(chunks))
+            raise
+
+    async def _synthesis(self) -> None:
+        try:
+            while True:
+                sentence = await self._sentences.get()
+                if sentence is _END:
+                    break
+                chunks = iter(self.synthesize(sentence))
+                in_executor = False
+                try:
+                    while True:
+                        in_executor = True
+                        chunk = await self._next_chunk(chunks)
+                        in_executor = False
+                        if chunk is _END:
+                            break
+                        await self._audio.put(chunk)
+                finally:
+                    # Cancelada com um segmento no executor, o gerador é fechado por _next_chunk
+                    if not in_executor:
+                        _close(chunks)
+        except ImportError:
+            print("O Kokoro TTS não está instalado. Por favor, instale com: pip install kokoro")
+        except Exception as e:
+            print(f"Erro ao gerar áudio com Kokoro TTS: {e}")
+        finally:
+            if not self.cancelled:
+                await self._audio.put(_END)
+
+    async def _playback(self) -> None:
+        started = False
+        try:
+            while (chunk := await self._audio.get()) is not _END:
+                if not started:
+                    await asyncio.to_thread(self.sink.start, 24000)
+                    started = True
+                    self.metrics["time_to_first_audio"] = time.perf_counter() - self._started_at
+                # write só bloqueia com o buffer do dispositivo cheio; abort() o libera
+                await asyncio.to_thread(self.sink.write, chunk)
+            if started:
+                await asyncio.to_thread(self.sink.finish)
+        except asyncio.CancelledError:
+            self.sink.abort()
+            raise
+        except Exception as e:
+            print(f"Erro ao reproduzir áudio: {e}")
+            self.sink.abort()
+        finally:
+            self.metrics["total_time"] = time.perf_counter() - self._started_at
@@ -6,14 +6,35 @@ usando questionários e fornece experiência de aprendizado fluida com áudio.
 import json
 import random
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
-import ollama
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Any, Tuple, Callable, Literal, Union
+from pydantic import BaseModel, Field, PrivateAttr
 from pathlib import Path
 
+# Leitura incremental das respostas em streaming
+from json_stream import stream_chat
+
+# Cliente compartilhado do Ollama; a pré-busca roda com prioridade de segundo plano
+from ollama_gateway import BACKGROUND, get_gateway, request_priority, warmup_model
+
+# Cache persistente de reformulações e distratores
+from question_cache import QuestionVariantCache
+
+# Pacotes de perguntas pré-geradas (pregenerate_questionnaire.py)
+from question_pack import QuestionPack
+
+# Estado SM-2 persistente entre execuções
+from sm2_store import NamespacedStateStore, SM2StateStore
+
+# Fila de revisões ordenada pela próxima revisão
+from due_queue import DueQueue, review_timestamp
+
+# Versão dos prompts de geração; faz parte da chave do cache de variantes
+QUESTION_PROMPT_VERSION = "1"
+
 # Importando as funções existentes do TTS
-from tts_response import get_kokoro_audio, play_audio_from_bytes
+from tts_response import get_kokoro_audio, play_audio_from_bytes, warmup_kokoro_pipeline
 
 
 class Question(BaseModel):
@@ -21,12 +42,19 @@ class Question(BaseModel):
     question: str
     correct_answer: str
     wrong_answers: List[str] = Field(default_factory=list)
+    card_id: Optional[str] = None  # Cartão (QuestionItem) de origem
 
 
 class QuestionItem(BaseModel):
     """Item de pergunta do dicionário original (antes de transformação)"""
     question: str
     answer: str
+    # Identificador estável do cartão (hash da pergunta e da resposta, o mesmo usado nos pacotes)
+    card_id: str = ""
+
+    def model_post_init(self, __context: Any) -> None:
+        if not self.card_id:
+            self.card_id = QuestionPack.item_key(self.question, self.answer)
 
 
 class SpacedRepetitionState(BaseModel):
@@ -67,62 +95,430 @@ class SpacedRepetitionState(BaseModel):
         self.next_review = datetime.now() + timedelta(days=self.difficulty)
 
 
+class PreparedQuestion:
+    """Pergunta já preparada em segundo plano (reformulação, distratores e extras como áudio)"""
+
+    def __init__(self, item: QuestionItem, question: Question, state_snapshot: tuple, extras: Dict[str, Any]):
+        self.item = item
+        self.question = question
+        self.state_snapshot = state_snapshot
+        self.extras = extras
+
+
+class QuestionPrefetcher:
+    """
+    Prepara a próxima pergunta em uma thread enquanto o usuário responde a atual
+
+    A escolha da pergunta é feita na thread principal (onde o estado SM-2 é alterado);
+    só as chamadas ao modelo e a síntese de áudio rodam em segundo plano. Ao consumir,
+    a pergunta preparada é descartada se deixou de ser uma escolha válida para o
+    conjunto de revisões atual.
+    """
+
+    def __init__(
+        self,
+        session: "StudySession",
+        prepare_extras: Optional[Callable[[Question, Dict[str, Any]], Dict[str, Any]]] = None
+    ):
+        self.session = session
+        self.prepare_extras = prepare_extras
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="study-prefetch")
+        self._future: Optional[Future] = None
+
+    def start(self, exclude: Optional[str] = None) -> None:
+        """Começa a preparar a próxima pergunta (diferente do cartão `exclude`, se possível)"""
+        if self._future is not None:
+            return
+        item = self.session._select_question(exclude=exclude)
+        if item is None:
+            return
+        snapshot = self.session._state_snapshot(item)
+        self._future = self._executor.submit(self._prepare, item, snapshot)
+
+    def take(self) -> Optional[PreparedQuestion]:
+        """Retorna a pergunta preparada, ou None se não houver uma válida"""
+        future, self._future = self._future, None
+        if future is None:
+            self.misses += 1
+            return None
+        try:
+            prepared = future.result()
+        except Exception as e:
+            print(f"Erro ao preparar a próxima pergunta: {e}")
+            self.misses += 1
+            return None
+        if not self.session._is_still_selectable(prepared):
+            self.discarded += 1
+            return None
+        self.hits += 1
+        return prepared
+
+    def cancel(self) -> None:
+        """Descarta a preparação em andamento"""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def shutdown(self) -> None:
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prepare(self, item: QuestionItem, snapshot: tuple) -> PreparedQuestion:
+        # Turnos interativos passam na frente da pré-busca na fila do Ollama
+        with request_priority(BACKGROUND):
+            question, extras = self.session._prepare_question(item)
+        if self.prepare_extras:
+            extras = {**extras, **self.prepare_extras(question, extras)}
+        return PreparedQuestion(item, question, snapshot, extras)
+
+
 class StudySession(BaseModel):
     """Representa uma sessão de estudo"""
     questions: List[QuestionItem]
     current_question: Optional[Question] = None
-    question_states: Dict[str, SpacedRepetitionState] = Field(default_factory=dict)
+    question_states: Dict[str, SpacedRepetitionState] = Field(default_factory=dict)  # por card_id
     answered_questions: List[Dict[str, Any]] = Field(default_factory=list)
     score: int = 0
     total_questions: int = 0
+    # "combined": uma única chamada gera reformulação e distratores; "separate": duas chamadas
+    generation_strategy: Literal["combined", "separate"] = "combined"
+    model: str = 'gemma3:latest'
 
-    def get_next_question(self) -> Optional[Question]:
-        """Obtém a próxima pergunta com base na repetição espaçada"""
-        # Filtra perguntas que estão prontas para revisão
-        now = datetime.now()
-        reviewable = []
-        
-        for q in self.questions:
-            question_text = q.question
-            if question_text not in self.question_states:
-                self.question_states[question_text] = SpacedRepetitionState()
-            
-            state = self.question_states[question_text]
-            
-            # Se não houver próxima revisão ou está na hora de revisar
-            if state.next_review is None or state.next_review <= now:
-                reviewable.append(q)
-        
-        if not reviewable:
-            # Se nenhuma pergunta estiver pronta, retorna uma aleatória
-            if self.questions:
-                random.shuffle(self.questions)
-                reviewable = [self.questions[0]]
-        
-        if not reviewable:
-            return None
+    _prefetcher: Optional[QuestionPrefetcher] = PrivateAttr(default=None)
+    _current_item: Optional[QuestionItem] = PrivateAttr(default=None)
+    _current_extras: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _variant_cache: Optional[QuestionVariantCache] = PrivateAttr(default=None)
+    _fill_executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+    _filling: set = PrivateAttr(default_factory=set)
+    _pack: Optional[QuestionPack] = PrivateAttr(default=None)
+    _pack_cursors: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _state_store: Optional[Union[SM2StateStore, NamespacedStateStore]] = PrivateAttr(default=None)
+    _schedule: Dict[str, Optional[datetime]] = PrivateAttr(default_factory=dict)
+    _schedule_loaded: bool = PrivateAttr(default=False)
+    _due: Optional[DueQueue] = PrivateAttr(default=None)
+    _items: Dict[str, QuestionItem] = PrivateAttr(default_factory=dict)
+    _indexed_count: int = PrivateAttr(default=-1)
+
+    def use_state_store(self, store: Union[SM2StateStore, NamespacedStateStore]) -> None:
+        """
+        Persiste o estado SM-2 no armazenamento informado
+
+        Na primeira escolha de pergunta vem do armazenamento só a agenda (a próxima
+        revisão de cada cartão), que a fila de revisões precisa; o estado completo de um
+        cartão é carregado quando ele é escolhido ou consultado (state_of). Cada resposta
+        grava apenas o cartão alterado.
+        """
+        self._state_store = store
+        self._schedule = {}
+        self._schedule_loaded = False
+
+    def _load_schedule(self) -> None:
+        """Carrega do armazenamento a próxima revisão das perguntas desta sessão (uma vez)"""
+        if self._state_store is None or self._schedule_loaded:
+            return
+        missing = [q.card_id for q in self.questions if q.card_id not in self.question_states]
+        self._schedule = self._state_store.schedule(missing)
+        self._schedule_loaded = True
+        self._indexed_count = -1
+
+    def state_of(self, card_id: str) -> Optional[SpacedRepetitionState]:
+        """Estado SM-2 do cartão, carregado do armazenamento no primeiro acesso (None: nunca respondido)"""
+        state = self.question_states.get(card_id)
+        if state is None and self._state_store is not None and (
+            not self._schedule_loaded or card_id in self._schedule
+        ):
+            state = self._state_store.get(card_id)
+            if state is not None:
+                self.question_states[card_id] = state
+        return state
+
+    def _next_review(self, card_id: str) -> Optional[datetime]:
+        """Próxima revisão do cartão, pelo estado carregado ou pela agenda"""
+        state = self.question_states.get(card_id)
+        return state.next_review if state is not None else self._schedule.get(card_id)
+
+    def _ensure_index(self) -> DueQueue:
+        """Monta (uma vez, ou quando as perguntas mudam) a fila de revisões"""
+        self._load_schedule()
+        if self._due is None or self._indexed_count != len(self.questions):
+            self._items = {q.card_id: q for q in self.questions}
+            self._due = DueQueue((card_id, self._next_review(card_id)) for card_id in self._items)
+            self._indexed_count = len(self.questions)
+        return self._due
+
+    def record_state(self, card_id: str, state: SpacedRepetitionState) -> None:
+        """
+        Registra o novo estado SM-2 de um cartão: na sessão, na fila de revisões e no armazenamento
+
+        Toda mudança de estado deve passar por aqui. Um estado alterado por fora só é
+        notado quando a entrada antiga chega ao topo da fila: se a revisão foi antecipada,
+        o cartão seria servido com atraso.
+        """
+        self.question_states[card_id] = state
+        if self._due is not None:
+            self._due.push(card_id, state.next_review)
+        if self._state_store is not None:
+            self._state_store.save(card_id, state)
+
+    def _peek_due(self, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Cartão com a revisão mais próxima, corrigindo entradas de estados alterados por fora"""
+        due = self._ensure_index()
+        while True:
+            entry = due.peek(exclude=exclude)
+            if entry is None:
+                return None
+            key, ts = entry
+            next_review = self._next_review(key)
+            if review_timestamp(next_review) == ts:
+                return entry
+            due.push(key, next_review)
+
+    def use_pack(self, pack: QuestionPack) -> None:
+        """Serve as perguntas com variantes pré-geradas do pacote (e seu áudio), sem chamar o modelo"""
+        self._pack = pack
+
+    def use_variant_cache(self, cache: QuestionVariantCache) -> None:
+        """
+        Passa a reutilizar reformulações e distratores guardados no cache
+
+        Perguntas com variantes no cache não chamam o modelo; novas variantes são geradas
+        uma a uma em segundo plano até o limite do cache.
+        """
+        self._variant_cache = cache
+        if self._fill_executor is None:
+            self._fill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="variant-fill")
+
+    def close(self) -> None:
+        """Encerra as threads de segundo plano da sessão"""
+        self.disable_prefetch()
+        if self._fill_executor is not None:
+            self._fill_executor.shutdown(wait=False, cancel_futures=True)
+            self._fill_executor = None
+
+    def enable_prefetch(
+        self,
+        prepare_extras: Optional[Callable[[Question, Dict[str, Any]], Dict[str, Any]]] = None
+    ) -> QuestionPrefetcher:
+        """
+        Passa a preparar a próxima pergunta em segundo plano após cada get_next_question
+
+        Args:
+            prepare_extras: Trabalho adicional feito na thread de preparação (por exemplo,
+                sintetizar o áudio); recebe a pergunta e os extras já disponíveis (como o
+                áudio vindo de um pacote) e o resultado fica disponível em current_extras
+        """
+        if self._prefetcher is None:
+            self._prefetcher = QuestionPrefetcher(self, prepare_extras)
+        return self._prefetcher
+
+    def disable_prefetch(self) -> None:
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown()
+            self._prefetcher = None
+
+    @property
+    def current_extras(self) -> Dict[str, Any]:
+        """Extras preparados em segundo plano para a pergunta atual (vazio se não houver)"""
+        return self._current_extras
+
+    def get_next_question(self, on_question_delta: Optional[Callable[[str], None]] = None) -> Optional[Question]:
+        """
+        Obtém a próxima pergunta com base na repetição espaçada
+
+        Args:
+            on_question_delta: Se informado, recebe a pergunta reformulada em pedaços, à medida que é gerada
+        """
+        prepared = self._prefetcher.take() if self._prefetcher else None
+        if prepared is not None:
+            # Pergunta preparada enquanto o usuário respondia a anterior
+            selected_question = prepared.item
+            reformulated_q = prepared.question
+            self._current_extras = prepared.extras
+        else:
+            selected_question = self._select_question()
+            if selected_question is None:
+                return None
+            reformulated_q, self._current_extras = self._prepare_question(
+                selected_question,
+                on_question_delta=on_question_delta
+            )
         
-        # Pega uma pergunta aleatória entre as revisáveis
-        selected_question = random.choice(reviewable)
+        self._current_item = selected_question
+        self.current_question = reformulated_q
         
-        # Reformular a pergunta para evitar monotonia
-        reformulated_question = self._reformulate_question(selected_question.question)
+        # Começa a preparar a próxima enquanto o usuário pensa nesta
+        if self._prefetcher is not None:
+            self._prefetcher.start(exclude=selected_question.card_id)
         
-        # Gerar opções de múltipla escolha
-        choices = self._generate_multiple_choices(selected_question)
+        return reformulated_q
+
+    def _select_question(self, exclude: Optional[str] = None) -> Optional[QuestionItem]:
+        """
+        Escolhe a próxima pergunta pela fila de revisões (O(log N))
+
+        Perguntas nunca vistas vêm primeiro, em ordem aleatória; depois, a revisão mais
+        atrasada. Se nada estiver pronto para revisão, vem a próxima a vencer.
+
+        Args:
+            exclude: card_id a evitar (a pergunta atual, ao pré-buscar a seguinte)
+        """
+        entry = self._peek_due(exclude=exclude)
+        if entry is None:
+            return None
+        
+        card_id = entry[0]
+        if self.state_of(card_id) is None:
+            self.question_states[card_id] = SpacedRepetitionState()
+        return self._items[card_id]
+
+    def _prepare_question(
+        self,
+        selected_question: QuestionItem,
+        on_question_delta: Optional[Callable[[str], None]] = None
+    ) -> Tuple[Question, Dict[str, Any]]:
+        """
+        Reformula a pergunta e gera as opções de múltipla escolha
+
+        Usa, nesta ordem, o pacote pré-gerado, o cache de variantes e o modelo.
+
+        Returns:
+            tuple: (pergunta, extras) - extras traz o áudio da pergunta quando vem do pacote
+        """
+        packed = self._next_pack_variant(selected_question)
+        if packed is not None:
+            return packed
+        
+        cache = self._variant_cache
+        if cache is not None:
+            key = self._variant_key(selected_question)
+            cached = cache.next_variant(key)
+            if cached is not None:
+                reformulated_question, choices = cached
+            else:
+                reformulated_question, choices = self._generate_material(selected_question, on_question_delta)
+                if self._is_generated(selected_question, reformulated_question, choices):
+                    cache.add_variant(key, reformulated_question, choices)
+            self._fill_variants_in_background(selected_question, key)
+        else:
+            reformulated_question, choices = self._generate_material(selected_question, on_question_delta)
         
         # Criar a pergunta reformulada
-        reformulated_q = Question(
+        return Question(
             question=reformulated_question,
             correct_answer=selected_question.answer,
-            wrong_answers=choices
+            wrong_answers=choices,
+            card_id=selected_question.card_id
+        ), {}
+
+    def _next_pack_variant(self, item: QuestionItem) -> Optional[Tuple[Question, Dict[str, Any]]]:
+        """Próxima variante da pergunta no pacote, em rodízio (None se não houver)"""
+        if self._pack is None:
+            return None
+        key = item.card_id
+        variants = self._pack.variants(key)
+        if not variants:
+            return None
+        
+        cursor = self._pack_cursors.get(key, 0)
+        self._pack_cursors[key] = cursor + 1
+        idx, reformulated_question, choices = variants[cursor % len(variants)]
+        
+        extras = {}
+        audio = self._pack.audio(key, idx)
+        if audio is not None:
+            extras['question_audio'] = audio
+        question = Question(
+            question=reformulated_question,
+            correct_answer=item.answer,
+            wrong_answers=self._complete_wrong_answers(choices),
+            card_id=item.card_id
         )
+        return question, extras
+
+    def _generate_material(
+        self,
+        selected_question: QuestionItem,
+        on_question_delta: Optional[Callable[[str], None]] = None
+    ) -> Tuple[str, List[str]]:
+        """Chama o modelo conforme a estratégia de geração"""
+        if self.generation_strategy == "combined":
+            # Reformulação e distratores em uma única chamada ao modelo
+            return self._generate_question_material(selected_question, on_delta=on_question_delta)
         
-        self.current_question = reformulated_q
-        return reformulated_q
+        # Reformular a pergunta para evitar monotonia
+        reformulated_question = self._reformulate_question(selected_question.question, on_delta=on_question_delta)
+        
+        # Gerar opções de múltipla escolha
+        choices = self._generate_multiple_choices(selected_question)
+        return reformulated_question, choices
+
+    def _variant_key(self, item: QuestionItem) -> str:
+        return QuestionVariantCache.make_key(
+            item.question,
+            item.answer,
+            self.model,
+            f"{QUESTION_PROMPT_VERSION}-{self.generation_strategy}"
+        )
+
+    @staticmethod
+    def _is_generated(item: QuestionItem, reformulated_question: str, choices: List[str]) -> bool:
+        """Indica se o resultado veio do modelo (e não dos valores de fallback)"""
+        if reformulated_question == item.question:
+            return False
+        return not any(choice == f"Resposta incorreta {i}" for i, choice in enumerate(choices, 1))
+
+    def _fill_variants_in_background(self, item: QuestionItem, key: str) -> None:
+        """Gera mais uma variante da pergunta em segundo plano, se o cache ainda não estiver cheio"""
+        cache = self._variant_cache
+        if self._fill_executor is None or key in self._filling:
+            return
+        if cache.variant_count(key) >= cache.max_variants:
+            return
+        
+        def fill():
+            try:
+                with request_priority(BACKGROUND):
+                    reformulated_question, choices = self._generate_material(item)
+                if self._is_generated(item, reformulated_question, choices):
+                    cache.add_variant(key, reformulated_question, choices)
+            finally:
+                self._filling.discard(key)
+        
+        self._filling.add(key)
+        try:
+            self._fill_executor.submit(fill)
+        except RuntimeError:
+            # Sessão encerrada
+            self._filling.discard(key)
 
-    def _reformulate_question(self, original_question: str) -> str:
-        """Reformula a pergunta para evitar monotonia"""
+    def _state_snapshot(self, item: QuestionItem) -> tuple:
+        state = self.question_states.get(item.card_id)
+        if state is None:
+            return (None, 0)
+        return (state.next_review, state.repetition_count)
+
+    def _is_still_selectable(self, prepared: PreparedQuestion) -> bool:
+        """Verifica se a pergunta preparada ainda seria uma escolha válida agora"""
+        self._ensure_index()
+        if self._items.get(prepared.item.card_id) != prepared.item:
+            return False
+        if self._state_snapshot(prepared.item) != prepared.state_snapshot:
+            return False
+        
+        now = datetime.now()
+        next_review = prepared.state_snapshot[0]
+        if next_review is None or next_review <= now:
+            return True
+        
+        # Escolhida quando nada estava pronto para revisão: só vale se isso continuar verdade
+        entry = self._peek_due()
+        return entry is None or entry[1] > now.timestamp()
+
+    def _reformulate_question(self, original_question: str, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """Reformula a pergunta para evitar monotonia (em streaming se on_delta for informado)"""
         # Define o schema para reformulação de perguntas
         schema = {
             "type": "object",
@@ -150,14 +546,24 @@ class StudySession(BaseModel):
         """
 
         try:
-            response = ollama.chat(
-                model='gemma3:latest',
-                messages=[{'role': 'user', 'content': prompt}],
-                options={'temperature': 0.8},
-                format=schema
-            )
+            if on_delta is not None:
+                response_content = stream_chat(
+                    self.model,
+                    [{'role': 'user', 'content': prompt}],
+                    format=schema,
+                    options={'temperature': 0.8},
+                    client=get_gateway(),
+                    on_string_delta=lambda key, delta: on_delta(delta) if key == 'reformulated_question' else None
+                )
+            else:
+                response = get_gateway().chat(
+                    model=self.model,
+                    messages=[{'role': 'user', 'content': prompt}],
+                    options={'temperature': 0.8},
+                    format=schema
+                )
+                response_content = response['message']['content']
 
-            response_content = response['message']['content']
             if isinstance(response_content, str):
                 try:
                     parsed_response = json.loads(response_content)
@@ -205,8 +611,8 @@ class StudySession(BaseModel):
         """
 
         try:
-            response = ollama.chat(
-                model='gemma3:latest',
+            response = get_gateway().chat(
+                model=self.model,
                 messages=[{'role': 'user', 'content': prompt}],
                 options={'temperature': 0.8},
                 format=schema
@@ -229,18 +635,109 @@ class StudySession(BaseModel):
             else:
                 parsed_response = response_content
 
-            wrong_answers = parsed_response.get('wrong_answers', [])
-            
-            # Se não tivermos 3 respostas, completar com respostas padrão
-            while len(wrong_answers) < 3:
-                wrong_answers.append(f"Resposta incorreta {len(wrong_answers) + 1}")
-            
-            # Limitar a 3 respostas, se houver mais
-            return wrong_answers[:3]
+            return self._complete_wrong_answers(parsed_response.get('wrong_answers', []))
         except Exception as e:
             print(f"Erro ao gerar respostas incorretas: {e}")
             return [f"Resposta incorreta 1", f"Resposta incorreta 2", f"Resposta incorreta 3"]
 
+    @staticmethod
+    def _complete_wrong_answers(wrong_answers: List[str]) -> List[str]:
+        """Garante exatamente 3 respostas incorretas"""
+        wrong_answers = list(wrong_answers)
+        
+        # Se não tivermos 3 respostas, completar com respostas padrão
+        while len(wrong_answers) < 3:
+            wrong_answers.append(f"Resposta incorreta {len(wrong_answers) + 1}")
+        
+        # Limitar a 3 respostas, se houver mais
+        return wrong_answers[:3]
+
+    def _generate_question_material(
+        self,
+        question_item: QuestionItem,
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> Tuple[str, List[str]]:
+        """
+        Reformula a pergunta e gera 3 respostas incorretas em uma única chamada ao modelo
+
+        Usa os mesmos fallbacks das chamadas separadas: a pergunta original quando a
+        reformulação falha e respostas padrão quando faltam distratores.
+
+        Returns:
+            tuple: (pergunta reformulada, lista com 3 respostas incorretas)
+        """
+        original_question = question_item.question
+        default_wrong_answers = [f"Resposta incorreta {i}" for i in range(1, 4)]
+        schema = {
+            "type": "object",
+            "properties": {
+                "reformulated_question": {
+                    "type": "string",
+                    "description": "A pergunta reformulada de forma diferente do original"
+                },
+                "wrong_answers": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "3 respostas incorretas plausíveis relacionadas à pergunta"
+                }
+            },
+            "required": ["reformulated_question", "wrong_answers"]
+        }
+
+        prompt = f"""
+        Prepare uma pergunta de múltipla escolha a partir da pergunta e resposta abaixo.
+        
+        Pergunta original: {original_question}
+        Resposta correta: {question_item.answer}
+        
+        1. Reformule a pergunta de forma diferente, mas mantendo o mesmo conteúdo e significado:
+        - Use palavras diferentes
+        - Mude a estrutura da frase
+        - Torne mais natural ou informal se possível
+        - Evite repetir exatamente as mesmas palavras
+        
+        2. Gere 3 respostas incorretas plausíveis:
+        - Devem parecer corretas à primeira vista, mas serem claramente erradas
+        - Evite respostas óbvias ou absurdas
+        - Devem estar relacionadas ao tema da pergunta
+        - Cada resposta deve ser única
+        - Tente criar respostas semelhantes à correta mas com pequenas diferenças
+        """
+
+        try:
+            if on_delta is not None:
+                response_content = stream_chat(
+                    self.model,
+                    [{'role': 'user', 'content': prompt}],
+                    format=schema,
+                    options={'temperature': 0.8},
+                    client=get_gateway(),
+                    on_string_delta=lambda key, delta: on_delta(delta) if key == 'reformulated_question' else None
+                )
+            else:
+                response = get_gateway().chat(
+                    model=self.model,
+                    messages=[{'role': 'user', 'content': prompt}],
+                    options={'temperature': 0.8},
+                    format=schema
+                )
+                response_content = response['message']['content']
+
+            if isinstance(response_content, str):
+                try:
+                    parsed_response = json.loads(response_content)
+                except json.JSONDecodeError:
+                    return original_question, default_wrong_answers
+            else:
+                parsed_response = response_content
+
+            reformulated = parsed_response.get('reformulated_question') or original_question
+            wrong_answers = self._complete_wrong_answers(parsed_response.get('wrong_answers') or [])
+            return reformulated, wrong_answers
+        except Exception as e:
+            print(f"Erro ao preparar pergunta: {e}")
+            return original_question, default_wrong_answers
+
     def check_answer(self, selected_answer: str) -> bool:
         """Verifica se a resposta selecionada está correta"""
         if not self.current_question:
@@ -250,9 +747,11 @@ class StudySession(BaseModel):
         
         # Atualizar o estado de repetição espaçada
         if self.current_question:
-            question_text = [q.question for q in self.questions if q.answer == self.current_question.correct_answer][0]
-            if question_text in self.question_states:
-                self.question_states[question_text].update(is_correct)
+            card_id = self.current_question.card_id
+            state = self.state_of(card_id)
+            if state is not None:
+                state.update(is_correct)
+                self.record_state(card_id, state)
         
         # Registrar a resposta
         self.answered_questions.append({
@@ -270,19 +769,111 @@ class StudySession(BaseModel):
         return is_correct
 
 
+def flatten_questionnaire(questionnaire_data: Any) -> List[Dict[str, str]]:
+    """
+    Normaliza um questionário para uma lista de perguntas
+
+    Aceita a lista simples (como sample_questions.json) ou o formato por categorias
+    (como questionnaires.json); no segundo caso cada pergunta recebe o campo 'category'.
+    """
+    if isinstance(questionnaire_data, dict):
+        return [
+            {**item, 'category': category}
+            for category, items in questionnaire_data.items()
+            for item in items
+        ]
+    return list(questionnaire_data)
+
+
 class StudyPartner:
     """Agente parceiro de estudos com memória e TTS"""
     
-    def __init__(self, model: str = 'gemma3:latest', voice: str = 'pf_dora'):
+    def __init__(
+        self,
+        model: str = 'gemma3:latest',
+        voice: str = 'pf_dora',
+        warmup_tts: bool = False,
+        stream: bool = False,
+        prefetch: bool = True,
+        generation_strategy: str = "combined",
+        variant_cache: Optional[QuestionVariantCache] = None,
+        state_store: Optional[SM2StateStore] = None,
+        preload: bool = False
+    ):
         self.model = model
         self.voice = voice
+        self.stream = stream
+        self.prefetch = prefetch
+        self.generation_strategy = generation_strategy
+        self.variant_cache = variant_cache
+        self.state_store = state_store
         self.session: Optional[StudySession] = None
         self.running = False
 
-    def load_questionnaire(self, questionnaire_data: List[Dict[str, str]]) -> None:
-        """Carrega um conjunto de perguntas e respostas"""
-        questions = [QuestionItem(question=q['question'], answer=q['answer']) for q in questionnaire_data]
-        self.session = StudySession(questions=questions)
+        # Carrega o pipeline do Kokoro em segundo plano enquanto a primeira pergunta é preparada
+        if warmup_tts:
+            warmup_kokoro_pipeline(voice=self.voice, background=True)
+
+        # Carrega o modelo no Ollama enquanto o questionário é lido
+        if preload:
+            warmup_model(self.model, background=True)
+
+    def load_questionnaire(
+        self,
+        questionnaire_data: Optional[Any] = None,
+        pack_path: Optional[str] = None
+    ) -> None:
+        """
+        Carrega um conjunto de perguntas e respostas
+
+        Args:
+            questionnaire_data: Lista de perguntas ou dicionário de categorias (como em questionnaires.json);
+                se omitido, as perguntas vêm do pacote
+            pack_path: Pacote gerado por pregenerate_questionnaire.py com variantes e áudio prontos
+        """
+        pack = QuestionPack(pack_path, readonly=True) if pack_path else None
+        if questionnaire_data is None:
+            questionnaire_data = pack.items() if pack else []
+        questions = [
+            QuestionItem(question=q['question'], answer=q['answer'])
+            for q in flatten_questionnaire(questionnaire_data)
+        ]
+        self.session = StudySession(
+            questions=questions,
+            generation_strategy=self.generation_strategy,
+            model=self.model
+        )
+        if self.variant_cache is not None:
+            self.session.use_variant_cache(self.variant_cache)
+        if pack is not None:
+            self.session.use_pack(pack)
+        if self.state_store is not None:
+            self.session.use_state_store(self.state_store)
+
+    def _prepare_audio(self, question: Question, extras: Dict[str, Any]) -> Dict[str, Any]:
+        """Embaralha as opções e sintetiza o áudio da pergunta e das opções (usado na pré-busca)"""
+        all_options = [question.correct_answer] + question.wrong_answers
+        random.shuffle(all_options)
+        return {
+            'options': all_options,
+            'question_audio': extras.get('question_audio') or get_kokoro_audio(
+                question.question,
+                voice=self.voice,
+                repo_id='hexgrad/Kokoro-82M'
+            ),
+            'options_audio': get_kokoro_audio(
+                self._options_text(all_options),
+                voice=self.voice,
+                repo_id='hexgrad/Kokoro-82M'
+            )
+        }
+
+    @staticmethod
+    def _options_text(all_options: List[str]) -> str:
+        options_text = "Opções: "
+        for i, option in enumerate(all_options, 1):
+            options_text += f"{i}, {option}. "
+        return options_text
 
     def start_study_session(self, text_only: bool = False):
         """Inicia uma sessão de estudo interativa"""
@@ -290,6 +881,10 @@ class StudyPartner:
             print("Nenhum questionário carregado. Use load_questionnaire primeiro.")
             return
 
+        # Prepara a próxima pergunta (e seu áudio) enquanto o usuário responde a atual
+        if self.prefetch:
+            self.session.enable_prefetch(prepare_extras=None if text_only else self._prepare_audio)
+
         self.running = True
         print("Iniciando sessão de estudo com o Parceiro de Estudos.")
         print("O parceiro fará perguntas com múltipla escolha para você responder.")
@@ -298,18 +893,32 @@ class StudyPartner:
 
         while self.running:
             try:
-                # Obter próxima pergunta
-                question = self.session.get_next_question()
+                # Obter próxima pergunta (mostrando a reformulação enquanto é gerada, se em streaming)
+                streamed = []
+                
+                def on_question_delta(delta):
+                    if not streamed:
+                        print("\nPergunta: ", end="", flush=True)
+                    streamed.append(delta)
+                    print(delta, end="", flush=True)
+                
+                question = self.session.get_next_question(on_question_delta=on_question_delta if self.stream else None)
+                if streamed:
+                    print()
                 if not question:
                     print("Não há mais perguntas disponíveis no momento.")
                     break
                 
                 # Exibir pergunta
-                print(f"\nPergunta: {question.question}")
+                if "".join(streamed) != question.question:
+                    print(f"\nPergunta: {question.question}")
                 
-                # Gerar opções de resposta
-                all_options = [question.correct_answer] + question.wrong_answers
-                random.shuffle(all_options)
+                # Gerar opções de resposta (já embaralhadas se a pergunta foi preparada antes)
+                extras = self.session.current_extras
+                all_options = extras.get('options')
+                if not all_options:
+                    all_options = [question.correct_answer] + question.wrong_answers
+                    random.shuffle(all_options)
                 
                 # Exibir opções numeradas
                 for i, option in enumerate(all_options, 1):
@@ -319,7 +928,7 @@ class StudyPartner:
                 if not text_only:
                     try:
                         # Primeiro, falar a pergunta
-                        question_audio, sample_rate = get_kokoro_audio(
+                        question_audio, sample_rate = extras.get('question_audio') or get_kokoro_audio(
                             f"{question.question}", 
                             voice=self.voice, 
                             repo_id='hexgrad/Kokoro-82M'
@@ -330,12 +939,8 @@ class StudyPartner:
                             play_audio_from_bytes(question_audio, sample_rate)
                         
                         # Depois, falar as opções
-                        options_text = "Opções: "
-                        for i, option in enumerate(all_options, 1):
-                            options_text += f"{i}, {option}. "
-                        
-                        options_audio, sample_rate = get_kokoro_audio(
-                            options_text, 
+                        options_audio, sample_rate = extras.get('options_audio') or get_kokoro_audio(
+                            self._options_text(all_options), 
                             voice=self.voice, 
                             repo_id='hexgrad/Kokoro-82M'
                         )
@@ -400,12 +1005,16 @@ class StudyPartner:
                 print(f"Erro durante a sessão de estudo: {e}")
                 continue
         
+        self.session.close()
+        
         # Mostrar resumo da sessão
         if self.session:
             print(f"\nResumo da sessão:")
             print(f"Perguntas respondidas: {self.session.total_questions}")
             print(f"Acertos: {self.session.score}")
             print(f"Taxa de acerto: {(self.session.score / max(1, self.session.total_questions) * 100):.1f}%")
+            if self.variant_cache is not None:
+                print(f"Perguntas servidas pelo cache: {self.variant_cache.stats()['hit_rate'] * 100:.1f}%")
 
     def get_session_summary(self) -> str:
         """Retorna um resumo da sessão de estudo"""
@@ -424,56 +1033,120 @@ class StudyPartner:
         return summary
 
 
+# Questionário de exemplo, usado quando nenhum arquivo é informado
+SAMPLE_QUESTIONNAIRE = [
+    {
+        "question": "Qual é a capital do Brasil?",
+        "answer": "Brasília"
+    },
+    {
+        "question": "Qual é a fórmula química da água?",
+        "answer": "H2O"
+    },
+    {
+        "question": "Quantos planetas existem no sistema solar?",
+        "answer": "8"
+    },
+    {
+        "question": "Qual é o maior oceano da Terra?",
+        "answer": "Oceano Pacífico"
+    },
+    {
+        "question": "Quem escreveu 'Dom Casmurro'?",
+        "answer": "Machado de Assis"
+    }
+]
+
+
+def add_session_arguments(parser) -> None:
+    """
+    Opções comuns aos dois pontos de entrada do parceiro de estudos (study-partner e
+    run_study_partner.py); cada um acrescenta só a forma de informar o questionário
+    """
+    import os
+
+    parser.add_argument('--model', '-m', default='gemma3:latest', help='Modelo Ollama a ser usado')
+    parser.add_argument('--voice', '-v', default='pf_dora', help='Voz do Kokoro TTS a ser usada')
+    parser.add_argument('--text-only', action='store_true', help='Apenas texto, sem áudio')
+    parser.add_argument('--warmup-tts', action='store_true', help='Pré-carregar o Kokoro TTS ao iniciar')
+    parser.add_argument('--stream', action='store_true', help='Mostrar as perguntas enquanto são geradas')
+    parser.add_argument('--no-prefetch', action='store_true', help='Não preparar a próxima pergunta em segundo plano')
+    parser.add_argument(
+        '--generation-strategy',
+        choices=['combined', 'separate'],
+        default='combined',
+        help='Gerar reformulação e distratores em uma chamada (combined) ou em duas (separate)'
+    )
+    parser.add_argument('--no-cache', action='store_true', help='Não usar o cache de reformulações e distratores')
+    parser.add_argument('--pack', help='Pacote pré-gerado por pregenerate_questionnaire.py (dispensa o arquivo de perguntas)')
+    parser.add_argument('--state-db', help='Arquivo do estado de repetição espaçada (padrão: ~/.local/share/agent/study_state.sqlite3)')
+    parser.add_argument('--no-persist', action='store_true', help='Não guardar o estado de repetição espaçada entre execuções')
+    parser.add_argument('--preload', action='store_true', help='Carregar o modelo no Ollama ao iniciar')
+    parser.add_argument('--keep-alive', default=os.environ.get('AGENT_OLLAMA_KEEP_ALIVE') or '30m',
+                        help='Tempo que o modelo fica carregado no Ollama entre as perguntas (ex.: 30m, 1h, -1 para sempre)')
+    parser.add_argument('--timings', action='store_true', help='Mostrar ao final os tempos de carregamento do modelo, do prompt e da geração')
+
+
+def partner_from_args(args) -> "StudyPartner":
+    """Configura o gateway e cria o StudyPartner a partir das opções de add_session_arguments"""
+    from ollama_gateway import configure_gateway
+
+    configure_gateway(keep_alive=args.keep_alive)
+    return StudyPartner(
+        model=args.model,
+        voice=args.voice,
+        warmup_tts=args.warmup_tts and not args.text_only,
+        stream=args.stream,
+        prefetch=not args.no_prefetch,
+        generation_strategy=args.generation_strategy,
+        variant_cache=None if args.no_cache else QuestionVariantCache(),
+        state_store=None if args.no_persist else SM2StateStore(args.state_db),
+        preload=args.preload
+    )
+
+
+def print_timings() -> None:
+    """Resumo dos tempos das chamadas ao Ollama nesta sessão"""
+    timings = get_gateway().metrics()["timings"]
+    if not timings["count"]:
+        print("Nenhuma chamada ao modelo nesta sessão.")
+        return
+    print(f"\nChamadas ao modelo: {timings['count']} ({timings['cold_loads']} com carregamento do modelo)")
+    for name, label in (("load", "Carregamento"), ("prompt_eval", "Avaliação do prompt"), ("eval", "Geração")):
+        print(f"{label}: {timings[name]['total']:.2f} s no total, média {timings[name]['mean']:.2f} s, máximo {timings[name]['max']:.2f} s")
+
+
 def main():
     """Função principal para executar o parceiro de estudos"""
     import argparse
-    import sys
 
     parser = argparse.ArgumentParser(description="Parceiro de Estudos baseado em IA com TTS")
-    parser.add_argument('--model', '-m', default='gemma3:latest', help='Modelo Ollama a ser usado')
-    parser.add_argument('--voice', '-v', default='pf_dora', help='Voz do Kokoro TTS a ser usada')
-    parser.add_argument('--text-only', action='store_true', help='Apenas texto, sem áudio')
-    parser.add_argument('--questionnaire', '-q', help='Caminho para o arquivo JSON com perguntas e respostas')
+    parser.add_argument('--questionnaire', '--question-file', '-q', help='Caminho para o arquivo JSON com perguntas e respostas')
+    add_session_arguments(parser)
     
     args = parser.parse_args()
     
     # Criar agente
-    partner = StudyPartner(model=args.model, voice=args.voice)
+    partner = partner_from_args(args)
     
     # Carregar questionário padrão se não for especificado
-    if args.questionnaire:
+    if args.pack and not args.questionnaire:
+        # As perguntas vêm do próprio pacote
+        questionnaire_data = None
+    elif args.questionnaire:
         # Carregar do arquivo
         with open(args.questionnaire, 'r', encoding='utf-8') as f:
             questionnaire_data = json.load(f)
     else:
         # Carregar questionário de exemplo
         print("Usando questionário de exemplo...")
-        questionnaire_data = [
-            {
-                "question": "Qual é a capital do Brasil?",
-                "answer": "Brasília"
-            },
-            {
-                "question": "Qual é a fórmula química da água?",
-                "answer": "H2O"
-            },
-            {
-                "question": "Quantos planetas existem no sistema solar?",
-                "answer": "8"
-            },
-            {
-                "question": "Qual é o maior oceano da Terra?",
-                "answer": "Oceano Pacífico"
-            },
-            {
-                "question": "Quem escreveu 'Dom Casmurro'?",
-                "answer": "Machado de Assis"
-            }
-        ]
+        questionnaire_data = SAMPLE_QUESTIONNAIRE
     
-    partner.load_questionnaire(questionnaire_data)
+    partner.load_questionnaire(questionnaire_data, pack_path=args.pack)
     partner.start_study_session(text_only=args.text_only)
+    if args.timings:
+        print_timings()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
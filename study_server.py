@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Servidor de estudos para vários estudantes (asyncio, HTTP/JSON em localhost)
+
+Cada estudante tem seu próprio StudySession (estado SM-2, placar e histórico), salvo
+em um SM2StateStore compartilhado com as chaves separadas por estudante. As
+reformulações, os distratores e o áudio são compartilhados: cada variante é gerada
+uma única vez, e pedidos simultâneos da mesma pergunta esperam a mesma chamada.
+
+O event loop só faz E/S: a escolha da pergunta (que na primeira vez carrega o estado e
+monta a fila de revisões do estudante) e a correção (que grava no SQLite) rodam em um
+pool de threads, uma de cada vez por estudante (Learner.lock), sem atrasar os outros.
+
+Rotas:
+    POST /learners/<id>/next      próxima pergunta do estudante
+    POST /learners/<id>/answer    {"answer": "..."} corrige a pergunta atual
+    GET  /learners/<id>           placar do estudante
+    GET  /audio/<chave>           áudio (WAV) da pergunta ou das opções
+    GET  /stats                   métricas do servidor
+
+Uso:
+    python study_server.py --question-file sample_questions.json --port 8765
+    curl -X POST localhost:8765/learners/ana/next
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ollama_gateway import configure_gateway, get_gateway, warmup_model
+from sm2_store import SM2StateStore
+from study_partner import Question, QuestionItem, StudyPartner, StudySession, flatten_questionnaire
+
+
+LEARNER_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    500: "Internal Server Error"
+}
+
+
+class StudyServerError(Exception):
+    """Erro de requisição, devolvido ao cliente com o status HTTP correspondente"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SharedMaterial:
+    """
+    Reformulações e distratores compartilhados entre os estudantes
+
+    Cada pergunta tem até `variants_per_card` variantes, geradas sob demanda uma única
+    vez; enquanto uma geração está em andamento, outros pedidos da mesma pergunta
+    esperam por ela em vez de chamar o modelo de novo.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[QuestionItem], Tuple[str, List[str]]],
+        executor: ThreadPoolExecutor,
+        variants_per_card: int = 3
+    ):
+        self.generate = generate
+        self.executor = executor
+        self.variants_per_card = variants_per_card
+        self.generated = 0
+        self.reused = 0
+        self.coalesced = 0
+        self.failed = 0
+        self._variants: Dict[str, List[Tuple[str, List[str]]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def variant(self, item: QuestionItem, index: int) -> Tuple[str, List[str]]:
+        """Variante `index` (em rodízio) da pergunta, gerando-a se ainda não existir"""
+        variants = self._variants.setdefault(item.card_id, [])
+        wanted = index % self.variants_per_card
+        if wanted < len(variants):
+            self.reused += 1
+            return variants[wanted]
+
+        pending = self._pending.get(item.card_id)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._generate, item)
+        self._pending[item.card_id] = future
+        future.add_done_callback(lambda _: self._pending.pop(item.card_id, None))
+        return await asyncio.shield(future)
+
+    def _generate(self, item: QuestionItem) -> Tuple[str, List[str]]:
+        question, choices = self.generate(item)
+        if StudySession._is_generated(item, question, choices):
+            self._variants[item.card_id].append((question, choices))
+            self.generated += 1
+        else:
+            # Fallback (modelo indisponível): serve, mas não guarda, para tentar de novo depois
+            self.failed += 1
+        return question, choices
+
+
+class SharedAudio:
+    """Áudio (WAV) por texto, sintetizado uma única vez e guardado em um LRU"""
+
+    def __init__(self, synthesize: Callable[[str], Tuple[Any, int]], executor: ThreadPoolExecutor, max_items: int = 1000):
+        self.synthesize = synthesize
+        self.executor = executor
+        self.max_items = max_items
+        self.synthesized = 0
+        self.reused = 0
+        self.coalesced = 0
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self._audio: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def register(self, text: str) -> str:
+        """Registra um texto e retorna a chave para buscá-lo em /audio/<chave>"""
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]
+        self._texts[key] = text
+        self._texts.move_to_end(key)
+        while len(self._texts) > 4 * self.max_items:
+            self._texts.popitem(last=False)
+        return key
+
+    async def wav(self, key: str) -> Optional[bytes]:
+        if key in self._audio:
+            self.reused += 1
+            self._audio.move_to_end(key)
+            return self._audio[key]
+        text = self._texts.get(key)
+        if text is None:
+            return None
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self._synthesize, key, text)
+        self._pending[key] = future
+        future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(future)
+
+    def _synthesize(self, key: str, text: str) -> bytes:
+        import numpy as np
+
+        audio, sample_rate = self.synthesize(text)
+        pcm = (np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0) * 32767).astype('<i2')
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm.tobytes())
+        data = buffer.getvalue()
+        self.synthesized += 1
+        self._audio[key] = data
+        while len(self._audio) > self.max_items:
+            self._audio.popitem(last=False)
+        return data
+
+
+class Learner:
+    """Sessão de um estudante no servidor"""
+
+    def __init__(self, name: str, session: StudySession):
+        self.name = name
+        self.session = session
+        # Uma operação por vez na sessão (ela roda no pool de threads do servidor)
+        self.lock = asyncio.Lock()
+        self.views: Dict[str, int] = {}  # Vezes que cada cartão foi mostrado (rodízio de variantes)
+        self.last_seen = time.time()
+
+
+class StudyServer:
+    """Servidor HTTP assíncrono que hospeda várias sessões de estudo"""
+
+    def __init__(
+        self,
+        questions: List[Dict[str, str]],
+        state_store: Optional[SM2StateStore] = None,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        model: str = 'gemma3:latest',
+        generation_strategy: str = "combined",
+        llm_workers: int = 4,
+        session_workers: int = 4,
+        variants_per_card: int = 3,
+        tts: bool = False,
+        voice: str = 'pf_dora',
+        tts_workers: int = 1,
+        generate: Optional[Callable[[QuestionItem], Tuple[str, List[str]]]] = None,
+        synthesize: Optional[Callable[[str], Tuple[Any, int]]] = None
+    ):
+        """
+        Args:
+            questions: Perguntas do questionário (lista ou dicionário de categorias)
+            state_store: Onde guardar o estado SM-2 de cada estudante (None: só em memória)
+            llm_workers: Chamadas simultâneas ao modelo
+            session_workers: Threads para as operações das sessões (escolha da pergunta, correção)
+            variants_per_card: Variantes compartilhadas por pergunta
+            tts: Oferecer o áudio das perguntas e opções em /audio
+            generate: Substitui a geração de variantes pelo modelo (testes e testes de carga)
+            synthesize: Substitui a síntese do Kokoro (testes e testes de carga)
+        """
+        self.questions = [
+            QuestionItem(question=q['question'], answer=q['answer'])
+            for q in flatten_questionnaire(questions)
+        ]
+        self.state_store = state_store
+        self.host = host
+        self.port = port
+        self.model = model
+        self.generation_strategy = generation_strategy
+        self.learners: Dict[str, Learner] = {}
+        self.requests = 0
+
+        if generate is None:
+            # Sessão usada apenas para reaproveitar os prompts e schemas de geração
+            generate = StudySession(questions=[], model=model, generation_strategy=generation_strategy)._generate_material
+        self._llm_executor = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="study-server-llm")
+        self._session_executor = ThreadPoolExecutor(max_workers=session_workers, thread_name_prefix="study-server-session")
+        self.material = SharedMaterial(generate, self._llm_executor, variants_per_card)
+
+        self.audio: Optional[SharedAudio] = None
+        self._tts_executor: Optional[ThreadPoolExecutor] = None
+        if tts:
+            if synthesize is None:
+                from tts_response import get_kokoro_audio
+
+                def synthesize(text):
+                    return get_kokoro_audio(text, voice=voice, repo_id='hexgrad/Kokoro-82M')
+            self._tts_executor = ThreadPoolExecutor(max_workers=tts_workers, thread_name_prefix="study-server-tts")
+            self.audio = SharedAudio(synthesize, self._tts_executor)
+
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # Ciclo de vida
+
+    async def start(self) -> "StudyServer":
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._llm_executor.shutdown(wait=False, cancel_futures=True)
+        self._session_executor.shutdown(wait=False, cancel_futures=True)
+        if self._tts_executor is not None:
+            self._tts_executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    # Operações
+
+    def learner(self, name: str) -> Learner:
+        """Sessão do estudante (criada no primeiro acesso, com o estado salvo se houver)"""
+        if not LEARNER_ID.match(name):
+            raise StudyServerError(400, "identificador de estudante inválido")
+        learner = self.learners.get(name)
+        if learner is None:
+            session = StudySession(
+                questions=self.questions,
+                model=self.model,
+                generation_strategy=self.generation_strategy
+            )
+            if self.state_store is not None:
+                session.use_state_store(self.state_store.namespace(name))
+            learner = self.learners[name] = Learner(name, session)
+        learner.last_seen = time.time()
+        return learner
+
+    async def _in_session(self, function: Callable, *args: Any) -> Any:
+        """Executa uma operação bloqueante da sessão no pool de threads (com o lock do estudante)"""
+        return await asyncio.get_running_loop().run_in_executor(self._session_executor, function, *args)
+
+    async def next_question(self, name: str) -> Dict[str, Any]:
+        learner = self.learner(name)
+        async with learner.lock:
+            session = learner.session
+            item = await self._in_session(session._select_question)
+            if item is None:
+                raise StudyServerError(404, "questionário vazio")
+
+            index = learner.views.get(item.card_id, 0)
+            learner.views[item.card_id] = index + 1
+            question_text, choices = await self.material.variant(item, index)
+            session.current_question = Question(
+                question=question_text,
+                correct_answer=item.answer,
+                wrong_answers=choices,
+                card_id=item.card_id
+            )
+
+            options = [item.answer] + list(choices)
+            random.shuffle(options)
+            payload = {"card_id": item.card_id, "question": question_text, "options": options}
+            if self.audio is not None:
+                payload["audio"] = {
+                    "question": f"/audio/{self.audio.register(question_text)}",
+                    "options": f"/audio/{self.audio.register(StudyPartner._options_text(options))}"
+                }
+            return payload
+
+    async def answer(self, name: str, selected_answer: str) -> Dict[str, Any]:
+        learner = self.learner(name)
+        async with learner.lock:
+            session = learner.session
+            if session.current_question is None:
+                raise StudyServerError(409, "nenhuma pergunta pendente; peça uma com /next")
+            correct_answer = session.current_question.correct_answer
+            is_correct = await self._in_session(session.check_answer, selected_answer)
+            session.current_question = None
+            return {
+                "correct": is_correct,
+                "correct_answer": correct_answer,
+                "score": session.score,
+                "answered": session.total_questions
+            }
+
+    def learner_stats(self, name: str) -> Dict[str, Any]:
+        session = self.learner(name).session
+        return {
+            "learner": name,
+            "score": session.score,
+            "answered": session.total_questions,
+            "accuracy": session.score / session.total_questions if session.total_questions else 0.0
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        material = self.material
+        stats = {
+            "learners": len(self.learners),
+            "requests": self.requests,
+            "questions": len(self.questions),
+            "material": {
+                "generated": material.generated,
+                "reused": material.reused,
+                "coalesced": material.coalesced,
+                "failed": material.failed
+            }
+        }
+        stats["ollama"] = get_gateway().metrics()
+        if self.audio is not None:
+            stats["audio"] = {
+                "synthesized": self.audio.synthesized,
+                "reused": self.audio.reused,
+                "coalesced": self.audio.coalesced
+            }
+        return stats
+
+    # HTTP
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        parts = [part for part in path.split('/') if part]
+        if parts == ['stats'] and method == 'GET':
+            return self._json(200, self.stats())
+        if len(parts) == 2 and parts[0] == 'audio' and method == 'GET':
+            data = await self.audio.wav(parts[1]) if self.audio is not None else None
+            if data is None:
+                raise StudyServerError(404, "áudio não encontrado")
+            return 200, 'audio/wav', data
+        if len(parts) >= 2 and parts[0] == 'learners':
+            name = parts[1]
+            if len(parts) == 2 and method == 'GET':
+                return self._json(200, self.learner_stats(name))
+            if len(parts) == 3 and method == 'POST':
+                if parts[2] == 'next':
+                    return self._json(200, await self.next_question(name))
+                if parts[2] == 'answer':
+                    try:
+                        payload = json.loads(body or b'{}')
+                        selected_answer = payload['answer']
+                    except (ValueError, KeyError, TypeError):
+                        raise StudyServerError(400, 'corpo esperado: {"answer": "..."}')
+                    return self._json(200, await self.answer(name, selected_answer))
+        raise StudyServerError(404, f"rota não encontrada: {method} {path}")
+
+    @staticmethod
+    def _json(status: int, payload: Dict[str, Any]) -> Tuple[int, str, bytes]:
+        return status, 'application/json', json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length') or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    length = None  # Sem saber onde o corpo termina, a conexão é encerrada
+                body = await reader.readexactly(length) if length else b''
+
+                self.requests += 1
+                try:
+                    if length is None:
+                        raise StudyServerError(400, "Content-Length inválido")
+                    status, content_type, data = await self._route(method, target.split('?', 1)[0], body)
+                except StudyServerError as e:
+                    status, content_type, data = self._json(e.status, {"error": e.message})
+                except Exception as e:
+                    print(f"Erro ao atender {method} {target}: {e!r}")
+                    status, content_type, data = self._json(500, {"error": "erro interno do servidor"})
+
+                keep_alive = length is not None and headers.get('connection', '').lower() != 'close'
+                head = (
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                )
+                writer.write(head.encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de estudos para vários estudantes')
+    parser.add_argument('--question-file', '-q', default='sample_questions.json', help='Arquivo JSON com perguntas e respostas')
+    parser.add_argument('--host', default='127.0.0.1', help='Endereço do servidor')
+    parser.add_argument('--port', '-p', type=int, default=8765, help='Porta do servidor')
+    parser.add_argument('--model', '-m', default='gemma3:latest', help='Modelo Ollama a ser usado')
+    parser.add_argument('--generation-strategy', choices=['combined', 'separate'], default='combined',
+                        help='Gerar reformulação e distratores em uma chamada (combined) ou em duas (separate)')
+    parser.add_argument('--llm-workers', type=int, default=4, help='Chamadas simultâneas ao modelo')
+    parser.add_argument('--variants', '-n', type=int, default=3, help='Variantes compartilhadas por pergunta')
+    parser.add_argument('--tts', action='store_true', help='Oferecer áudio das perguntas e opções')
+    parser.add_argument('--voice', '-v', default='pf_dora', help='Voz do Kokoro TTS')
+    parser.add_argument('--state-db', help='Arquivo do estado de repetição espaçada (padrão: ~/.local/share/agent/study_state.sqlite3)')
+    parser.add_argument('--no-persist', action='store_true', help='Não guardar o estado de repetição espaçada')
+    parser.add_argument('--preload', action='store_true', help='Carregar o modelo no Ollama antes de aceitar estudantes')
+    parser.add_argument('--keep-alive', default=os.environ.get('AGENT_OLLAMA_KEEP_ALIVE') or '-1',
+                        help='Tempo que o modelo fica carregado no Ollama sem pedidos (padrão: -1, enquanto o Ollama rodar)')
+    args = parser.parse_args()
+    configure_gateway(keep_alive=args.keep_alive)
+    if args.preload:
+        timing = warmup_model(args.model)
+        if timing is not None:
+            print(f"Modelo {args.model} carregado em {timing['load']:.2f} s")
+
+    with open(args.question_file, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    server = StudyServer(
+        questions,
+        state_store=None if args.no_persist else SM2StateStore(args.state_db),
+        host=args.host,
+        port=args.port,
+        model=args.model,
+        generation_strategy=args.generation_strategy,
+        llm_workers=args.llm_workers,
+        variants_per_card=args.variants,
+        tts=args.tts,
+        voice=args.voice
+    )
+
+    async def serve():
+        await server.start()
+        print(f"Servidor de estudos em {server.url} ({len(server.questions)} perguntas)")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
+
+
+if __name__ == "__main__":
+    main()
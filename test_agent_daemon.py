@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Testes do daemon residente (agent_daemon.py) e do cliente (agent_client.py)
+"""
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import agent_client
+from fake_ollama import FakeOllamaServer
+
+
+ROOT = Path(__file__).resolve().parent
+RESPONSE = {"thought": "Listar os arquivos", "function": {"function_name": "list_directory", "path": "."}}
+
+# Kokoro falso para os processos do daemon: registra o pid de quem carrega o pipeline
+FAKE_KOKORO = """
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class KPipeline:
+    def __init__(self, lang_code, repo_id=None):
+        with open(os.environ["FAKE_KOKORO_LOG"], "a") as log:
+            log.write(f"{os.getpid()}\\n")
+
+    def __call__(self, text, voice=None):
+        for _ in range(2):
+            yield SimpleNamespace(output=SimpleNamespace(audio=np.ones(240, dtype=np.float32)))
+"""
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """Daemon rodando em um socket temporário, com um Ollama e um Kokoro fakes"""
+    with FakeOllamaServer(lambda request: json.dumps(RESPONSE)) as server:
+        socket_path = str(tmp_path / "run" / "daemon.sock")
+        fakes = tmp_path / "fakes"
+        fakes.mkdir()
+        (fakes / "kokoro.py").write_text(FAKE_KOKORO)
+        env = dict(os.environ, OLLAMA_HOST=server.url, XDG_CACHE_HOME=str(tmp_path / "cache"),
+                   OLLAMA_MODELS=str(tmp_path / "models"), AGENT_DAEMON_SOCKET=socket_path,
+                   PYTHONPATH=os.pathsep.join([str(fakes), os.environ.get("PYTHONPATH", "")]),
+                   FAKE_KOKORO_LOG=str(tmp_path / "kokoro.log"))
+        # O daemon sobe com outro OLLAMA_HOST (sem nada ouvindo): vale o do cliente
+        process = subprocess.Popen(
+            [sys.executable, str(ROOT / "agent_daemon.py"), "serve"],
+            env=dict(env, OLLAMA_HOST="http://127.0.0.1:9"), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        deadline = time.time() + 30
+        while not (os.path.exists(socket_path) and os.path.exists(socket_path + ".tts")):
+            assert process.poll() is None, process.stdout.read()
+            assert time.time() < deadline, "o daemon não subiu"
+            time.sleep(0.05)
+        try:
+            yield server, env, socket_path
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+        assert not os.path.exists(socket_path)
+
+
+def client(env, *args, cwd=ROOT, stdin=None):
+    return subprocess.run(
+        [sys.executable, "-S", str(ROOT / "agent_client.py"), *args],
+        env=env, cwd=cwd, input=stdin, stdin=None if stdin is not None else subprocess.DEVNULL,
+        capture_output=True, text=True, timeout=60
+    )
+
+
+def test_runs_programs_in_daemon(daemon, tmp_path):
+    print("Testando a execução pelo daemon...")
+    server, env, socket_path = daemon
+
+    result = client(env, "agent", "--no-cache", "listar arquivos")
+    assert result.returncode == 0, result.stderr
+    assert "Comando gerado: ls -la ." in result.stdout
+    assert "listar arquivos" in server.requests[-1]["messages"][-1]["content"]
+
+    # Entrada padrão, diretório atual e código de saída vêm do cliente
+    result = client(env, "agent", "--no-cache", stdin="mostrar o conteúdo da pasta\n")
+    assert "mostrar o conteúdo da pasta" in server.requests[-1]["messages"][-1]["content"]
+
+    (tmp_path / "marcador.txt").write_text("x")
+    result = client(env, "agent", "--no-cache", "--execute", "listar", cwd=tmp_path)
+    assert "marcador.txt" in result.stdout
+
+    assert client(env, "agent", "--help").returncode == 0
+    result = client(env, "agent", "--temperature", "quente")
+    assert result.returncode == 2 and "usage:" in result.stderr
+
+    status = agent_client.control("status", socket_path)
+    assert status["served"] == 5 and status["waiting"] == 0
+
+
+def test_speech_comes_from_the_resident_tts_worker(daemon, tmp_path):
+    print("Testando a síntese pelo worker de TTS do daemon...")
+    server, env, socket_path = daemon
+
+    for _ in range(2):
+        result = client(env, "tts", "listar arquivos")
+        assert result.returncode == 0, result.stderr
+        assert "Reproduzindo resposta em áudio" in result.stdout
+
+    # O Kokoro foi carregado uma vez só, no worker, e não nos processos dos pedidos
+    status = agent_client.control("status", socket_path)
+    assert (tmp_path / "kokoro.log").read_text().split() == [str(status["tts"])]
+
+
+def test_stalled_client_does_not_block_others(daemon):
+    print("Testando um cliente parado no meio do cabeçalho...")
+    server, env, socket_path = daemon
+
+    # Um cliente que conecta e não manda nada, outro que manda metade do tamanho
+    silent = agent_client.connect(socket_path)
+    partial = agent_client.connect(socket_path)
+    partial.sendall(b"\x00\x00")
+    time.sleep(0.2)
+
+    started = time.perf_counter()
+    status = agent_client.control("status", socket_path)
+    assert time.perf_counter() - started < 1.0
+    assert status["waiting"] == 2
+
+    result = client(env, "agent", "--no-cache", "listar arquivos")
+    assert result.returncode == 0, result.stderr
+    assert time.perf_counter() - started < 5.0
+
+    # O cabeçalho que chega aos poucos ainda é atendido
+    data = json.dumps({"command": "status"}).encode('utf-8')
+    partial.sendall(struct.pack('>I', len(data))[2:] + data[:5])
+    time.sleep(0.1)
+    partial.sendall(data[5:])
+    partial.settimeout(5)
+    _, reply = agent_client.recv_frame(partial)
+    assert json.loads(reply)["waiting"] == 1
+    partial.close()
+
+    # Quem não manda nada é desconectado depois do prazo
+    silent.settimeout(10)
+    assert silent.recv(1) == b""
+    silent.close()
+
+
+def test_client_falls_back_without_daemon(tmp_path):
+    print("Testando o cliente sem o daemon...")
+
+    env = dict(os.environ, AGENT_DAEMON_SOCKET=str(tmp_path / "nenhum.sock"))
+    result = client(env, "agent", "--help")
+    assert result.returncode == 0 and "--no-cache" in result.stdout
+
+    result = client(env, "desconhecido")
+    assert result.returncode == 2
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_client_falls_back_without_daemon(Path(tempfile.mkdtemp()))
+    print("Testes concluídos!")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Testes do loop de várias etapas do agente (main.run_agent_loop)
+"""
+import json
+import time
+from types import SimpleNamespace
+
+import ollama
+
+import main
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import get_gateway
+
+
+def scripted(steps):
+    """Responde cada passo com o próximo item de `steps` (o passo é o número de resultados já enviados)"""
+    def responder(request):
+        done = sum(1 for msg in request["messages"] if msg["content"].startswith("Resultados das funções:"))
+        return json.dumps(steps[min(done, len(steps) - 1)])
+    return responder
+
+
+def test_plan_waves():
+    print("Testando o agrupamento das chamadas em ondas...")
+
+    read = SimpleNamespace(function_name="read_file")
+    ls = SimpleNamespace(function_name="list_directory")
+    run = SimpleNamespace(function_name="execute_command")
+    # Leituras vizinhas juntas; cada comando com efeito sozinho, na ordem dada
+    assert main.plan_waves([read, ls, read]) == [[0, 1, 2]]
+    assert main.plan_waves([read, run, ls, read, run, run]) == [[0], [1], [2, 3], [4], [5]]
+    assert main.plan_waves([None, read, None]) == [[1]]
+
+
+def test_results_go_back_and_reads_run_in_parallel(monkeypatch, tmp_path):
+    print("Testando os resultados de volta ao modelo e as leituras em paralelo...")
+
+    (tmp_path / "a.txt").write_text("conteúdo de a")
+    (tmp_path / "b.txt").write_text("conteúdo de b")
+    original_read = main.read_file
+
+    def slow_read(path):
+        time.sleep(0.2)
+        return original_read(path)
+
+    monkeypatch.setattr(main, 'read_file', slow_read)
+    steps = [
+        {"thought": "ler os dois arquivos e listar a pasta", "calls": [
+            {"function_name": "read_file", "path": str(tmp_path / "a.txt")},
+            {"function_name": "read_file", "path": str(tmp_path / "b.txt")},
+            {"function_name": "list_directory", "path": str(tmp_path)},
+            {"function_name": "apagar_tudo"}
+        ]},
+        {"thought": "ler de novo", "calls": {"function_name": "read_file", "path": "a.txt"}},
+        {"thought": "já sei", "calls": [], "answer": "Os arquivos falam de a e b."}
+    ]
+    with FakeOllamaServer(scripted(steps)) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        result = main.run_agent_loop("O que há nos arquivos?", allow_read=True, max_steps=5)
+
+    assert result["answer"] == "Os arquivos falam de a e b." and not result["budget_exhausted"]
+    assert len(server.requests) == 3 and len(result["steps"]) == 3
+
+    # "calls" que não é uma lista vira um erro para o modelo, sem rodar nada
+    second = result["steps"][1]["calls"]
+    assert len(second) == 1 and not second[0]["executed"] and "chamada inválida" in second[0]["result"]
+
+    # O modelo recebe a própria resposta e os resultados, na ordem das chamadas
+    messages = server.requests[1]["messages"]
+    assert messages[:2] == server.requests[0]["messages"]
+    assert json.loads(messages[2]["content"]) == steps[0]
+    feedback = messages[3]["content"]
+    assert feedback.index("conteúdo de a") < feedback.index("conteúdo de b") < feedback.index("a.txt\n", feedback.index("ls -la"))
+    assert "[4]" in feedback and "Erro: chamada inválida" in feedback
+
+    # As duas leituras lentas rodaram ao mesmo tempo
+    first = result["steps"][0]
+    assert [call["seconds"] >= 0.2 for call in first["calls"][:2]] == [True, True]
+    assert first["tools_seconds"] < 0.35
+    assert result["total_seconds"] >= first["model_seconds"] + first["tools_seconds"]
+
+
+def test_side_effects_need_execute(monkeypatch, tmp_path):
+    print("Testando as funções só com --execute ou, as leituras, com --allow-read...")
+
+    steps = [
+        {"thought": "criar e conferir", "calls": [
+            {"function_name": "execute_command", "command": f"touch {tmp_path / 'novo.txt'}"},
+            {"function_name": "list_directory", "path": str(tmp_path)}
+        ]},
+        {"thought": "pronto", "calls": [], "answer": "Feito."}
+    ]
+    with FakeOllamaServer(scripted(steps)) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+
+        # Sem autorização nada roda, nem a leitura da pasta
+        result = main.run_agent_loop("crie novo.txt")
+        calls = result["steps"][0]["calls"]
+        assert [call["executed"] for call in calls] == [False, False]
+        assert "--allow-read" in calls[1]["result"]
+        assert "Não executado" in server.requests[-1]["messages"][-1]["content"]
+
+        # --allow-read libera só a leitura
+        result = main.run_agent_loop("crie novo.txt", allow_read=True)
+        calls = result["steps"][0]["calls"]
+        assert [call["executed"] for call in calls] == [False, True]
+        assert not (tmp_path / "novo.txt").exists()
+
+        # Com execute, o comando roda antes da listagem, que já vê o arquivo
+        result = main.run_agent_loop("crie novo.txt", execute=True)
+        calls = result["steps"][0]["calls"]
+        assert all(call["executed"] for call in calls)
+        assert (tmp_path / "novo.txt").exists() and "novo.txt" in calls[1]["result"]
+
+
+def test_step_budget_forces_an_answer(monkeypatch):
+    print("Testando o limite de passos...")
+
+    step = {"thought": "mais uma olhada", "calls": [{"function_name": "list_directory", "path": "."}],
+            "answer": "Resposta no limite."}
+    with FakeOllamaServer(lambda request: json.dumps(step)) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        result = main.run_agent_loop("explore", max_steps=3)
+
+    # Nunca passa do limite; o último passo é pedido sem chamadas
+    assert len(server.requests) == 3 and len(result["steps"]) == 3
+    assert "calls" not in server.requests[-1]["format"]["properties"]
+    assert "Limite de passos atingido" in server.requests[-1]["messages"][-1]["content"]
+    assert result["answer"] == "Resposta no limite." and result["budget_exhausted"]
+    assert result["steps"][-1]["calls"] == []
+
+
+if __name__ == "__main__":
+    test_plan_waves()
+    print("Testes concluídos!")
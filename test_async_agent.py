@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Testes do núcleo assíncrono do agente (async_agent.py): respostas canceláveis
+"""
+import asyncio
+import contextlib
+import json
+import time
+
+from async_agent import INTERRUPTED_MARK, AsyncIA_Agent
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import get_gateway
+from speech_pipeline import AsyncSpeechPipeline
+from test_speech_pipeline import fake_synthesize
+from tts_response import NullAudioSink
+
+
+LONG_REPLY = "Esta é uma resposta muito longa, que o modelo demora a gerar. " * 20
+
+
+def responder(request):
+    """Resposta longa para a primeira pergunta e curta para as outras"""
+    question = request["messages"][-1]["content"]
+    text = LONG_REPLY if "longa" in question else f"Resposta curta para: {question}."
+    return json.dumps({"thought": "ok", "response": text})
+
+
+@contextlib.contextmanager
+def fake_ollama():
+    """Servidor fake como cliente assíncrono do gateway compartilhado"""
+    gateway = get_gateway()
+    previous = gateway.async_host
+    with FakeOllamaServer(responder, chunk_size=4, token_delay=0.01) as server:
+        gateway.async_host = server.url
+        try:
+            yield server
+        finally:
+            gateway.async_host = previous
+
+
+def make_agent(sinks):
+    agent = AsyncIA_Agent(context_tokens=0)
+    synthesize, _ = fake_synthesize(delay=0.01)
+
+    def speech_factory():
+        sinks.append(NullAudioSink())
+        return AsyncSpeechPipeline(sink=sinks[-1], synthesize=synthesize)
+
+    agent.speech_factory = speech_factory
+    return agent
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "a condição não aconteceu a tempo"
+        await asyncio.sleep(0.01)
+
+
+def test_new_message_cancels_generation_and_speech():
+    print("Testando o cancelamento da resposta em andamento por uma nova mensagem...")
+
+    sinks = []
+    with fake_ollama() as server:
+        agent = make_agent(sinks)
+
+        async def scenario():
+            first = await agent.submit("Conte uma história longa")
+            # A fala começa enquanto o modelo ainda gera
+            await wait_until(lambda: sinks and sinks[0].writes)
+            assert agent.busy and not first.done()
+
+            started = time.perf_counter()
+            second = await agent.submit("E agora?")
+            cancel_latency = time.perf_counter() - started
+            response = await second
+            await wait_until(lambda: server.aborted == 1)
+            return first, cancel_latency, response
+
+        first, cancel_latency, response = asyncio.run(scenario())
+
+    # A primeira resposta parou na hora (geração e fala), sem esperar o fim
+    assert first.cancelled() and cancel_latency < 0.1, f"cancelar levou {cancel_latency * 1000:.0f} ms"
+    assert sinks[0].aborted and not sinks[0].finished and sinks[1].finished
+    assert response == "Resposta curta para: E agora?."
+    assert agent.interrupted == 1 and get_gateway().metrics()["active"] == 0
+
+    # O trecho já gerado fica no histórico, marcado, antes da nova pergunta
+    context = agent.memory.get_context()
+    assert [msg["role"] for msg in context] == ["user", "assistant", "user", "assistant"]
+    partial = context[1]["content"]
+    assert partial.endswith(INTERRUPTED_MARK) and LONG_REPLY.startswith(partial[:-len(INTERRUPTED_MARK)])
+    assert len(partial) < len(LONG_REPLY)
+
+
+def test_conversation_loop_handles_ctrl_c():
+    print("Testando o Ctrl+C na conversa assíncrona...")
+
+    sinks = []
+    with fake_ollama() as server:
+        agent = make_agent(sinks)
+
+        async def typed_lines():
+            yield "Uma pergunta longa"
+            await wait_until(lambda: agent.busy and sinks and sinks[0].writes)
+            # Ctrl+C com uma resposta em andamento: só a resposta é interrompida
+            agent.interrupt()
+            await wait_until(lambda: not agent.busy)
+            yield "Uma pergunta rápida"
+            await wait_until(lambda: len(agent.memory.messages) == 4 and not agent.busy)
+            yield "sair"
+
+        asyncio.run(agent.conversation(lines=typed_lines()))
+        assert agent.interrupted == 1 and not agent.running
+        assert agent.memory.messages[-1].content == "Resposta curta para: Uma pergunta rápida."
+
+        # Ctrl+C sem resposta em andamento encerra a conversa
+        async def idle():
+            asyncio.get_running_loop().call_later(0.05, agent.interrupt)
+            await asyncio.Event().wait()
+            yield "nunca"
+
+        started = time.perf_counter()
+        asyncio.run(agent.conversation(lines=idle()))
+        assert time.perf_counter() - started < 1 and len(agent.memory.messages) == 4
+
+
+def test_sync_interface_outside_event_loop():
+    print("Testando a interface do IA_Agent (process_input) fora de um event loop...")
+
+    sinks = []
+    with fake_ollama():
+        agent = make_agent(sinks)
+        # Como no modo de um prompt: chamadas seguidas, cada uma em seu próprio event loop
+        assert agent.process_input("Primeira pergunta") == "Resposta curta para: Primeira pergunta."
+        assert agent.process_input("Segunda pergunta", text_only=True) == "Resposta curta para: Segunda pergunta."
+
+    assert len(sinks) == 1 and sinks[0].finished
+    assert [msg.role for msg in agent.memory.messages] == ["user", "assistant", "user", "assistant"]
+
+
+if __name__ == "__main__":
+    test_new_message_cancels_generation_and_speech()
+    test_conversation_loop_handles_ctrl_c()
+    test_sync_interface_outside_event_loop()
+    print("Testes concluídos!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Testes do baralho em colunas (NumPy)
+"""
+import random
+
+import numpy as np
+
+from columnar_deck import ColumnarDeck, StringTable
+from sm2_simulation import simulate_workload
+from study_partner import QuestionItem, SpacedRepetitionState
+
+
+def make_items(size):
+    return [{"question": f"Pergunta {i} — ç?", "answer": f"Resposta {i}"} for i in range(size)]
+
+
+def test_string_table():
+    print("Testando a tabela de strings...")
+
+    strings = ["", "Olá", "ação", "São Paulo"]
+    table = StringTable.from_strings(strings)
+    assert len(table) == 4
+    assert [table[i] for i in range(4)] == strings
+
+
+def test_vectorized_update_matches_model():
+    print("Testando o SM-2 vetorizado contra o modelo SpacedRepetitionState...")
+
+    size = 50
+    deck = ColumnarDeck.from_items(make_items(size))
+    states = [SpacedRepetitionState() for _ in range(size)]
+    rng = random.Random(7)
+    now = 1_700_000_000.0
+    for step in range(8):
+        rows = sorted(rng.sample(range(size), 20))
+        correct = [rng.random() < 0.7 for _ in rows]
+        deck.update(rows, [5 if c else 2 for c in correct], now=now + step)
+        for row, c in zip(rows, correct):
+            states[row].update(c)
+
+    for row, state in enumerate(states):
+        assert deck.repetitions[row] == state.repetition_count
+        assert np.isclose(deck.interval[row], state.difficulty)
+        assert np.isclose(deck.easiness[row], state.easiness_factor)
+
+
+def test_save_load_and_due(tmp_path):
+    print("Testando salvar, carregar e a lista de revisões...")
+
+    items = make_items(5)
+    deck = ColumnarDeck.from_items(items)
+    deck.update([1, 3], 5, now=1000.0)
+    path = str(tmp_path / "deck.npz")
+    deck.save(path)
+
+    loaded = ColumnarDeck.load(path)
+    assert [loaded.item(i) for i in range(5)] == items
+    assert list(loaded.due(now=1000.0)) == [0, 2, 4]
+    assert sorted(loaded.due(now=1000.0 + 2 * 86400)[3:]) == [1, 3]
+
+    # Mesmos card_id do modelo usado pelo StudySession
+    item = QuestionItem(**items[3])
+    assert loaded.row(item.card_id) == 3
+    assert loaded.question_items()[3] == item
+    assert set(loaded.question_states()) == {loaded.question_items()[1].card_id, item.card_id}
+    assert loaded.state(3).repetition_count == 1
+
+
+def test_apply_grades_batch():
+    print("Testando a aplicação de um vetor de notas com cartões repetidos...")
+
+    items = make_items(4)
+    deck = ColumnarDeck.from_items(items)
+    rows = deck.rows_for([QuestionItem(**items[i]).card_id for i in (2, 0, 2, 2)])
+    assert list(rows) == [2, 0, 2, 2]
+    deck.apply_grades(rows, [5, 2, 5, 1], now=1000.0)
+
+    # Notas do mesmo cartão aplicadas em ordem, como respostas sucessivas
+    expected = SpacedRepetitionState()
+    for correct in (True, True, False):
+        expected.update(correct)
+    assert deck.repetitions[2] == expected.repetition_count == 1
+    assert deck.repetitions[0] == 0 and deck.repetitions[1] == 0
+    assert np.isclose(deck.interval[2], 1.0)
+
+
+def test_workload_simulation():
+    print("Testando o simulador de carga de revisões...")
+
+    history = simulate_workload(learners=50, cards=100, days=30, new_per_day=10, seed=1)
+    assert list(history['new'][:10]) == [500] * 10 and history['new'][10:].sum() == 0
+    # Sem revisões no primeiro dia; depois elas vêm dos cartões já apresentados
+    assert history['reviews'][0] == 0 and history['reviews'][1:].sum() > 0
+    assert 0.5 < history['correct_rate'][5:].mean() < 1.0
+
+    # Mesma semente, mesmo resultado; o limite diário gera acúmulo
+    again = simulate_workload(learners=50, cards=100, days=30, new_per_day=10, seed=1)
+    assert np.array_equal(history['reviews'], again['reviews'])
+    capped = simulate_workload(learners=50, cards=100, days=30, new_per_day=10, max_reviews_per_day=5, seed=1)
+    assert capped['reviews'].max() <= 50 * 5 and capped['backlog'].max() > 0
+
+
+if __name__ == "__main__":
+    test_string_table()
+    test_vectorized_update_matches_model()
+    test_apply_grades_batch()
+    test_workload_simulation()
+    print("Testes concluídos!")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de respostas da geração de comandos
+"""
+import json
+import time
+
+import ollama
+
+import command_cache
+import main
+from command_cache import CommandCache
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import get_gateway
+
+
+RESPONSE = {"thought": "Listar os arquivos", "function": {"function_name": "list_directory", "path": "."}}
+
+
+def test_repeated_request_skips_model(monkeypatch, tmp_path):
+    print("Testando o pedido repetido servido do cache...")
+
+    monkeypatch.setattr(command_cache, '_digests', {})
+    monkeypatch.setenv('OLLAMA_MODELS', str(tmp_path / "models"))  # Sem manifesto: digest vem de /api/tags
+    with FakeOllamaServer(lambda request: json.dumps(RESPONSE), latency=0.05) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        cache = CommandCache(str(tmp_path / "commands.sqlite3"))
+
+        first = main.run_agent_interactive("listar arquivos no diretório atual", cache=cache)
+        started = time.perf_counter()
+        second = main.run_agent_interactive("listar arquivos no diretório atual", cache=cache)
+        elapsed = time.perf_counter() - started
+
+        assert len(server.requests) == 1
+        assert second["command"] == first["command"] == "ls -la ."
+        assert elapsed < 0.05
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+        # Outro pedido vai ao modelo; --no-cache também
+        main.run_agent_interactive("listar arquivos em /tmp", cache=cache)
+        main.run_agent_interactive("listar arquivos no diretório atual")
+        assert len(server.requests) == 3
+
+        # Atualizar o modelo (novo digest) invalida as respostas antigas
+        server.models['gemma3:latest'] = 'b' * 64
+        monkeypatch.setattr(command_cache, '_digests', {})
+        main.run_agent_interactive("listar arquivos no diretório atual", cache=cache)
+        assert len(server.requests) == 4
+
+    # O cache sobrevive à reabertura do arquivo
+    cache.close()
+    assert CommandCache(str(tmp_path / "commands.sqlite3")).stats()["entries"] == 3
+
+
+def test_ttl_and_lru_eviction():
+    print("Testando a validade e a remoção das respostas menos usadas...")
+
+    keys = [CommandCache.make_key("digest", [{"role": "user", "content": f"p{i}"}], {}) for i in range(3)]
+    cache = CommandCache(":memory:", max_entries=2)
+    cache.put(keys[0], "r0")
+    time.sleep(0.01)
+    cache.put(keys[1], "r1")
+    time.sleep(0.01)
+    assert cache.get(keys[0]) == "r0"  # p0 passa a ser a mais recente
+    time.sleep(0.01)
+    cache.put(keys[2], "r2")
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "r0" and cache.get(keys[2]) == "r2"
+
+    cache = CommandCache(":memory:", ttl=0.02)
+    cache.put(keys[0], "r0")
+    assert cache.get(keys[0]) == "r0"
+    time.sleep(0.03)
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_key_depends_on_schema():
+    print("Testando a chave com o hash do schema...")
+
+    messages = [{"role": "user", "content": "p"}]
+    assert CommandCache.make_key("d", messages, {"type": "object"}) != CommandCache.make_key("d", messages, {"type": "array"})
+    assert CommandCache.make_key("d", messages, {"a": 1, "b": 2}) == CommandCache.make_key("d", messages, {"b": 2, "a": 1})
+
+
+if __name__ == "__main__":
+    test_ttl_and_lru_eviction()
+    test_key_depends_on_schema()
+    print("Testes concluídos!")
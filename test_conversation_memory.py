@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Testes da memória da conversa com orçamento de tokens e resumo em segundo plano
+"""
+import json
+import threading
+import time
+
+import ollama
+
+import ia_agent
+from fake_ollama import FakeOllamaServer
+from ia_agent import ConversationMemory, estimate_tokens
+from ollama_gateway import get_gateway
+
+
+def test_estimate_tokens():
+    print("Testando a estimativa de tokens...")
+
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Olá, tudo bem?") == 5
+    assert estimate_tokens("inconstitucionalmente") == 4
+    # Cresce com o texto, como a contagem do modelo
+    assert estimate_tokens("palavra " * 100) == 200
+
+
+def test_token_budget_folds_old_messages_into_summary():
+    print("Testando o orçamento de tokens com resumo das mensagens antigas...")
+
+    calls = []
+
+    def summarizer(previous, messages):
+        calls.append((previous, [msg["content"] for msg in messages]))
+        return f"resumo {len(calls)}"
+
+    memory = ConversationMemory(max_tokens=200, summarizer=summarizer)
+    for i in range(60):
+        memory.add_message("user" if i % 2 == 0 else "assistant", f"mensagem número {i} " + "texto " * 20)
+        memory.wait_for_summary(timeout=5)
+        assert memory.context_tokens() <= 200
+
+    assert memory.summary == f"resumo {len(calls)}" and len(calls) > 5
+    # Cada resumo parte do anterior, e nenhuma mensagem se perde no caminho
+    assert calls[1][0] == "resumo 1"
+    folded = [content for _, contents in calls for content in contents]
+    assert len(folded) == memory.folded == 60 - len(memory.messages)
+    assert folded[0].startswith("mensagem número 0 ")
+
+    context = memory.get_context()
+    assert context[0] == {"role": "system", "content": f"Resumo da conversa anterior: resumo {len(calls)}"}
+    assert context[-1]["content"].startswith("mensagem número 59 ")
+    assert "mensagens resumidas" in memory.get_summary()
+
+
+def test_summary_runs_in_background():
+    print("Testando o resumo em segundo plano...")
+
+    release = threading.Event()
+
+    def slow_summarizer(previous, messages):
+        release.wait(5)
+        return "resumo lento"
+
+    memory = ConversationMemory(max_tokens=100, summarizer=slow_summarizer)
+    started = time.perf_counter()
+    for i in range(20):
+        memory.add_message("user", "conteúdo " * 10)
+    # Adicionar mensagens não espera o modelo, e o contexto continua no orçamento
+    assert time.perf_counter() - started < 0.5
+    assert memory.context_tokens() <= 100 and memory.summary == ""
+
+    release.set()
+    memory.wait_for_summary(timeout=5)
+    assert memory.summary == "resumo lento"
+
+    # Um resumo que termina depois de clear() não volta para a memória
+    release.clear()
+    for i in range(20):
+        memory.add_message("user", "conteúdo " * 10)
+    memory.clear()
+    release.set()
+    memory.wait_for_summary(timeout=5)
+    assert memory.summary == "" and memory.get_context() == []
+
+
+def test_summary_is_capped_without_summarizer():
+    print("Testando o resumo limitado sem resumidor...")
+
+    memory = ConversationMemory(max_tokens=200)
+    for i in range(30):
+        memory.add_message("user", f"fato {i} " + "detalhe " * 8)
+        memory.wait_for_summary(timeout=5)
+    # Cortado ao orçamento, o resumo guarda as mensagens resumidas mais recentes
+    assert estimate_tokens(memory.summary) <= memory.summary_budget
+    assert f"fato {memory.folded - 1} " in memory.summary and "fato 0 " not in memory.summary
+    assert memory.context_tokens() <= 200
+
+
+def test_prompt_size_stays_bounded_in_long_session(monkeypatch):
+    print("Testando o tamanho do prompt em uma conversa longa...")
+
+    def responder(request):
+        if request.get("format"):
+            return json.dumps({"thought": "ok", "response": "Resposta " + "longa " * 30})
+        return "Resumo: o usuário fez várias perguntas sobre o tempo."
+
+    with FakeOllamaServer(responder) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        memory = ConversationMemory(max_tokens=400, summarizer=ia_agent.llm_summarizer())
+        sizes = []
+        for turn in range(40):
+            ia_agent.run_agent_with_memory(f"Pergunta {turn}: " + "como está o tempo hoje? " * 5, memory)
+            memory.wait_for_summary(timeout=5)
+            prompt = [r for r in server.requests if r.get("format")][-1]["messages"]
+            sizes.append(sum(estimate_tokens(msg["content"]) for msg in prompt))
+
+    # O prompt para de crescer: o fim da conversa custa o mesmo que o meio
+    assert max(sizes[20:]) <= max(sizes[:20]) + 50
+    assert max(sizes) < 400 + 200  # Orçamento + instruções e pergunta atual
+    assert "Resumo: o usuário" in memory.summary
+
+
+def test_prompt_prefix_is_stable_between_turns(monkeypatch):
+    print("Testando o prefixo estável do prompt entre os turnos...")
+
+    reply = json.dumps({"thought": "ok", "response": "Resposta de tamanho fixo."})
+    with FakeOllamaServer(lambda request: reply) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        memory = ConversationMemory()
+        evaluated = []
+        for turn in range(6):
+            ia_agent.run_agent_with_memory(f"Pergunta número {turn}", memory)
+            evaluated.append(get_gateway().last_timing["prompt_tokens"])
+
+    # Cada prompt começa com o prompt inteiro do turno anterior, byte a byte
+    prompts = [request["messages"] for request in server.requests]
+    for previous, current in zip(prompts, prompts[1:]):
+        assert current[:len(previous)] == previous
+    # Instruções uma vez, no começo; cada entrada do usuário uma vez, sem sufixos
+    last = prompts[-1]
+    assert last[0] == {"role": "system", "content": ia_agent.AGENT_INSTRUCTIONS}
+    assert [msg["role"] for msg in last].count("system") == 1
+    assert [msg["content"] for msg in last if msg["role"] == "user"] == [f"Pergunta número {i}" for i in range(6)]
+    # Só o turno novo é avaliado: o custo do prompt não cresce com a conversa
+    assert evaluated[0] > evaluated[1] and max(evaluated[1:]) == min(evaluated[1:])
+
+
+if __name__ == "__main__":
+    test_estimate_tokens()
+    test_token_budget_folds_old_messages_into_summary()
+    test_summary_runs_in_background()
+    test_summary_is_capped_without_summarizer()
+    print("Testes concluídos!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Testes de regressão do tempo de importação (python -X importtime)
+
+Os pontos de entrada do agente não devem importar bibliotecas pesadas antes de
+precisarem delas: `main.py --help` e as respostas vindas do cache saem sem pydantic,
+ollama (httpx) ou numpy.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from command_cache import _manifest_path
+
+
+ROOT = Path(__file__).resolve().parent
+HEAVY = {"pydantic", "ollama", "httpx", "numpy"}
+
+
+def import_times(code, env=None):
+    """Roda `code` com -X importtime e retorna {módulo de topo: tempo acumulado em µs}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            top = name.strip().split(".")[0]
+            times[top] = max(times.get(top, 0), int(cumulative))
+    return times, result.stdout
+
+
+def test_entry_points_import_no_heavy_modules():
+    print("Testando as importações dos pontos de entrada...")
+
+    for module in ("main", "tts_response", "agent_functions", "command_cache"):
+        times, _ = import_times(f"import {module}")
+        assert not HEAVY & times.keys(), f"{module} importa {sorted(HEAVY & times.keys())}"
+        # Margem folgada: o objetivo é pegar uma importação pesada nova, não medir a máquina
+        assert times[module] < 150_000, f"{module} levou {times[module] / 1000:.0f} ms"
+
+
+def test_help_imports_no_heavy_modules():
+    print("Testando o --help sem bibliotecas pesadas...")
+
+    times, stdout = import_times("import sys, runpy; sys.argv = ['main.py', '--help']\n"
+                                 "try:\n    runpy.run_path('main.py', run_name='__main__')\nexcept SystemExit:\n    pass")
+    assert "--no-cache" in stdout
+    assert not HEAVY & times.keys()
+
+
+def test_cache_hit_imports_no_heavy_modules(tmp_path, monkeypatch):
+    print("Testando a resposta do cache sem bibliotecas pesadas...")
+
+    # Modelo "instalado" (manifesto no disco) e uma resposta já no cache
+    monkeypatch.setenv("OLLAMA_MODELS", str(tmp_path / "models"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    manifest = _manifest_path("gemma3:latest")
+    manifest.parent.mkdir(parents=True)
+    manifest.write_text('{"schemaVersion": 2}')
+
+    code = (
+        "import main, json\n"
+        "cache = main.CommandCache()\n"
+        "messages = main.build_messages('listar arquivos')\n"
+        "key = main.CommandCache.make_key(main.model_digest('gemma3:latest'), messages, main.FUNCTION_CALL_SCHEMA, {'temperature': 0})\n"
+        "cache.put(key, json.dumps({'thought': 'ok', 'function': {'function_name': 'list_directory'}}))\n"
+        "result = main.run_agent_interactive('listar arquivos', cache=cache)\n"
+        "print('COMANDO', result['command'])\n"
+    )
+    times, stdout = import_times(code, env=dict(os.environ))
+    assert "COMANDO ls -la ." in stdout
+    assert "(resposta do cache)" in stdout
+    assert not HEAVY & times.keys(), sorted(HEAVY & times.keys())
+
+
+if __name__ == "__main__":
+    test_entry_points_import_no_heavy_modules()
+    test_help_imports_no_heavy_modules()
+    print("Testes concluídos!")
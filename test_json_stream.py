@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Testes do streaming de respostas do modelo, usando um servidor Ollama fake local
+"""
+import json
+
+import ollama
+
+import ia_agent
+import main
+import study_partner
+from fake_ollama import FakeOllamaServer
+from json_stream import IncrementalJSONParser, stream_chat
+from ollama_gateway import get_gateway
+
+
+RESPONSE = {
+    "thought": "O usuário quer ver os arquivos: \"ls\"\n😀",
+    "function": {"function_name": "list_directory", "path": "/tmp/{x}"},
+    "count": 3,
+    "ok": True
+}
+
+
+def collect(text, piece_size):
+    """Alimenta o parser em pedaços e devolve (deltas por chave, valores completos em ordem)"""
+    deltas = {}
+    values = []
+    parser = IncrementalJSONParser(
+        on_string_delta=lambda key, delta: deltas.__setitem__(key, deltas.get(key, "") + delta),
+        on_value=lambda key, value: values.append((key, value))
+    )
+    for i in range(0, len(text), piece_size):
+        parser.feed(text[i:i + piece_size])
+    return parser, deltas, values
+
+
+def test_incremental_parser():
+    print("Testando o parser JSON incremental...")
+
+    text = json.dumps(RESPONSE, ensure_ascii=True, indent=1)
+    for piece_size in (1, 2, 3, 7, len(text)):
+        parser, deltas, values = collect(text, piece_size)
+        assert deltas == {"thought": RESPONSE["thought"]}
+        assert values == list(RESPONSE.items())
+        assert parser.result() == RESPONSE
+
+
+def test_function_closes_before_end():
+    print("Testando a detecção antecipada do objeto function...")
+
+    text = json.dumps(RESPONSE)
+    end_of_function = text.index('"}') + 2
+    _, _, values = collect(text[:end_of_function], 1)
+    assert values[-1] == ("function", RESPONSE["function"])
+
+
+def test_stream_chat_against_fake_server():
+    print("Testando stream_chat com o servidor Ollama fake...")
+
+    with FakeOllamaServer(lambda request: json.dumps(RESPONSE), chunk_size=3) as server:
+        client = ollama.Client(host=server.url)
+        deltas = []
+        content = stream_chat(
+            'gemma3:latest',
+            [{'role': 'user', 'content': 'oi'}],
+            format={"type": "object"},
+            client=client,
+            on_string_delta=lambda key, delta: deltas.append(delta)
+        )
+        assert json.loads(content) == RESPONSE
+        assert len(deltas) > 1 and "".join(deltas) == RESPONSE["thought"]
+        assert server.requests[0]["stream"] is True
+
+
+def test_run_agent_interactive_streaming(monkeypatch, capsys):
+    print("Testando run_agent_interactive em streaming...")
+
+    with FakeOllamaServer(lambda request: json.dumps(RESPONSE), chunk_size=2) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        result = main.run_agent_interactive("listar arquivos", stream=True)
+
+    output = capsys.readouterr().out
+    assert result["command"] == "ls -la /tmp/{x}"
+    assert output.count("Comando sugerido: ls -la /tmp/{x}") == 1
+    assert "Pensamento: " + RESPONSE["thought"] in output
+
+
+def test_run_agent_with_memory_streaming(monkeypatch):
+    print("Testando run_agent_with_memory em streaming...")
+
+    reply = {"thought": "saudação", "response": "Olá, João! Tudo bem?"}
+    with FakeOllamaServer(lambda request: json.dumps(reply), chunk_size=1) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        memory = ia_agent.ConversationMemory()
+        deltas = []
+        response = ia_agent.run_agent_with_memory("Oi", memory, on_response_delta=deltas.append)
+
+    assert response == reply["response"]
+    assert "".join(deltas) == reply["response"] and len(deltas) == len(reply["response"])
+
+
+def test_reformulate_question_streaming(monkeypatch):
+    print("Testando a reformulação de perguntas em streaming...")
+
+    reply = {"reformulated_question": "Qual cidade é a capital brasileira?"}
+    with FakeOllamaServer(lambda request: json.dumps(reply)) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        session = study_partner.StudySession(
+            questions=[study_partner.QuestionItem(question="Qual é a capital do Brasil?", answer="Brasília")]
+        )
+        deltas = []
+        question = session._reformulate_question("Qual é a capital do Brasil?", on_delta=deltas.append)
+
+    assert question == reply["reformulated_question"] == "".join(deltas)
+
+
+if __name__ == "__main__":
+    test_incremental_parser()
+    test_function_closes_before_end()
+    test_stream_chat_against_fake_server()
+    print("Testes concluídos!")
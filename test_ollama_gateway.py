@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Testes da camada compartilhada de acesso ao Ollama
+"""
+import asyncio
+import threading
+import time
+
+import ollama
+
+import ollama_gateway
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import BACKGROUND, INTERACTIVE, OllamaGateway, format_timing, parse_keep_alive, request_priority
+
+
+class SlowClient:
+    """Cliente falso: cada chamada demora `delay` e é registrada"""
+
+    def __init__(self, delay=0.05, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def chat(self, model, messages, format=None, options=None, stream=False):
+        with self._lock:
+            self.calls.append(messages[-1]['content'])
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError("Ollama fora do ar")
+            if stream:
+                return iter([{'message': {'content': 'o'}}, {'message': {'content': 'k'}}])
+            return {'message': {'content': messages[-1]['content'].upper()}}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+
+
+def test_identical_requests_are_coalesced():
+    print("Testando a junção de pedidos idênticos...")
+
+    client = SlowClient()
+    gateway = OllamaGateway(client)
+    results = []
+
+    def ask(text, options={'temperature': 0}):
+        return lambda: results.append(
+            gateway.chat(model='m', messages=[{'role': 'user', 'content': text}], options=options)['message']['content']
+        )
+
+    run_threads([ask("a")] * 5 + [ask("b")])
+    assert sorted(results) == ["A"] * 5 + ["B"]
+    assert sorted(client.calls) == ["a", "b"]
+    assert gateway.metrics()["coalesced"] == 4
+
+    # Depois de terminar, o mesmo pedido vai ao modelo de novo (não é um cache)
+    gateway.chat(model='m', messages=[{'role': 'user', 'content': "a"}], options={'temperature': 0})
+    assert client.calls.count("a") == 2
+
+    # Com seed fixo também se juntam; com amostragem, cada pedido é uma variante própria
+    client.calls.clear()
+    run_threads([ask("s", {'temperature': 0.8, 'seed': 7})] * 3)
+    run_threads([ask("v", {'temperature': 0.8})] * 3 + [ask("p", None)] * 2)
+    assert sorted(client.calls) == ["p", "p", "s", "v", "v", "v"]
+    assert gateway.metrics()["coalesced"] == 6
+
+
+def test_coalesced_interactive_request_raises_leader_priority():
+    print("Testando a prioridade de um pedido interativo juntado a um de segundo plano...")
+
+    client = SlowClient(delay=0.05)
+    gateway = OllamaGateway(client, max_concurrency=1)
+
+    def ask(text, priority):
+        def run():
+            with request_priority(priority):
+                gateway.chat(model='m', messages=[{'role': 'user', 'content': text}], options={'temperature': 0})
+        return run
+
+    # "variante" está na fila atrás de "outra"; o turno interativo igual a ela a adianta
+    run_threads([ask("primeiro", BACKGROUND), ask("outra", BACKGROUND),
+                 ask("variante", BACKGROUND), ask("variante", INTERACTIVE)])
+    assert client.calls == ["primeiro", "variante", "outra"]
+    assert gateway.metrics()["coalesced"] == 1
+
+
+def test_errors_reach_coalesced_callers():
+    print("Testando a propagação de erros para os pedidos juntados...")
+
+    gateway = OllamaGateway(SlowClient(fail=True))
+    errors = []
+
+    def ask():
+        try:
+            gateway.chat(model='m', messages=[{'role': 'user', 'content': "x"}], options={'temperature': 0})
+        except ConnectionError as e:
+            errors.append(e)
+
+    run_threads([ask] * 3)
+    assert len(errors) == 3
+
+
+def test_concurrency_limit_and_priority():
+    print("Testando o limite de concorrência e a prioridade dos pedidos interativos...")
+
+    client = SlowClient(delay=0.05)
+    gateway = OllamaGateway(client, max_concurrency=1)
+
+    def ask(text, priority):
+        def run():
+            with request_priority(priority):
+                gateway.chat(model='m', messages=[{'role': 'user', 'content': text}])
+        return run
+
+    # O primeiro ocupa a vaga; a pré-busca entra na fila antes do turno interativo, mas sai depois
+    run_threads([ask("primeiro", BACKGROUND), ask("pre-busca", BACKGROUND), ask("interativo", INTERACTIVE)])
+    assert client.calls == ["primeiro", "interativo", "pre-busca"]
+    assert client.max_active == 1
+
+    metrics = gateway.metrics()
+    assert metrics["max_queue_depth"] >= 2 and metrics["queue_depth"] == 0
+    assert metrics["wait"][BACKGROUND]["max"] > metrics["wait"][INTERACTIVE]["max"] > 0
+
+
+def test_stream_holds_a_slot():
+    print("Testando o streaming dentro do limite de concorrência...")
+
+    client = SlowClient(delay=0)
+    gateway = OllamaGateway(client, max_concurrency=1)
+    stream = gateway.chat(model='m', messages=[{'role': 'user', 'content': "s"}], stream=True)
+    assert next(stream)['message']['content'] == 'o'
+    assert gateway.metrics()["active"] == 1
+    assert [chunk['message']['content'] for chunk in stream] == ['k']
+    assert gateway.metrics()["active"] == 0
+
+
+def test_async_chat_shares_the_limit_and_cancels():
+    print("Testando o achat assíncrono no mesmo limite de concorrência...")
+
+    reply = "resposta em vários pedaços " * 20
+    with FakeOllamaServer(lambda request: reply, chunk_size=4, token_delay=0.01) as server:
+        gateway = OllamaGateway(max_concurrency=1, keep_alive='30m', async_host=server.url)
+
+        async def scenario():
+            response = await gateway.achat(model='gemma3:latest', messages=[{'role': 'user', 'content': "oi"}])
+            assert response['message']['content'] == reply and server.requests[-1]["keep_alive"] == '30m'
+
+            # Cancelada na fila (a vaga está com outra chamada), a tarefa devolve a vaga ao recebê-la
+            gateway._acquire(INTERACTIVE)
+            queued = asyncio.create_task(gateway.achat(model='gemma3:latest', messages=[]))
+            await asyncio.sleep(0.05)
+            queued.cancel()
+            await asyncio.wait({queued})
+            gateway._release()
+            await asyncio.sleep(0.05)
+            assert gateway.metrics()["active"] == 0
+
+            # Cancelada no meio do streaming, a conexão é fechada e o servidor para de gerar
+            async def consume():
+                async for chunk in await gateway.achat(
+                    model='gemma3:latest', messages=[{'role': 'user', 'content': "longa"}], stream=True
+                ):
+                    pass
+
+            streaming = asyncio.create_task(consume())
+            await asyncio.sleep(0.1)
+            assert gateway.metrics()["active"] == 1
+            streaming.cancel()
+            await asyncio.wait({streaming})
+            assert gateway.metrics()["active"] == 0
+            for _ in range(50):
+                if server.aborted:
+                    break
+                await asyncio.sleep(0.02)
+            assert server.aborted == 1
+
+        asyncio.run(scenario())
+
+        # Cada event loop tem o seu cliente: uma chamada em um loop novo também funciona
+        async def again():
+            return await gateway.achat(model='gemma3:latest', messages=[{'role': 'user', 'content': "de novo"}])
+
+        assert asyncio.run(again())['message']['content'] == reply
+
+
+def test_keep_alive_and_load_timings(monkeypatch):
+    print("Testando o keep_alive, o pré-carregamento e os tempos de carga e geração...")
+
+    monkeypatch.setattr(ollama_gateway, 'COLD_LOAD_THRESHOLD', 0.1)
+    with FakeOllamaServer(lambda request: '{"ok": true}', load_delay=0.2) as server:
+        gateway = OllamaGateway(ollama.Client(host=server.url), keep_alive='30m')
+
+        # O pré-carregamento paga o carregamento; a primeira pergunta já não
+        timing = gateway.preload('gemma3:latest')
+        assert timing["load"] >= 0.2 and timing["eval_tokens"] == 0
+        assert server.requests[-1]["messages"] == [] and server.requests[-1]["keep_alive"] == '30m'
+
+        gateway.chat(model='gemma3:latest', messages=[{'role': 'user', 'content': "oi"}])
+        assert gateway.last_timing["load"] < 0.1 and gateway.last_timing["eval_tokens"] > 0
+        assert server.requests[-1]["keep_alive"] == '30m'
+
+        # keep_alive 0 descarrega o modelo: a próxima chamada (em streaming) carrega de novo
+        gateway.chat(model='gemma3:latest', messages=[{'role': 'user', 'content': "tchau"}], keep_alive=0)
+        list(gateway.chat(model='gemma3:latest', messages=[{'role': 'user', 'content': "oi"}], stream=True))
+        assert gateway.last_timing["load"] >= 0.2
+        assert "carga 0.2" in format_timing(gateway.last_timing)
+
+        timings = gateway.metrics()["timings"]
+        assert timings["count"] == 4 and timings["cold_loads"] == 2
+        assert timings["load"]["max"] >= 0.2 and timings["eval"]["total"] >= 0
+
+    assert parse_keep_alive("-1") == -1 and parse_keep_alive("1h") == "1h" and parse_keep_alive("2.5") == 2.5
+
+    # Sem keep_alive configurado, nada é repassado (vale o padrão do Ollama)
+    client = SlowClient(delay=0)
+    OllamaGateway(client).chat(model='m', messages=[{'role': 'user', 'content': "x"}])
+    assert client.calls == ["x"]
+
+
+if __name__ == "__main__":
+    test_identical_requests_are_coalesced()
+    test_errors_reach_coalesced_callers()
+    test_coalesced_interactive_request_raises_leader_priority()
+    test_concurrency_limit_and_priority()
+    test_stream_holds_a_slot()
+    test_async_chat_shares_the_limit_and_cancels()
+    print("Testes concluídos!")
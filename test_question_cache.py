@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Testes do cache persistente de reformulações e distratores
+"""
+import time
+
+from question_cache import QuestionVariantCache
+from study_partner import QuestionItem, StudySession
+
+
+def test_variant_rotation_and_hit_rate(tmp_path):
+    print("Testando o rodízio de variantes...")
+
+    cache = QuestionVariantCache(str(tmp_path / "cache.sqlite3"), max_variants=2)
+    key = QuestionVariantCache.make_key("Pergunta?", "Resposta", "gemma3:latest", "1")
+    assert cache.next_variant(key) is None
+
+    cache.add_variant(key, "Variante A", ["a1", "a2", "a3"])
+    cache.add_variant(key, "Variante B", ["b1", "b2", "b3"])
+    cache.add_variant(key, "Variante C", ["c1", "c2", "c3"])  # substitui a mais antiga
+    assert cache.variant_count(key) == 2
+
+    served = [cache.next_variant(key)[0] for _ in range(4)]
+    assert sorted(set(served)) == ["Variante B", "Variante C"]
+    assert served[0] != served[1] and served[:2] == served[2:]
+    assert cache.stats()["hit_rate"] == 4 / 5
+
+    # O cache sobrevive à reabertura do arquivo
+    cache.close()
+    reopened = QuestionVariantCache(str(tmp_path / "cache.sqlite3"), max_variants=2)
+    assert reopened.variant_count(key) == 2
+
+
+def test_lru_eviction():
+    print("Testando a remoção das perguntas menos usadas...")
+
+    cache = QuestionVariantCache(":memory:", max_questions=2)
+    keys = [QuestionVariantCache.make_key(f"P{i}", "R", "m", "1") for i in range(3)]
+    cache.add_variant(keys[0], "V0", ["x"])
+    time.sleep(0.01)
+    cache.add_variant(keys[1], "V1", ["x"])
+    time.sleep(0.01)
+    cache.next_variant(keys[0])  # P0 passa a ser a mais recente
+    time.sleep(0.01)
+    cache.add_variant(keys[2], "V2", ["x"])
+
+    assert cache.variant_count(keys[1]) == 0
+    assert cache.variant_count(keys[0]) == 1 and cache.variant_count(keys[2]) == 1
+    assert cache.stats()["questions"] == 2
+
+
+def test_session_uses_cache_without_model(monkeypatch):
+    print("Testando a sessão servindo perguntas do cache...")
+
+    calls = []
+
+    def fake_material(self, question_item, on_delta=None):
+        calls.append(question_item.question)
+        return f"Variante {len(calls)} de {question_item.question}", ["e1", "e2", "e3"]
+
+    monkeypatch.setattr(StudySession, '_generate_question_material', fake_material)
+    cache = QuestionVariantCache(":memory:", max_variants=3)
+    session = StudySession(questions=[QuestionItem(question="Capital do Brasil?", answer="Brasília")])
+    session.use_variant_cache(cache)
+
+    session.get_next_question()
+    deadline = time.time() + 2
+    key = session._variant_key(session.questions[0])
+    while cache.variant_count(key) < 3 and time.time() < deadline:
+        session.get_next_question()
+        time.sleep(0.01)
+
+    # Preenchido em segundo plano até o limite; depois disso nenhuma chamada nova ao modelo
+    assert cache.variant_count(key) == 3
+    time.sleep(0.05)
+    calls_before = len(calls)
+    questions = {session.get_next_question().question for _ in range(6)}
+    assert len(calls) == calls_before
+    assert len(questions) == 3
+    session.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_variant_rotation_and_hit_rate(Path(tmp))
+    test_lru_eviction()
+    print("Testes concluídos!")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Testes da pré-geração offline de questionários (pacotes .pack)
+"""
+import itertools
+import json
+import time
+
+import numpy as np
+import ollama
+
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import get_gateway
+from pregenerate_questionnaire import pregenerate
+from question_pack import QuestionPack
+from study_partner import StudyPartner, StudySession, flatten_questionnaire
+from test_tts import install_fake_kokoro
+
+
+QUESTIONNAIRE = {
+    "Geografia": [
+        {"question": "Capital do Brasil?", "answer": "Brasília"},
+        {"question": "Maior oceano?", "answer": "Pacífico"},
+    ],
+    "História": [
+        {"question": "Ano da independência do Brasil?", "answer": "1822"},
+    ],
+}
+
+
+def install_fake_material(monkeypatch, fail_on=None):
+    """Substitui a geração de variantes por uma versão local e retorna as chamadas feitas"""
+    calls = []
+
+    def fake_material(self, question_item, on_question_delta=None):
+        calls.append(question_item.question)
+        if question_item.question == fail_on:
+            return question_item.question, [f"Resposta incorreta {i}" for i in range(1, 4)]
+        return f"Variante {len(calls)}: {question_item.question}", ["e1", "e2", "e3"]
+
+    monkeypatch.setattr(StudySession, '_generate_material', fake_material)
+    return calls
+
+
+def test_pregenerate_and_resume(tmp_path, monkeypatch):
+    print("Testando a pré-geração e a retomada do pacote...")
+
+    install_fake_kokoro(monkeypatch)
+    items = flatten_questionnaire(QUESTIONNAIRE)
+    assert [item['category'] for item in items] == ["Geografia", "Geografia", "História"]
+
+    output = str(tmp_path / "estudo.pack")
+    calls = install_fake_material(monkeypatch, fail_on="Maior oceano?")
+    stats = pregenerate(items, output, variants=2, workers=3, verbose=False)
+    assert stats == {**stats, "variants": 4, "audio": 4, "failed": 2}
+    assert len(calls) == 6
+
+    # A segunda execução só gera o que faltou
+    calls = install_fake_material(monkeypatch)
+    stats = pregenerate(items, output, variants=2, workers=3, verbose=False)
+    assert stats["variants"] == 2 and stats["audio"] == 2 and stats["failed"] == 0
+    assert calls == ["Maior oceano?", "Maior oceano?"]
+
+    pack = QuestionPack(output, readonly=True)
+    assert pack.items() == items
+    assert pack.meta()["variants"] == 2
+    key = QuestionPack.item_key("Capital do Brasil?", "Brasília")
+    audio, sample_rate = pack.audio(key, 0)
+    assert sample_rate == 24000 and np.allclose(audio, 1.0, atol=1e-4)
+
+
+def test_pregenerated_variants_are_distinct(tmp_path, monkeypatch):
+    print("Testando variantes diferentes para a mesma pergunta...")
+
+    install_fake_kokoro(monkeypatch)
+    counter = itertools.count(1)
+
+    def responder(request):
+        time.sleep(0.05)  # As chamadas da mesma pergunta ficam em andamento ao mesmo tempo
+        return json.dumps({"reformulated_question": f"Variante {next(counter)}", "wrong_answers": ["e1", "e2", "e3"]})
+
+    items = flatten_questionnaire({"Geografia": [{"question": "Capital do Brasil?", "answer": "Brasília"}]})
+    output = str(tmp_path / "estudo.pack")
+    with FakeOllamaServer(responder) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        pregenerate(items, output, variants=3, workers=4, verbose=False)
+
+    # Pedidos com amostragem não são juntados: cada variante é uma chamada ao modelo
+    assert len(server.requests) == 3
+    key = QuestionPack.item_key("Capital do Brasil?", "Brasília")
+    questions = [question for _, question, _ in QuestionPack(output, readonly=True).variants(key)]
+    assert len(set(questions)) == 3
+
+
+def test_session_served_from_pack(tmp_path, monkeypatch):
+    print("Testando a sessão servida pelo pacote, sem chamar o modelo...")
+
+    install_fake_kokoro(monkeypatch)
+    output = str(tmp_path / "estudo.pack")
+    install_fake_material(monkeypatch)
+    pregenerate(flatten_questionnaire(QUESTIONNAIRE), output, variants=2, verbose=False)
+
+    calls = install_fake_material(monkeypatch)
+    partner = StudyPartner(prefetch=False)
+    partner.load_questionnaire(pack_path=output)
+    session = partner.session
+    assert len(session.questions) == 3
+
+    served = []
+    for _ in range(6):
+        question = session.get_next_question()
+        served.append(question.question)
+        assert question.question.startswith("Variante")
+        assert session.current_extras['question_audio'][1] == 24000
+        session.check_answer(question.correct_answer)
+    assert calls == []
+    # Variantes da mesma pergunta entregues em rodízio
+    for original in ("Capital do Brasil?", "Maior oceano?", "Ano da independência do Brasil?"):
+        variants = [text for text in served if text.endswith(original)]
+        assert len(set(variants)) == min(len(variants), 2)
+
+
+if __name__ == "__main__":
+    print("Execute com: python -m pytest test_question_pack.py")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Testes do cache semântico de pedidos
+"""
+import json
+
+import numpy as np
+import ollama
+
+import main
+from command_cache import CommandCache
+from fake_ollama import FakeOllamaServer, hash_embedding
+from ollama_gateway import get_gateway
+from semantic_cache import OllamaEmbedder, SemanticCache, VectorIndex
+
+
+RESPONSE = {"thought": "Ver a memória", "function": {"function_name": "execute_command", "command": "free", "arguments": ["-h"]}}
+
+
+def fake_embedder(texts):
+    return np.array([hash_embedding(text) for text in texts], dtype=np.float32)
+
+
+def test_similar_prompt_reuses_command(monkeypatch, tmp_path):
+    print("Testando o reaproveitamento do comando de um pedido parecido...")
+
+    with FakeOllamaServer(lambda request: json.dumps(RESPONSE)) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        cache = SemanticCache(str(tmp_path / "semantic.sqlite3"), embedder=OllamaEmbedder(), threshold=0.8)
+
+        first = main.run_agent_interactive("mostrar uso de memória", semantic_cache=cache)
+        second = main.run_agent_interactive("mostrar o uso de memória", semantic_cache=cache)
+        chats = [request for request in server.requests if request["path"] == "/api/chat"]
+        assert len(chats) == 1
+        assert second["command"] == first["command"] == "free -h"
+        assert cache.stats()["hits"] == 1
+
+        # O comando reaproveitado não vira entrada do cache exato do pedido novo, e com
+        # --execute não roda sem confirmação (aqui a entrada não é um terminal)
+        exact = CommandCache(str(tmp_path / "commands.sqlite3"))
+        monkeypatch.setattr(main, 'model_digest', lambda model: "digest")
+        monkeypatch.setattr(main.sys.stdin, 'isatty', lambda: False, raising=False)
+        ran = []
+        monkeypatch.setattr(main, 'run_function', lambda func: ran.append(func) or "executado")
+        reused = main.run_agent_interactive("mostrar o uso de memória", execute=True, cache=exact, semantic_cache=cache)
+        assert reused["command"] == "free -h" and ran == []
+        assert exact.stats()["entries"] == 0
+
+        # Um pedido diferente vai ao modelo
+        main.run_agent_interactive("abrir o navegador firefox", semantic_cache=cache)
+        assert len([request for request in server.requests if request["path"] == "/api/chat"]) == 2
+        assert ran == []
+
+        # Outro modelo de geração não reaproveita as respostas do primeiro
+        assert cache.lookup("mostrar uso de memória", "llama3:latest") is None
+
+    # Os pedidos sobrevivem à reabertura do arquivo
+    cache.close()
+    reopened = SemanticCache(str(tmp_path / "semantic.sqlite3"), embedder=fake_embedder, embedding_model="nomic-embed-text")
+    assert reopened.stats()["entries"] == 2
+    assert reopened.lookup("mostrar uso de memória", "gemma3:latest")[2] == "mostrar uso de memória"
+
+
+def test_ivf_index_matches_exact_search():
+    print("Testando o índice IVF contra a busca exata...")
+
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(50, 32))
+    vectors = centers[rng.integers(0, 50, 5000)] + 0.1 * rng.normal(size=(5000, 32))
+    exact = VectorIndex(32, train_size=10**9)
+    ivf = VectorIndex(32, train_size=1000)
+    exact.add(vectors[:3000])
+    ivf.add(vectors[:3000])
+    ivf.add(vectors[3000:])  # depois do treino, os novos vão para as listas existentes
+    exact.add(vectors[3000:])
+    assert exact.centroids is None and ivf.centroids is not None and len(ivf) == 5000
+
+    queries = vectors[rng.integers(0, 5000, 200)] + 0.05 * rng.normal(size=(200, 32))
+    agree = sum(exact.search(q)[0][0] == ivf.search(q)[0][0] for q in queries)
+    assert agree >= 190
+    ids, scores = ivf.search(vectors[42], k=3)
+    assert ids[0] == 42 and scores[0] > 0.999 and list(scores) == sorted(scores, reverse=True)
+
+
+def test_ivf_lists_are_persisted(tmp_path):
+    print("Testando a gravação do índice IVF...")
+
+    path = str(tmp_path / "semantic.sqlite3")
+    cache = SemanticCache(path, embedder=fake_embedder, embedding_model="hash", train_size=64)
+    for i in range(100):
+        cache.add(f"pedido número {i} com palavras {i * 7} e {i * 13}", json.dumps({"i": i}), "m")
+    assert cache.stats()["ivf"]
+    cache.close()
+
+    reopened = SemanticCache(path, embedder=fake_embedder, embedding_model="hash", train_size=64)
+    assert reopened.stats()["ivf"] and reopened.stats()["entries"] == 100
+    content, score, _ = reopened.lookup("pedido número 10 com palavras 70 e 130", "m")
+    assert json.loads(content) == {"i": 10} and score > 0.999
+
+    # Trocar o modelo de embeddings descarta os vetores antigos
+    assert SemanticCache(path, embedder=fake_embedder, embedding_model="outro").stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    test_ivf_index_matches_exact_search()
+    print("Testes concluídos!")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Testes das sessões de conversa gravadas em disco
+"""
+import threading
+import time
+
+from ia_agent import ConversationMemory
+from session_store import SessionStore
+
+
+def test_append_list_and_history(tmp_path):
+    print("Testando a gravação e a listagem das sessões...")
+
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    assert store.append("trabalho", "user", "Oi", 1.0, 1) == 1
+    assert store.append("trabalho", "assistant", "Olá!", 2.0, 2) == 2
+    store.append("casa", "user", "Receita de bolo?", 3.0, 4)
+
+    sessions = store.list_sessions()
+    assert [s["name"] for s in sessions] == ["casa", "trabalho"]
+    assert sessions[1]["messages"] == 2 and sessions[1]["preview"] == "Oi"
+
+    assert [m["content"] for m in store.iter_tail("trabalho")] == ["Olá!", "Oi"]
+    assert [m["seq"] for m in store.history("trabalho", before=2)] == [1]
+
+    store.set_summary("trabalho", "cumprimentos", 1)
+    store.set_summary("trabalho", "antigo", 0)  # Um resumo mais velho não sobrescreve o atual
+    assert store.get("trabalho")["summary"] == "cumprimentos"
+
+    store.clear("trabalho")
+    assert store.get("trabalho")["messages"] == 0 and list(store.iter_tail("trabalho")) == []
+    assert store.append("trabalho", "user", "De novo", 4.0, 2) == 1
+    assert store.delete("casa") and not store.delete("casa")
+    store.close()
+
+    # Tudo continua lá ao reabrir o arquivo
+    reopened = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    assert [s["name"] for s in reopened.list_sessions()] == ["trabalho"]
+
+
+def test_memory_is_written_per_message_and_resumed(tmp_path):
+    print("Testando a memória gravada a cada mensagem e retomada...")
+
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    summarizer = lambda previous, messages: f"{previous} +{len(messages)}".strip()
+    memory = ConversationMemory(max_tokens=150, summarizer=summarizer, store=store, session="s")
+    for i in range(30):
+        memory.add_message("user" if i % 2 == 0 else "assistant", f"mensagem {i} " + "palavra " * 10)
+        assert store.get("s")["messages"] == i + 1
+    memory.wait_for_summary(timeout=5)
+
+    resumed = ConversationMemory(max_tokens=150, summarizer=summarizer, store=store, session="s")
+    assert resumed.load() == len(memory.messages)
+    assert resumed.get_context() == memory.get_context()
+    assert resumed.summary == memory.summary and resumed.folded == memory.folded
+
+    # A conversa continua na mesma sessão
+    resumed.add_message("user", "continuando")
+    assert store.get("s")["messages"] == 31
+    assert next(store.iter_tail("s"))["content"] == "continuando"
+
+    # Sem orçamento de tokens, retoma as últimas max_messages mensagens
+    recent = ConversationMemory(max_messages=5, store=store, session="s")
+    assert recent.load() == 5
+    assert recent.get_context()[-1]["content"] == "continuando"
+
+
+def test_resume_summarizes_messages_left_unsummarized(tmp_path):
+    print("Testando a retomada com resumo pendente...")
+
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    # O programa "termina" antes do resumo ficar pronto
+    never = threading.Event()
+    memory = ConversationMemory(max_tokens=100, summarizer=lambda p, m: never.wait(10) and "", store=store, session="s")
+    for i in range(12):
+        memory.add_message("user", f"fato {i} " + "detalhe " * 8)
+    assert store.get("s")["summary_upto"] == 0
+
+    resumed = ConversationMemory(max_tokens=100, summarizer=lambda p, m: f"resumo de {len(m)}", store=store, session="s")
+    resumed.load()
+    resumed.wait_for_summary(timeout=5)
+    never.set()
+    assert resumed.summary.startswith("resumo de ")
+    assert store.get("s")["summary_upto"] == 12 - len(resumed.messages)
+    assert resumed.context_tokens() <= 100
+
+
+def test_resume_large_session_reads_only_the_tail(tmp_path):
+    print("Testando a retomada de uma sessão longa...")
+
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    with store._lock:
+        store._conn.executemany(
+            "INSERT INTO messages VALUES ('longa', ?, ?, ?, ?, ?)",
+            [(i, "user" if i % 2 else "assistant", f"mensagem {i} " + "texto " * 30, float(i), 33) for i in range(1, 20001)]
+        )
+        store._conn.execute(
+            "INSERT INTO sessions VALUES ('longa', 0, 0, 20000, 'resumo da conversa longa', 19950, '')"
+        )
+        store._conn.commit()
+
+    started = time.perf_counter()
+    memory = ConversationMemory(max_tokens=1500, store=store, session="longa")
+    loaded = memory.load()
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.05, f"retomar levou {elapsed * 1000:.1f} ms"
+    assert loaded == memory.message_budget // 33
+    assert memory.summary == "resumo da conversa longa"
+    assert memory.messages[-1].content.startswith("mensagem 20000 ")
+
+    started = time.perf_counter()
+    sessions = store.list_sessions()
+    assert time.perf_counter() - started < 0.01 and sessions[0]["messages"] == 20000
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_append_list_and_history(Path(tempfile.mkdtemp()))
+    test_memory_is_written_per_message_and_resumed(Path(tempfile.mkdtemp()))
+    test_resume_summarizes_messages_left_unsummarized(Path(tempfile.mkdtemp()))
+    test_resume_large_session_reads_only_the_tail(Path(tempfile.mkdtemp()))
+    print("Testes concluídos!")
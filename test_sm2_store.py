@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Testes do armazenamento persistente do estado SM-2
+"""
+import time
+
+from sm2_store import SM2StateStore
+from study_partner import QuestionItem, SpacedRepetitionState, StudySession
+from test_study_partner import install_fake_generation
+
+
+def test_state_roundtrip(tmp_path):
+    print("Testando a gravação e leitura do estado SM-2...")
+
+    path = str(tmp_path / "state.sqlite3")
+    store = SM2StateStore(path)
+    state = SpacedRepetitionState()
+    state.update(True)
+    state.update(True)
+    state.update(False)
+    store.save("Capital do Brasil?", state)
+    store.close()
+
+    reopened = SM2StateStore(path)
+    loaded = reopened.get("Capital do Brasil?")
+    assert loaded == state
+    assert reopened.get("Nunca respondida?") is None
+    assert reopened.load(["Capital do Brasil?", "Nunca respondida?"]) == {"Capital do Brasil?": state}
+
+
+def test_schedule_survives_restart(tmp_path, monkeypatch):
+    print("Testando a retomada do agendamento em uma nova sessão...")
+
+    install_fake_generation(monkeypatch)
+    path = str(tmp_path / "state.sqlite3")
+    questions = [QuestionItem(question=f"Pergunta {i}?", answer=f"Resposta {i}") for i in range(3)]
+
+    store = SM2StateStore(path)
+    session = StudySession(questions=questions, generation_strategy="separate")
+    session.use_state_store(store)
+    answered = set()
+    for _ in range(3):
+        question = session.get_next_question()
+        answered.add(question.correct_answer)
+        session.check_answer(question.correct_answer)
+    # Uma gravação por resposta
+    assert store.writes == 3
+    store.close()
+
+    restarted = StudySession(questions=questions, generation_strategy="separate")
+    restarted.use_state_store(SM2StateStore(path))
+    restarted.get_next_question()
+    # Só o cartão escolhido teve o estado carregado; os outros são lidos quando consultados
+    assert len(restarted.question_states) == 1
+    for item in questions:
+        state = restarted.state_of(item.card_id) or SpacedRepetitionState()
+        if item.answer in answered:
+            assert state.repetition_count == 1 and state.next_review is not None
+        else:
+            assert state.repetition_count == 0
+
+
+def test_large_deck_load_and_write(tmp_path):
+    print("Testando o armazenamento com 100 mil cartões...")
+
+    store = SM2StateStore(str(tmp_path / "state.sqlite3"))
+    state = SpacedRepetitionState()
+    state.update(True)
+    keys = [f"Cartão {i}" for i in range(100_000)]
+    store.save_many({key: state for key in keys})
+
+    started = time.perf_counter()
+    loaded = store.load(keys)
+    load_time = time.perf_counter() - started
+    assert len(loaded) == 100_000
+
+    started = time.perf_counter()
+    schedule = store.schedule(keys)
+    schedule_time = time.perf_counter() - started
+    assert len(schedule) == 100_000 and schedule[keys[0]] is not None
+
+    started = time.perf_counter()
+    for key in keys[:200]:
+        store.save(key, state)
+    write_time = (time.perf_counter() - started) / 200
+    print(f"Carga: {load_time:.2f} s (agenda: {schedule_time:.2f} s) | gravação: {write_time * 1000:.2f} ms por resposta")
+    assert load_time < 10 and schedule_time < load_time and write_time < 0.05
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_state_roundtrip(Path(tmp))
+        test_large_deck_load_and_write(Path(tmp))
+    print("Testes concluídos!")
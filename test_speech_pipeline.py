@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Testes do pipeline de fala (LLM -> frases -> síntese -> reprodução), sem dispositivo de áudio
+"""
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import ollama
+
+import ia_agent
+from fake_ollama import FakeOllamaServer
+from ollama_gateway import get_gateway
+from speech_pipeline import AsyncSpeechPipeline, SentenceSplitter, SpeechPipeline
+from test_tts import install_fake_sounddevice
+from tts_response import NullAudioSink, SoundDeviceSink
+
+
+def fake_synthesize(delay=0.0, segments=1):
+    """Síntese falsa: um chunk por segmento, registrando as frases recebidas"""
+    received = []
+
+    def synthesize(text):
+        received.append(text)
+        for _ in range(segments):
+            time.sleep(delay)
+            yield np.zeros(len(text), dtype=np.float32)
+
+    return synthesize, received
+
+
+def test_sentence_splitter():
+    print("Testando a divisão em frases...")
+
+    splitter = SentenceSplitter()
+    text = "Olá! Tudo bem com você? O valor é 3.5 hoje.\nSegunda linha sem ponto"
+    sentences = []
+    for ch in text:
+        sentences.extend(splitter.feed(ch))
+    sentences.extend(splitter.flush())
+
+    # "Olá!" é curta demais e é unida à frase seguinte; "3.5" não é fim de frase
+    assert sentences == [
+        "Olá! Tudo bem com você?",
+        "O valor é 3.5 hoje.",
+        "Segunda linha sem ponto",
+    ]
+
+
+def test_speech_starts_before_text_ends():
+    print("Testando a sobreposição entre geração e fala...")
+
+    synthesize, received = fake_synthesize()
+    sink = NullAudioSink()
+    speech = SpeechPipeline(sink=sink, synthesize=synthesize)
+
+    speech.feed("Primeira frase completa. Segunda fr")
+    deadline = time.time() + 2
+    while not sink.writes and time.time() < deadline:
+        time.sleep(0.01)
+    # A primeira frase já está tocando enquanto a resposta ainda não terminou
+    assert sink.writes and received == ["Primeira frase completa."]
+
+    speech.feed("ase vem depois.")
+    speech.finish()
+    assert speech.wait(timeout=2)
+    assert received == ["Primeira frase completa.", "Segunda frase vem depois."]
+    assert sink.finished and not sink.aborted
+    assert "time_to_first_audio" in speech.metrics
+
+
+def test_speech_cancel():
+    print("Testando o cancelamento da fala...")
+
+    synthesize, received = fake_synthesize(delay=0.05, segments=20)
+    sink = NullAudioSink()
+    speech = SpeechPipeline(sink=sink, synthesize=synthesize, max_audio_chunks=1)
+    speech.feed("Uma frase bem longa para falar. Outra frase que não deve ser falada. ")
+    speech.finish()
+    time.sleep(0.12)
+
+    started = time.time()
+    speech.cancel()
+    assert speech.wait(timeout=1)
+    assert time.time() - started < 0.5
+    assert sink.aborted and len(sink.writes) < 20
+    assert len(received) == 1
+
+
+def test_async_speech_cancel():
+    print("Testando o cancelamento da fala em asyncio...")
+
+    synthesize, received = fake_synthesize(delay=0.05, segments=20)
+    sink = NullAudioSink()
+
+    async def scenario():
+        speech = AsyncSpeechPipeline(sink=sink, synthesize=synthesize, max_audio_chunks=1)
+        speech.feed("Uma frase bem longa para falar. Outra frase que não deve ser falada. ")
+        speech.finish()
+        await asyncio.sleep(0.12)
+        assert sink.writes and speech.active
+
+        started = time.perf_counter()
+        speech.cancel()
+        await speech.wait()
+        elapsed = time.perf_counter() - started
+        writes = len(sink.writes)
+        await asyncio.sleep(0.2)
+        return elapsed, writes
+
+    elapsed, writes = asyncio.run(scenario())
+    # Não espera nem o segmento em síntese: a reprodução para na hora
+    assert elapsed < 0.02 and sink.aborted and not sink.finished
+    assert len(sink.writes) == writes < 20 and received == ["Uma frase bem longa para falar."]
+
+    # Sem cancelamento, todas as frases são faladas e o dispositivo termina normalmente
+    synthesize, received = fake_synthesize()
+    sink = NullAudioSink()
+
+    async def complete():
+        speech = AsyncSpeechPipeline(sink=sink, synthesize=synthesize)
+        for piece in ("Primeira frase completa. Segunda fr", "ase vem depois."):
+            speech.feed(piece)
+        speech.finish()
+        await speech.wait()
+
+    asyncio.run(complete())
+    assert received == ["Primeira frase completa.", "Segunda frase vem depois."] and sink.finished
+
+
+def test_async_speech_cancel_with_full_audio_queue(monkeypatch):
+    print("Testando o cancelamento com a fila de áudio cheia...")
+
+    import tts_response
+    from test_tts import install_fake_kokoro
+
+    install_fake_kokoro(monkeypatch, segments=20)
+    entry = tts_response.get_kokoro_pipeline_entry()
+    closed = []
+
+    def synthesize(text):
+        try:
+            yield from tts_response.iter_kokoro_audio(text)
+        finally:
+            closed.append(text)
+
+    class BlockingSink(NullAudioSink):
+        """Dispositivo que não aceita mais áudio até o abort()"""
+
+        def __init__(self):
+            super().__init__()
+            self.released = threading.Event()
+
+        def write(self, chunk):
+            super().write(chunk)
+            self.released.wait()
+
+        def abort(self):
+            super().abort()
+            self.released.set()
+
+    async def scenario():
+        speech = AsyncSpeechPipeline(sink=BlockingSink(), synthesize=synthesize, max_audio_chunks=1)
+        speech.feed("Uma frase bem longa para falar. ")
+        await asyncio.sleep(0.1)
+        # A reprodução está presa no write e a síntese espera lugar na fila
+        assert speech._audio.full() and not speech._synthesis_task.done()
+
+        speech.cancel()
+        await asyncio.wait({speech._synthesis_task})
+
+    asyncio.run(scenario())
+    assert closed == ["Uma frase bem longa para falar."]
+    assert not entry.lock.locked()
+    assert len(list(tts_response.iter_kokoro_audio("Próxima resposta."))) == 20
+    tts_response.clear_kokoro_pipelines()
+
+
+def test_async_speech_cancel_while_device_opens(monkeypatch):
+    print("Testando o cancelamento da fala enquanto o dispositivo abre...")
+
+    streams, stream_class = install_fake_sounddevice(monkeypatch)
+    monkeypatch.setattr(stream_class, 'open_delay', 0.2)
+    synthesize, _ = fake_synthesize()
+
+    async def scenario():
+        speech = AsyncSpeechPipeline(sink=SoundDeviceSink(), synthesize=synthesize)
+        speech.feed("Uma frase completa para tocar. ")
+        await asyncio.sleep(0.05)
+        assert streams  # start() está abrindo o dispositivo em outra thread
+        started = time.perf_counter()
+        speech.cancel()
+        await speech.wait()
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.3)
+        return elapsed
+
+    # O cancelamento não espera a abertura, e o stream aberto depois dele é descartado
+    assert asyncio.run(scenario()) < 0.05
+    assert len(streams) == 1 and not streams[0].started and streams[0].closes == 1
+
+
+def test_ia_agent_speaks_during_generation(monkeypatch):
+    print("Testando o IA_Agent falando enquanto o modelo gera a resposta...")
+
+    reply = {
+        "thought": "explicar",
+        "response": "A capital do Brasil é Brasília. Ela foi inaugurada em 1960. Foi planejada por Lúcio Costa."
+    }
+    synthesize, received = fake_synthesize()
+    sink = NullAudioSink()
+    llm_done = []
+
+    original = ia_agent.run_agent_with_memory
+
+    def timed_run_agent_with_memory(*args, **kwargs):
+        result = original(*args, **kwargs)
+        llm_done.append(time.perf_counter())
+        return result
+
+    with FakeOllamaServer(lambda request: json.dumps(reply), chunk_size=4, token_delay=0.01) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        monkeypatch.setattr(ia_agent, 'run_agent_with_memory', timed_run_agent_with_memory)
+        agent = ia_agent.IA_Agent()
+        agent.speech_factory = lambda: SpeechPipeline(sink=sink, synthesize=synthesize)
+        response = agent.process_input("Qual é a capital do Brasil?")
+
+    assert response == reply["response"]
+    assert len(received) == 3
+    # O primeiro áudio saiu antes de o modelo terminar a resposta
+    assert sink.writes[0][0] < llm_done[0]
+
+
+if __name__ == "__main__":
+    test_sentence_splitter()
+    test_speech_starts_before_text_ends()
+    test_speech_cancel()
+    test_async_speech_cancel()
+    print("Testes concluídos!")
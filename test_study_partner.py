@@ -4,6 +4,7 @@ Script para testar partes específicas do parceiro de estudos
 """
 
 import json
+import time
 from study_partner import StudyPartner, StudySession, QuestionItem
 
 def test_reformulation():
@@ -97,6 +98,179 @@ def test_full_session():
         
     print()
 
+def install_fake_generation(monkeypatch, delay=0.0):
+    """Substitui as chamadas ao modelo por versões locais (com atraso opcional)"""
+    def fake_reformulate(self, original_question, on_delta=None):
+        time.sleep(delay)
+        return f"Reformulada: {original_question}"
+
+    def fake_choices(self, question_item):
+        time.sleep(delay)
+        return [f"Errada {i}" for i in range(1, 4)]
+
+    monkeypatch.setattr(StudySession, '_reformulate_question', fake_reformulate)
+    monkeypatch.setattr(StudySession, '_generate_multiple_choices', fake_choices)
+
+
+def test_prefetch_next_question(monkeypatch):
+    print("Testando a pré-busca da próxima pergunta...")
+
+    install_fake_generation(monkeypatch, delay=0.05)
+    questions = [QuestionItem(question=f"Pergunta {i}?", answer=f"Resposta {i}") for i in range(3)]
+    session = StudySession(questions=questions)
+    prefetcher = session.enable_prefetch(prepare_extras=lambda q, extras: {'options': [q.correct_answer]})
+
+    first = session.get_next_question()
+    assert session.current_extras == {}
+    time.sleep(0.3)  # o usuário pensando na resposta
+    session.check_answer(first.correct_answer)
+
+    # A segunda pergunta já estava pronta: nenhuma espera pelo modelo
+    started = time.perf_counter()
+    second = session.get_next_question()
+    elapsed = time.perf_counter() - started
+    print(f"Espera entre perguntas: {elapsed * 1000:.1f} ms")
+    assert elapsed < 0.05
+    assert prefetcher.hits == 1
+    assert second.correct_answer != first.correct_answer
+    assert session.current_extras == {'options': [second.correct_answer]}
+    session.disable_prefetch()
+
+
+def test_prefetch_discarded_when_due_set_changes(monkeypatch):
+    print("Testando o descarte da pré-busca quando as revisões mudam...")
+
+    install_fake_generation(monkeypatch)
+    questions = [QuestionItem(question=f"Pergunta {i}?", answer=f"Resposta {i}") for i in range(2)]
+    session = StudySession(questions=questions)
+    prefetcher = session.enable_prefetch()
+
+    first = session.get_next_question()
+    time.sleep(0.1)
+    # A pergunta pré-buscada foi revisada por outro caminho e deixou de estar pronta para revisão
+    other = next(q for q in questions if q.answer != first.correct_answer)
+    session.question_states[other.card_id].update(correct=True)
+
+    session.get_next_question()
+    assert prefetcher.discarded == 1 and prefetcher.hits == 0
+    session.disable_prefetch()
+
+
+def test_combined_generation_strategy(monkeypatch):
+    print("Testando a geração combinada (uma chamada por pergunta)...")
+
+    import ollama
+    from fake_ollama import FakeOllamaServer
+    from ollama_gateway import get_gateway
+
+    replies = [
+        json.dumps({"reformulated_question": "Que cidade é a capital do Brasil?", "wrong_answers": ["Rio"]}),
+        "isto não é JSON",
+    ]
+    with FakeOllamaServer(lambda request: replies.pop(0)) as server:
+        monkeypatch.setattr(get_gateway(), 'client', ollama.Client(host=server.url))
+        questions = [QuestionItem(question="Qual é a capital do Brasil?", answer="Brasília")]
+        session = StudySession(questions=questions, generation_strategy="combined")
+
+        question = session.get_next_question()
+        assert len(server.requests) == 1
+        assert question.question == "Que cidade é a capital do Brasil?"
+        # Mesmos fallbacks das chamadas separadas
+        assert question.wrong_answers == ["Rio", "Resposta incorreta 2", "Resposta incorreta 3"]
+
+        question = session.get_next_question()
+        assert question.question == "Qual é a capital do Brasil?"
+        assert question.wrong_answers == [f"Resposta incorreta {i}" for i in range(1, 4)]
+
+
+def test_due_queue_order():
+    print("Testando a ordem da fila de revisões...")
+
+    from datetime import datetime, timedelta
+    from study_partner import SpacedRepetitionState
+
+    now = datetime.now()
+    questions = [QuestionItem(question=f"Pergunta {i}?", answer=f"Resposta {i}") for i in range(4)]
+    ids = [q.card_id for q in questions]
+    session = StudySession(questions=questions, question_states={
+        ids[0]: SpacedRepetitionState(next_review=now + timedelta(days=2)),
+        ids[1]: SpacedRepetitionState(next_review=now - timedelta(days=1)),
+        ids[2]: SpacedRepetitionState(next_review=now - timedelta(days=3)),
+        ids[3]: SpacedRepetitionState(next_review=now + timedelta(days=1)),
+    })
+
+    # Mais atrasada primeiro; `exclude` passa para a seguinte
+    assert session._select_question() == questions[2]
+    assert session._select_question(exclude=ids[2]) == questions[1]
+
+    # Estados alterados sem passar por check_answer também são respeitados
+    session.question_states[ids[2]].update(correct=True)
+    session.question_states[ids[1]].update(correct=True)
+    # Nada pronto para revisão: vem a próxima a vencer (as duas revisadas agora vencem depois)
+    assert session._select_question() == questions[3]
+
+    # Uma revisão antecipada (atrás de outra na fila) já vale na próxima escolha
+    session.record_state(ids[0], SpacedRepetitionState(repetition_count=1, next_review=now - timedelta(days=10)))
+    assert session._select_question() == questions[0]
+
+    # Novas perguntas entram na fila antes das agendadas
+    session.questions.append(QuestionItem(question="Nova?", answer="Sim"))
+    assert session._select_question().question == "Nova?"
+
+
+def test_check_answer_uses_card_id(monkeypatch):
+    print("Testando a correção pelo card_id com respostas repetidas...")
+
+    install_fake_generation(monkeypatch)
+    questions = [
+        QuestionItem(question="Quanto é 1 + 1?", answer="2"),
+        QuestionItem(question="Quanto é 4 / 2?", answer="2"),
+    ]
+    assert questions[0].card_id != questions[1].card_id
+    session = StudySession(questions=questions, generation_strategy="separate")
+
+    for _ in range(2):
+        question = session.get_next_question()
+        session.check_answer(question.correct_answer)
+    # Cada cartão foi atualizado uma vez, mesmo com a mesma resposta correta
+    assert [session.question_states[q.card_id].repetition_count for q in questions] == [1, 1]
+
+def test_both_entry_points_share_session_options(monkeypatch, tmp_path):
+    print("Testando as mesmas opções em study-partner e run_study_partner.py...")
+    import sys
+    import run_study_partner
+    import study_partner
+    from ollama_gateway import get_gateway
+
+    created = []
+
+    class FakePartner:
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+
+        def load_questionnaire(self, questionnaire_data=None, pack_path=None):
+            self.questions = questionnaire_data
+
+        def start_study_session(self, text_only=False):
+            self.text_only = text_only
+
+    timings = []
+    monkeypatch.setattr(study_partner, 'StudyPartner', FakePartner)
+    monkeypatch.setattr(get_gateway(), 'keep_alive', get_gateway().keep_alive)
+    questions = tmp_path / "perguntas.json"
+    questions.write_text(json.dumps([{"question": "2 + 2?", "answer": "4"}]))
+    options = ['-q', str(questions), '--text-only', '--no-persist', '--preload', '--keep-alive', '1h', '--timings']
+
+    for entry in (study_partner, run_study_partner):
+        monkeypatch.setattr(entry, 'print_timings', lambda: timings.append(entry.__name__))
+        monkeypatch.setattr(sys, 'argv', [entry.__name__] + options)
+        entry.main()
+        assert created[-1]["preload"] is True and created[-1]["state_store"] is None
+        assert get_gateway().keep_alive == '1h'
+
+    assert len(created) == 2 and timings == ['study_partner', 'run_study_partner']
+
+
 if __name__ == "__main__":
     print("Executando testes do Parceiro de Estudos")
     print("="*50)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Testes do servidor de estudos para vários estudantes
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from loadtest_study_server import StudyClient, run_load_test
+from sm2_store import SM2StateStore
+from study_server import StudyServer
+
+
+QUESTIONS = [
+    {"question": "Capital do Brasil?", "answer": "Brasília"},
+    {"question": "Maior oceano?", "answer": "Pacífico"},
+]
+
+
+def counting_generator(delay=0.05):
+    """Geração local e lenta, contando as chamadas (como um modelo)"""
+    calls = []
+    lock = threading.Lock()
+
+    def generate(item):
+        with lock:
+            calls.append(item.question)
+            n = len(calls)
+        time.sleep(delay)
+        return f"Variante {n}: {item.question}", ["e1", "e2", "e3"]
+
+    return generate, calls
+
+
+def test_shared_material_and_separate_state(tmp_path):
+    print("Testando variantes compartilhadas e estado SM-2 por estudante...")
+
+    generate, calls = counting_generator()
+    store = SM2StateStore(str(tmp_path / "state.sqlite3"))
+
+    async def scenario():
+        server = await StudyServer(QUESTIONS, state_store=store, port=0, generate=generate).start()
+        clients = [StudyClient(server.host, server.port) for _ in range(20)]
+        try:
+            # 20 estudantes pedindo a primeira pergunta ao mesmo tempo
+            replies = await asyncio.gather(*(
+                client.request('POST', f'/learners/e{i}/next') for i, client in enumerate(clients)
+            ))
+            assert all(status == 200 for status, _ in replies)
+
+            # A estudante 0 responde corretamente; a 1 erra
+            status, first = replies[0]
+            answer = next(q['answer'] for q in QUESTIONS if first['question'].endswith(q['question']))
+            status, result = await clients[0].request('POST', '/learners/e0/answer', {"answer": answer})
+            assert status == 200 and result == {"correct": True, "correct_answer": answer, "score": 1, "answered": 1}
+
+            status, error = await clients[1].request('POST', '/learners/e1/answer', {"answer": "x"})
+            assert status == 200 and not error["correct"]
+            status, error = await clients[1].request('POST', '/learners/e1/answer', {"answer": "x"})
+            assert status == 409
+            status, _ = await clients[2].request('POST', '/learners/e$1/next')
+            assert status == 400
+            status, stats = await clients[2].request('GET', '/stats')
+            return server, first, stats
+        finally:
+            for client in clients:
+                await client.close()
+            await server.stop()
+
+    server, first, stats = asyncio.run(scenario())
+    # Uma chamada ao modelo por pergunta, não uma por estudante
+    assert len(calls) == 2
+    assert stats["material"]["generated"] == 2
+    assert stats["material"]["coalesced"] + stats["material"]["reused"] == 18
+
+    # Estado gravado só para quem respondeu, separado por estudante
+    card_id = first["card_id"]
+    assert store.namespace("e0").get(card_id).repetition_count == 1
+    assert store.namespace("e2").get(card_id) is None
+
+
+def test_audio_is_shared():
+    print("Testando o áudio compartilhado...")
+
+    generate, _ = counting_generator(delay=0)
+    synthesized = []
+
+    def synthesize(text):
+        synthesized.append(text)
+        return np.zeros(240, dtype=np.float32), 24000
+
+    async def scenario():
+        server = await StudyServer(QUESTIONS[:1], port=0, generate=generate, tts=True, synthesize=synthesize).start()
+        clients = [StudyClient(server.host, server.port) for _ in range(5)]
+        try:
+            questions = [(await client.request('POST', f'/learners/e{i}/next'))[1] for i, client in enumerate(clients)]
+            audio = await asyncio.gather(*(
+                client.request('GET', question['audio']['question']) for client, question in zip(clients, questions)
+            ))
+            return audio
+        finally:
+            for client in clients:
+                await client.close()
+            await server.stop()
+
+    audio = asyncio.run(scenario())
+    assert all(status == 200 and data[:4] == b'RIFF' for status, data in audio)
+    assert len(synthesized) == 1
+
+
+def test_load_test_with_fake_ollama():
+    print("Testando o teste de carga contra o Ollama fake...")
+
+    result = asyncio.run(run_load_test(learners=100, rounds=3, cards=10, latency=0.05))
+    assert result["questions_served"] == 300
+    # Cada pergunta é gerada uma vez (no máximo uma por variante), não uma vez por estudante
+    assert result["llm_calls"] <= 10 * 3
+    assert result["server"]["learners"] == 100
+
+
+def test_session_work_does_not_block_other_learners(tmp_path):
+    print("Testando uma gravação lenta de um estudante enquanto outro pede a pergunta...")
+
+    class SlowStore(SM2StateStore):
+        def save(self, key, state):
+            time.sleep(0.3)
+            super().save(key, state)
+
+    generate, _ = counting_generator(delay=0)
+    store = SlowStore(str(tmp_path / "state.sqlite3"))
+
+    async def scenario():
+        server = await StudyServer(QUESTIONS, state_store=store, port=0, generate=generate).start()
+        slow, fast = StudyClient(server.host, server.port), StudyClient(server.host, server.port)
+        try:
+            _, question = await slow.request('POST', '/learners/ana/next')
+            await fast.request('POST', '/learners/bia/next')
+            # Cliente e servidor dividem o event loop: se a gravação o bloqueasse, tudo esperaria
+            started = time.perf_counter()
+            answering = asyncio.create_task(slow.request('POST', '/learners/ana/answer', {"answer": "x"}))
+            await asyncio.sleep(0.05)
+            status, _ = await fast.request('POST', '/learners/bia/next')
+            elapsed = time.perf_counter() - started
+            status_answer, _ = await answering
+            return status, status_answer, elapsed
+        finally:
+            await slow.close()
+            await fast.close()
+            await server.stop()
+
+    status, status_answer, elapsed = asyncio.run(scenario())
+    assert status == status_answer == 200
+    assert elapsed < 0.2
+
+
+def test_malformed_requests_and_internal_errors():
+    print("Testando Content-Length inválido e erros internos...")
+
+    generate, _ = counting_generator(delay=0)
+
+    async def raw_status(server, content_length):
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(f"POST /learners/ana/answer HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        writer.close()
+        return status
+
+    async def scenario():
+        server = await StudyServer(QUESTIONS, port=0, generate=generate).start()
+        client = StudyClient(server.host, server.port)
+        try:
+            statuses = [await raw_status(server, value) for value in ("abc", "-5")]
+
+            def broken(name):
+                raise RuntimeError("falha inesperada")
+
+            server.learner_stats = broken
+            status, error = await client.request('GET', '/learners/ana')
+            # A conexão continua de pé depois do erro
+            status_after, _ = await client.request('POST', '/learners/ana/next')
+            return statuses, status, error, status_after
+        finally:
+            await client.close()
+            await server.stop()
+
+    statuses, status, error, status_after = asyncio.run(scenario())
+    assert statuses == [400, 400]
+    assert status == 500 and "erro interno" in error["error"] and status_after == 200
+
+
+if __name__ == "__main__":
+    test_audio_is_shared()
+    test_malformed_requests_and_internal_errors()
+    test_load_test_with_fake_ollama()
+    print("Testes concluídos!")
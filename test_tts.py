@@ -2,8 +2,44 @@
 """
 Script de teste para a funcionalidade TTS
 """
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+import tts_response
 from tts_response import generate_tts_response
 
+
+class FakeResult:
+    """Resultado mínimo no formato retornado pelo KPipeline"""
+
+    def __init__(self, audio):
+        self.output = types.SimpleNamespace(audio=audio)
+
+
+def install_fake_kokoro(monkeypatch, segments=2, delay=0.0):
+    """Instala um módulo 'kokoro' falso e retorna a lista de pipelines criados"""
+    created = []
+
+    class FakeKPipeline:
+        def __init__(self, lang_code, repo_id=None):
+            self.lang_code = lang_code
+            self.repo_id = repo_id
+            created.append(self)
+
+        def __call__(self, text, voice=None):
+            for _ in range(segments):
+                time.sleep(delay)
+                yield FakeResult(np.ones(240, dtype=np.float32))
+
+    monkeypatch.setitem(sys.modules, 'kokoro', types.SimpleNamespace(KPipeline=FakeKPipeline))
+    tts_response.clear_kokoro_pipelines()
+    return created
+
+
 def test_tts():
     print("Testando a funcionalidade TTS...")
     
@@ -15,5 +51,167 @@ def test_tts():
     
     print(f"\nResposta textual: {response}")
 
+
+def test_kokoro_pipeline_pool(monkeypatch):
+    print("Testando o registro de pipelines do Kokoro...")
+
+    created = install_fake_kokoro(monkeypatch)
+
+    for _ in range(3):
+        audio, sample_rate = tts_response.get_kokoro_audio("Olá", voice='pf_dora')
+        assert len(audio) == 480 and sample_rate == 24000
+
+    # O pipeline só é construído uma vez por (language, repo_id)
+    assert len(created) == 1
+    tts_response.get_kokoro_audio("Hello", language='a')
+    assert len(created) == 2
+
+    metrics = tts_response.get_pipeline_metrics()
+    print(f"Métricas: {metrics}")
+    assert metrics['p:hexgrad/Kokoro-82M']['hits'] == 2
+    assert metrics['a:hexgrad/Kokoro-82M']['hits'] == 0
+
+    # O warm-up em segundo plano reaproveita o mesmo registro
+    tts_response.warmup_kokoro_pipeline(voice='pf_dora', background=True).join()
+    assert len(created) == 2
+    tts_response.clear_kokoro_pipelines()
+
+
+def test_streaming_playback_null_sink(monkeypatch):
+    print("Testando reprodução em streaming com destino nulo...")
+
+    install_fake_kokoro(monkeypatch, segments=4, delay=0.05)
+    sink = tts_response.NullAudioSink()
+    stats = tts_response.stream_kokoro_audio("Uma frase. Outra frase.", sink=sink)
+    print(f"Métricas: {stats}")
+
+    # Cada segmento chega ao destino assim que é gerado, não só no final
+    assert len(sink.writes) == 4 and sink.finished
+    assert sink.writes[0][0] - sink.started_at < 0.1
+    assert stats["time_to_first_audio"] < stats["total_time"] / 2
+    assert stats["samples"] == sink.total_samples == 960
+    tts_response.clear_kokoro_pipelines()
+
+
+def test_paused_generator_does_not_block_other_speakers(monkeypatch):
+    print("Testando um gerador de áudio pausado enquanto outra fala é sintetizada...")
+
+    install_fake_kokoro(monkeypatch, segments=3)
+    paused = tts_response.iter_kokoro_audio("Primeira fala.")
+    next(paused)
+    entry = tts_response.get_kokoro_pipeline_entry()
+
+    # Entre um segmento e outro o pipeline fica livre
+    assert not entry.lock.locked()
+    assert len(list(tts_response.iter_kokoro_audio("Segunda fala."))) == 3
+    assert len(list(paused)) == 2
+
+    # AudioSink é uma interface: sem write() não há destino de áudio
+    class Incomplete(tts_response.AudioSink):
+        pass
+
+    try:
+        Incomplete()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("AudioSink sem write() não deveria ser instanciável")
+    tts_response.clear_kokoro_pipelines()
+
+
+def test_unreachable_tts_worker_falls_back_to_local(monkeypatch, tmp_path):
+    print("Testando a síntese local quando o worker de TTS não responde...")
+
+    created = install_fake_kokoro(monkeypatch)
+    monkeypatch.setenv(tts_response.TTS_SOCKET_ENV, str(tmp_path / "nenhum.sock"))
+    assert tts_response.warmup_kokoro_pipeline(background=True) is None  # O worker já estaria aquecido
+    assert len(list(tts_response.iter_kokoro_audio("Olá."))) == 2 and len(created) == 1
+    tts_response.clear_kokoro_pipelines()
+
+
+def test_audio_ring_buffer():
+    print("Testando o buffer circular de áudio...")
+
+    buffer = tts_response.AudioRingBuffer(capacity=8)
+    data = np.arange(20, dtype=np.float32)
+
+    # O escritor bloqueia quando o buffer enche e continua à medida que o leitor consome
+    writer = threading.Thread(target=buffer.write, args=(data,))
+    writer.start()
+    received = []
+    while len(received) < len(data):
+        block, count = buffer.read(3)
+        received.extend(block[:count])
+        if count == 0:
+            time.sleep(0.001)
+    writer.join()
+    assert np.array_equal(np.array(received), data)
+
+    # Leitura de buffer vazio devolve silêncio
+    block, count = buffer.read(4)
+    assert count == 0 and not block.any()
+
+
+def install_fake_sounddevice(monkeypatch):
+    """Instala um módulo 'sounddevice' falso cujo stream só termina quando é abortado"""
+    streams = []
+
+    class FakeOutputStream:
+        open_delay = 0.0  # Tempo para abrir o dispositivo
+
+        def __init__(self, callback=None, finished_callback=None, **kwargs):
+            self.finished_callback = finished_callback
+            self.closes = 0
+            self.started = self.aborted = False
+            streams.append(self)
+            time.sleep(self.open_delay)
+
+        def start(self):
+            self.started = True
+
+        def abort(self):
+            assert self.closes == 0, "abort() depois de close()"
+            self.aborted = True
+            self.finished_callback()
+
+        def close(self):
+            self.closes += 1
+            assert self.closes == 1, "stream fechado duas vezes"
+
+    monkeypatch.setitem(sys.modules, 'sounddevice', types.SimpleNamespace(
+        OutputStream=FakeOutputStream, CallbackStop=Exception
+    ))
+    return streams, FakeOutputStream
+
+
+def test_sounddevice_sink_abort_during_finish(monkeypatch):
+    print("Testando o abort() do sink enquanto finish() espera...")
+
+    streams, _ = install_fake_sounddevice(monkeypatch)
+    sink = tts_response.SoundDeviceSink()
+    sink.start(24000)
+    sink.write(np.ones(240, dtype=np.float32))
+
+    errors = []
+
+    def finish():
+        try:
+            sink.finish()
+        except Exception as e:
+            errors.append(e)
+
+    finisher = threading.Thread(target=finish)
+    finisher.start()
+    time.sleep(0.05)
+    assert finisher.is_alive()  # Esperando o fim da reprodução
+
+    sink.abort()
+    finisher.join(timeout=1)
+    assert not finisher.is_alive() and errors == []
+    assert streams[0].closes == 1
+    sink.abort()
+    sink.finish()  # Sem stream, não fazem nada
+
+
 if __name__ == "__main__":
-    test_tts()
\ No newline at end of file
+    test_tts()
@@ -1,58 +1,168 @@
-import json
-import subprocess
-import ollama
+import os
 import sys
 import argparse
+from abc import ABC, abstractmethod
 import warnings
-from pydantic import BaseModel, Field
-from typing import Literal, Union, List, Optional
-from pathlib import Path
-import os
-import tempfile
+from typing import List, Optional, Dict, Any
+import threading
+import time
+
+from tts_worker import TTS_SOCKET_ENV, connect_worker, iter_remote_audio
 
 # Suprimir todos os avisos
 warnings.filterwarnings("ignore")
 
-# Importando as funções existentes do main.py
-from main import run_agent_interactive
 
+class KokoroPipelineEntry:
+    """Pipeline do Kokoro carregado, com as métricas de carregamento e uso"""
+
+    def __init__(self, pipeline, load_time: float):
+        self.pipeline = pipeline
+        self.load_time = load_time
+        self.hits = 0
+        # O KPipeline mantém estado interno (vozes carregadas), então a síntese é serializada
+        self.lock = threading.Lock()
+
+
+# Registro de pipelines do Kokoro compartilhado por todo o processo, indexado por (language, repo_id)
+_kokoro_pipelines: Dict[tuple, KokoroPipelineEntry] = {}
+_kokoro_pipelines_lock = threading.Lock()
+
+
+def get_kokoro_pipeline_entry(language: str = 'p', repo_id: str = 'hexgrad/Kokoro-82M') -> KokoroPipelineEntry:
+    """
+    Retorna a entrada do registro para (language, repo_id), carregando o pipeline apenas na primeira vez
+
+    Raises:
+        ImportError: se o Kokoro TTS não estiver instalado
+    """
+    key = (language, repo_id)
+    with _kokoro_pipelines_lock:
+        entry = _kokoro_pipelines.get(key)
+        if entry is not None:
+            entry.hits += 1
+            return entry
+
+        # Importar o kokoro dinamicamente para evitar erro se não estiver instalado
+        from kokoro import KPipeline
+
+        start = time.perf_counter()
+        pipeline = KPipeline(language, repo_id=repo_id)
+        entry = KokoroPipelineEntry(pipeline, time.perf_counter() - start)
+        _kokoro_pipelines[key] = entry
+        return entry
+
+
+def get_kokoro_pipeline(language: str = 'p', repo_id: str = 'hexgrad/Kokoro-82M'):
+    """Retorna o KPipeline compartilhado para (language, repo_id)"""
+    return get_kokoro_pipeline_entry(language, repo_id).pipeline
 
-class OpenProgram(BaseModel):
-    """Function to open a program on the system"""
-    function_name: Literal["open_program"] = Field(description="The name of the function to call")
-    program_name: str = Field(description="Name of the program to open (e.g., 'kate', 'firefox', 'libreoffice')")
-    arguments: list[str] = Field(default=[], description="Additional arguments to pass to the program")
 
+def warmup_kokoro_pipeline(
+    language: str = 'p',
+    repo_id: str = 'hexgrad/Kokoro-82M',
+    voice: Optional[str] = None,
+    background: bool = False
+):
+    """
+    Carrega o pipeline do Kokoro antecipadamente (e, opcionalmente, a voz)
 
-class ExecuteCommand(BaseModel):
-    """Function to execute a shell command"""
-    function_name: Literal["execute_command"] = Field(description="The name of the function to call")
-    command: str = Field(description="The shell command to execute")
-    arguments: list[str] = Field(default=[], description="Additional arguments to pass to the command")
+    Args:
+        language: Código do idioma
+        repo_id: ID do repositório do modelo
+        voice: Se informado, sintetiza um texto curto para carregar também a voz
+        background: Se True, carrega em uma thread daemon e retorna a thread
 
+    Returns:
+        threading.Thread se background=True, caso contrário None
+    """
+    if os.environ.get(TTS_SOCKET_ENV):
+        return None  # O worker residente do daemon já tem o pipeline carregado
 
-class ListDirectory(BaseModel):
-    """Function to list directory contents"""
-    function_name: Literal["list_directory"] = Field(description="The name of the function to call")
-    path: str = Field(default=".", description="Path to the directory to list")
+    def _warmup():
+        try:
+            entry = get_kokoro_pipeline_entry(language, repo_id)
+            if voice:
+                with entry.lock:
+                    for _ in entry.pipeline("Olá.", voice=voice):
+                        pass
+        except ImportError:
+            print("O Kokoro TTS não está instalado. Por favor, instale com: pip install kokoro")
+        except Exception as e:
+            print(f"Erro ao pré-carregar o Kokoro TTS: {e}")
 
+    if background:
+        thread = threading.Thread(target=_warmup, name="kokoro-warmup", daemon=True)
+        thread.start()
+        return thread
+    _warmup()
+    return None
 
-class ReadFile(BaseModel):
-    """Function to read a file"""
-    function_name: Literal["read_file"] = Field(description="The name of the function to call")
-    path: str = Field(description="Path to the file to read")
 
+def get_pipeline_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Retorna as métricas do registro de pipelines
 
-class FunctionCall(BaseModel):
-    """Represents a function call from the AI model"""
-    thought: str = Field(description="The reasoning behind the function call")
-    function: Union[OpenProgram, ExecuteCommand, ListDirectory, ReadFile] = Field(description="The function to call")
+    Returns:
+        dict: {"language:repo_id": {"load_time": segundos, "hits": reutilizações}}
+    """
+    with _kokoro_pipelines_lock:
+        return {
+            f"{language}:{repo_id}": {"load_time": entry.load_time, "hits": entry.hits}
+            for (language, repo_id), entry in _kokoro_pipelines.items()
+        }
+
+
+def clear_kokoro_pipelines():
+    """Descarta todos os pipelines carregados (libera memória; o próximo uso recarrega o modelo)"""
+    with _kokoro_pipelines_lock:
+        _kokoro_pipelines.clear()
+
+
+def iter_kokoro_audio(text: str, voice: str = 'pf_dora', language: str = 'p', repo_id: str = 'hexgrad/Kokoro-82M'):
+    """
+    Gera o áudio do texto segmento a segmento, à medida que o Kokoro os produz
+
+    O lock do pipeline é tomado só enquanto cada segmento é sintetizado, não entre um
+    yield e o próximo: quem pausa ou abandona o gerador não trava as outras falas.
+
+    Nos programas servidos pelo daemon (AGENT_TTS_SOCKET definido), a síntese é feita pelo
+    worker residente (tts_worker.py), que já tem o Kokoro carregado; se ele não
+    responder, o pipeline é carregado neste processo.
+    
+    Yields:
+        Arrays numpy com o áudio de cada segmento (taxa de amostragem de 24000 Hz)
+    
+    Raises:
+        ImportError: se o Kokoro TTS não estiver instalado
+    """
+    worker_socket = os.environ.get(TTS_SOCKET_ENV)
+    sock = connect_worker(worker_socket) if worker_socket else None
+    if sock is not None:
+        yield from iter_remote_audio(sock, text, voice, language, repo_id)
+        return
+
+    # Obter o pipeline do Kokoro já carregado (ou carregá-lo uma única vez)
+    entry = get_kokoro_pipeline_entry(language, repo_id)
+    
+    results = entry.pipeline(text, voice=voice)
+    while True:
+        with entry.lock:
+            result = next(results, None)
+        if result is None:
+            return
+        # Ignorar segmentos sem áudio
+        if result.output is not None and result.output.audio is not None:
+            yield result.output.audio
 
 
 def get_kokoro_audio(text: str, voice: str = 'pf_dora', language: str = 'p', repo_id: str = 'hexgrad/Kokoro-82M') -> tuple:
     """
     Gera áudio a partir de texto usando o Kokoro TTS
     
+    O pipeline é obtido do registro compartilhado, então o modelo só é carregado
+    na primeira chamada para cada (language, repo_id).
+    
     Args:
         text: Texto a ser convertido em áudio
         voice: Voz a ser usada (padrão: 'pf_dora')
@@ -65,20 +175,8 @@ def get_kokoro_audio(text: str, voice: str = 'pf_dora', language: str = 'p', rep
     import numpy as np
     
     try:
-        # Importar o kokoro dinamicamente para evitar erro se não estiver instalado
-        from kokoro import KPipeline
-        
-        # Inicializar o pipeline do Kokoro com o repo_id explícito
-        pipeline = KPipeline(language, repo_id=repo_id)
-        
         # Gerar áudio a partir do texto
-        audio_chunks = []
-        for result in pipeline(text, voice=voice):
-            # Armazenar os chunks de áudio
-            audio_chunks.append(result.output.audio if result.output else None)
-        
-        # Filtrar valores None
-        audio_chunks = [chunk for chunk in audio_chunks if chunk is not None]
+        audio_chunks = list(iter_kokoro_audio(text, voice=voice, language=language, repo_id=repo_id))
         
         # Concatenar todos os chunks
         if audio_chunks:
@@ -119,7 +217,282 @@ def play_audio_from_bytes(audio_array, sample_rate: int = 24000):
         print(f"Erro ao reproduzir áudio: {e}")
 
 
-def generate_tts_response(user_input: str, model: str = 'gemma3:latest', voice: str = 'pf_dora', repo_id: str = 'hexgrad/Kokoro-82M'):
+class AudioRingBuffer:
+    """
+    Buffer circular de amostras float32 entre o produtor (síntese) e o callback de áudio
+    
+    A escrita bloqueia enquanto o buffer estiver cheio; a leitura nunca bloqueia,
+    pois é chamada de dentro do callback do dispositivo de áudio.
+    """
+
+    def __init__(self, capacity: int):
+        import numpy as np
+
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._read_pos = 0
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def write(self, samples) -> None:
+        """Escreve as amostras no buffer, aguardando espaço quando necessário"""
+        import numpy as np
+
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        offset = 0
+        while offset < len(samples):
+            with self._cond:
+                while self._size == self._capacity and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                count = min(self._capacity - self._size, len(samples) - offset)
+                write_pos = (self._read_pos + self._size) % self._capacity
+                first = min(count, self._capacity - write_pos)
+                self._data[write_pos:write_pos + first] = samples[offset:offset + first]
+                self._data[:count - first] = samples[offset + first:offset + count]
+                self._size += count
+                offset += count
+
+    def read(self, frames: int):
+        """Lê até `frames` amostras; o restante é preenchido com silêncio"""
+        import numpy as np
+
+        out = np.zeros(frames, dtype=np.float32)
+        with self._cond:
+            count = min(frames, self._size)
+            first = min(count, self._capacity - self._read_pos)
+            out[:first] = self._data[self._read_pos:self._read_pos + first]
+            out[first:count] = self._data[:count - first]
+            self._read_pos = (self._read_pos + count) % self._capacity
+            self._size -= count
+            self._cond.notify_all()
+        return out, count
+
+    def close(self) -> None:
+        """Indica que não haverá mais escritas (e libera escritores bloqueados)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        with self._cond:
+            return self._size
+
+
+class AudioSink(ABC):
+    """Destino de áudio em streaming: recebe chunks na ordem em que são gerados"""
+
+    def start(self, sample_rate: int) -> None:
+        pass
+
+    @abstractmethod
+    def write(self, chunk) -> None:
+        """Enfileira um chunk para reprodução"""
+
+    def finish(self) -> None:
+        """Aguarda o fim da reprodução do que já foi escrito"""
+        pass
+
+    def abort(self) -> None:
+        """Interrompe a reprodução imediatamente"""
+        pass
+
+
+class SoundDeviceSink(AudioSink):
+    """
+    Reproduz os chunks em um sounddevice.OutputStream contínuo alimentado por um buffer circular
+
+    abort() pode ser chamado de outra thread enquanto finish() espera o fim da reprodução:
+    o estado do stream é trocado sob um lock, e quem o tira primeiro é quem o fecha. Depois
+    de abort(), o sink não toca mais: um start() em andamento em outra thread descarta o
+    stream que abriu.
+    """
+
+    def __init__(self, buffer_seconds: float = 2.0, blocksize: int = 0):
+        self.buffer_seconds = buffer_seconds
+        self.blocksize = blocksize
+        self._buffer: Optional[AudioRingBuffer] = None
+        self._stream = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._aborted = False
+
+    def start(self, sample_rate: int) -> None:
+        import sounddevice as sd
+
+        buffer = AudioRingBuffer(int(sample_rate * self.buffer_seconds))
+
+        def callback(outdata, frames, time_info, status):
+            data, count = buffer.read(frames)
+            outdata[:, 0] = data
+            if count < frames and buffer.closed:
+                raise sd.CallbackStop()
+
+        if self._aborted:
+            return
+        # Abrir o dispositivo pode demorar; abort() não espera por isso
+        stream = sd.OutputStream(
+            samplerate=sample_rate,
+            channels=1,
+            dtype='float32',
+            blocksize=self.blocksize,
+            callback=callback,
+            finished_callback=self._done.set
+        )
+        with self._lock:
+            if not self._aborted:
+                self._buffer = buffer
+                self._done.clear()
+                self._stream = stream
+                stream.start()
+                return
+        stream.close()
+
+    def write(self, chunk) -> None:
+        buffer = self._buffer
+        if buffer is not None:
+            buffer.write(chunk)
+
+    def _take_stream(self):
+        """Tira o stream do sink (sob o lock) e fecha o buffer; retorna None se já não havia stream"""
+        with self._lock:
+            stream, self._stream = self._stream, None
+            if stream is not None:
+                self._buffer.close()
+        return stream
+
+    def finish(self) -> None:
+        with self._lock:
+            stream = self._stream
+            if stream is None:
+                return
+            self._buffer.close()
+        self._done.wait()
+        # Se abort() tirou o stream enquanto esperávamos, ele já foi fechado lá
+        if self._take_stream() is stream:
+            stream.close()
+
+    def abort(self) -> None:
+        with self._lock:
+            self._aborted = True
+        stream = self._take_stream()
+        if stream is None:
+            return
+        stream.abort()
+        stream.close()
+
+
+class NullAudioSink(AudioSink):
+    """
+    Destino de áudio que não reproduz nada, apenas registra quando cada chunk chegou
+    
+    Útil para testes e medições sem dispositivo de áudio.
+    """
+
+    def __init__(self):
+        self.sample_rate: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.writes: List[tuple] = []  # (timestamp, número de amostras)
+        self.finished = False
+        self.aborted = False
+
+    def start(self, sample_rate: int) -> None:
+        self.sample_rate = sample_rate
+        self.started_at = time.perf_counter()
+
+    def write(self, chunk) -> None:
+        self.writes.append((time.perf_counter(), len(chunk)))
+
+    def finish(self) -> None:
+        self.finished = True
+
+    def abort(self) -> None:
+        self.aborted = True
+
+    @property
+    def total_samples(self) -> int:
+        return sum(count for _, count in self.writes)
+
+
+def play_audio_stream(chunks, sample_rate: int = 24000, sink: Optional[AudioSink] = None) -> Dict[str, float]:
+    """
+    Reproduz chunks de áudio à medida que chegam, sem esperar pelo áudio completo
+    
+    Args:
+        chunks: Iterável de arrays numpy (por exemplo, iter_kokoro_audio)
+        sample_rate: Taxa de amostragem (padrão: 24000)
+        sink: Destino do áudio (padrão: SoundDeviceSink)
+    
+    Returns:
+        dict: time_to_first_audio e total_time em segundos, e número de amostras
+    """
+    if sink is None:
+        sink = SoundDeviceSink()
+    
+    start = time.perf_counter()
+    first_audio = None
+    samples = 0
+    sink.start(sample_rate)
+    try:
+        for chunk in chunks:
+            if first_audio is None:
+                first_audio = time.perf_counter() - start
+            sink.write(chunk)
+            samples += len(chunk)
+        sink.finish()
+    except BaseException:
+        sink.abort()
+        raise
+    
+    return {
+        "time_to_first_audio": first_audio if first_audio is not None else 0.0,
+        "total_time": time.perf_counter() - start,
+        "samples": samples
+    }
+
+
+def stream_kokoro_audio(
+    text: str,
+    voice: str = 'pf_dora',
+    language: str = 'p',
+    repo_id: str = 'hexgrad/Kokoro-82M',
+    sink: Optional[AudioSink] = None
+) -> Dict[str, float]:
+    """
+    Sintetiza e reproduz o texto em streaming: cada segmento toca assim que é gerado
+    
+    Returns:
+        dict: métricas de play_audio_stream (vazio em caso de erro)
+    """
+    try:
+        return play_audio_stream(
+            iter_kokoro_audio(text, voice=voice, language=language, repo_id=repo_id),
+            24000,
+            sink=sink
+        )
+    except ImportError as e:
+        if e.name == 'sounddevice':
+            print("SoundDevice não está instalado. Por favor, instale com: pip install sounddevice")
+        else:
+            print("O Kokoro TTS não está instalado. Por favor, instale com: pip install kokoro")
+    except Exception as e:
+        print(f"Erro ao reproduzir áudio em streaming: {e}")
+    return {}
+
+
+def generate_tts_response(
+    user_input: str,
+    model: str = 'gemma3:latest',
+    voice: str = 'pf_dora',
+    repo_id: str = 'hexgrad/Kokoro-82M',
+    stream: bool = False
+):
     """
     Gera resposta textual e converte para áudio usando Kokoro TTS
     
@@ -128,11 +501,16 @@ def generate_tts_response(user_input: str, model: str = 'gemma3:latest', voice:
         model: Modelo Ollama a ser usado
         voice: Voz do Kokoro TTS a ser usada
         repo_id: ID do repositório do modelo Kokoro
+        stream: Reproduz cada segmento assim que é sintetizado
     
     Returns:
         str: Resposta textual gerada
     """
+    # Carregar o pipeline do Kokoro em paralelo com a chamada ao modelo
+    warmup_kokoro_pipeline(repo_id=repo_id, background=True)
+    
     # Obter a resposta textual do modelo
+    from main import run_agent_interactive
     result = run_agent_interactive(user_input, model=model, execute=False, explain=False)
     
     # Extrair a resposta textual
@@ -141,6 +519,12 @@ def generate_tts_response(user_input: str, model: str = 'gemma3:latest', voice:
     else:
         text_response = str(result)
     
+    if stream:
+        print("Reproduzindo resposta em áudio...")
+        if not stream_kokoro_audio(text_response, voice=voice, repo_id=repo_id):
+            print("Não foi possível gerar o áudio da resposta.")
+        return text_response
+    
     # Gerar áudio a partir da resposta textual
     audio_array, sample_rate = get_kokoro_audio(text_response, voice=voice, repo_id=repo_id)
     
@@ -162,6 +546,7 @@ def main():
     parser.add_argument('--model', '-m', default='gemma3:latest', help='Modelo Ollama a ser usado')
     parser.add_argument('--voice', '-v', default='pf_dora', help='Voz do Kokoro TTS a ser usada')
     parser.add_argument('--text-only', action='store_true', help='Apenas gerar texto, sem áudio')
+    parser.add_argument('--stream', action='store_true', help='Reproduzir o áudio à medida que é sintetizado')
     
     args = parser.parse_args()
     
@@ -186,6 +571,7 @@ def main():
     
     if args.text_only:
         # Apenas gerar texto
+        from main import run_agent_interactive
         result = run_agent_interactive(prompt, model=args.model, execute=False, explain=False)
         if isinstance(result, dict):
             print(result.get('command', ''))
@@ -193,7 +579,7 @@ def main():
             print(result)
     else:
         # Gerar texto e áudio
-        response = generate_tts_response(prompt, model=args.model, voice=args.voice)
+        response = generate_tts_response(prompt, model=args.model, voice=args.voice, stream=args.stream)
         print(f"\nResposta textual:\n{response}")
 
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Processo residente de síntese de voz (Kokoro) para os programas servidos pelo daemon
+
+O daemon (agent_daemon.py) atende cada pedido em um processo filho criado com fork, e o
+Kokoro (torch) não pode ser carregado antes do fork: os pools de threads do OpenMP do
+pai não existem no filho, e a síntese pode travar. Por isso o pipeline fica neste
+processo, iniciado pelo daemon com um interpretador novo e que nunca faz fork. Ele
+carrega o Kokoro uma vez e sintetiza para os filhos, que recebem o caminho do socket em
+AGENT_TTS_SOCKET; tts_response.iter_kokoro_audio usa o worker quando a variável existe e
+sintetiza no próprio processo se ele não responder.
+
+Protocolo (socket Unix, mesmos quadros do agent_client.py):
+    filho -> worker: 4 bytes (tamanho) + cabeçalho JSON {text, voice, language, repo_id}
+    worker -> filho: 'a' segmento de áudio (float32), 'e' erro (JSON {type, message}), 'x' fim
+
+Uso (normalmente pelo daemon):
+    python tts_worker.py --socket /tmp/agent-1000/daemon.sock.tts
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import threading
+from typing import Iterator, Optional
+
+from agent_client import recv_exact, recv_frame, send_frame, send_header
+
+
+# Variável de ambiente com o socket do worker, definida pelo daemon nos processos filhos
+TTS_SOCKET_ENV = 'AGENT_TTS_SOCKET'
+
+
+def connect_worker(socket_path: str) -> Optional[socket.socket]:
+    """Conecta ao worker; None se ele não estiver respondendo"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def iter_remote_audio(sock: socket.socket, text: str, voice: str, language: str, repo_id: str) -> Iterator:
+    """
+    Segmentos de áudio sintetizados pelo worker, à medida que chegam
+
+    Fechar o gerador fecha a conexão, e o worker para de sintetizar o texto.
+
+    Raises:
+        ImportError: se o Kokoro TTS não estiver instalado no worker
+    """
+    import numpy as np
+
+    try:
+        send_header(sock, {"text": text, "voice": voice, "language": language, "repo_id": repo_id})
+        while True:
+            channel, data = recv_frame(sock)
+            if channel == b'a':
+                yield np.frombuffer(data, dtype=np.float32)
+            elif channel == b'e':
+                error = json.loads(data)
+                if error["type"] == "ImportError":
+                    raise ImportError(error["message"])
+                raise RuntimeError(error["message"])
+            else:
+                return
+    finally:
+        sock.close()
+
+
+class TTSWorker:
+    """Servidor do socket Unix que sintetiza com o registro de pipelines do tts_response"""
+
+    def __init__(self, socket_path: str, voice: str = 'pf_dora', parent_pid: Optional[int] = None):
+        """
+        Args:
+            socket_path: Caminho do socket
+            voice: Voz carregada na partida
+            parent_pid: Encerrar quando este processo (o daemon) terminar
+        """
+        self.socket_path = socket_path
+        self.voice = voice
+        self.parent_pid = parent_pid
+        self.running = False
+
+    def serve_forever(self) -> None:
+        from tts_response import warmup_kokoro_pipeline
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(64)
+        listener.settimeout(1.0)
+        self.running = True
+
+        # Pedidos que chegam durante o carregamento esperam pelo lock do registro
+        warmup_kokoro_pipeline(voice=self.voice, background=True)
+        try:
+            while self.running:
+                if self.parent_pid is not None and os.getppid() != self.parent_pid:
+                    break  # O daemon terminou
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), name="tts-request", daemon=True).start()
+        finally:
+            listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _handle(self, conn: socket.socket) -> None:
+        import numpy as np
+        from tts_response import iter_kokoro_audio
+
+        with conn:
+            try:
+                size = struct.unpack('>I', recv_exact(conn, 4))[0]
+                request = json.loads(recv_exact(conn, size))
+                chunks = iter_kokoro_audio(
+                    request["text"],
+                    voice=request.get("voice") or self.voice,
+                    language=request.get("language") or 'p',
+                    repo_id=request.get("repo_id") or 'hexgrad/Kokoro-82M'
+                )
+                for chunk in chunks:
+                    send_frame(conn, b'a', np.asarray(chunk, dtype=np.float32).tobytes())
+                send_frame(conn, b'x', b'')
+            except OSError:
+                pass  # O cliente desistiu da fala
+            except Exception as e:
+                try:
+                    send_frame(conn, b'e', json.dumps({"type": type(e).__name__, "message": str(e)}).encode('utf-8'))
+                except OSError:
+                    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processo residente de síntese de voz (Kokoro)")
+    parser.add_argument('--socket', required=True, help='Caminho do socket')
+    parser.add_argument('--voice', default='pf_dora', help='Voz carregada na partida')
+    parser.add_argument('--parent', type=int, default=None, help='Encerrar quando este processo terminar')
+    args = parser.parse_args()
+
+    # O próprio worker sintetiza localmente; Ctrl+C no terminal do daemon não o derruba antes dele
+    os.environ.pop(TTS_SOCKET_ENV, None)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    TTSWorker(args.socket, voice=args.voice, parent_pid=args.parent).serve_forever()
+
+
+if __name__ == "__main__":
+    main()